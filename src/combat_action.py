@@ -1,13 +1,14 @@
-from typing import Dict, Tuple, Any
+from dataclasses import replace
+from typing import Dict, Tuple, Any, List, Optional
 import random
 from game_state import GameState, Tile, PlayerState, TurnState, Unit
 from utils.logger import logger
 import json
 
-def combat_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
-    tile = game_state.world[hex_pos]
+def _resolve_combat(tile: Tile, hex_pos: Tuple[int, int]) -> Optional[Tuple[Tile, Dict[str, Any]]]:
+    """Returns the surviving tile and combat record, or None when the hex is not contested."""
     if len(tile.units) <= 1:
-        return game_state
+        return None
     
     players_units = {}
     for unit in tile.units:
@@ -16,13 +17,13 @@ def combat_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         players_units[unit.player_id].append(unit)
     
     if len(players_units) <= 1:
-        return game_state
+        return None
     
     initial_counts = {player_id: len(units) for player_id, units in players_units.items()}
     damage_dealt = {player_id: 0 for player_id in players_units.keys()}
     
-    # Combat rolls - each player rolls once
-    for player_id in players_units.keys():
+    # Combat rolls - each player rolls once, in player id order so results are reproducible per seed
+    for player_id in sorted(players_units.keys()):
         roll = random.randint(1, 10)
         if roll > 4:  # Success on 5 or higher (60% chance)
             # Calculate damage based on initial unit count
@@ -37,13 +38,6 @@ def combat_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         survivors = units[damage_dealt[player_id]:]
         surviving_units.extend(survivors)
     
-    # Update the world with surviving units
-    world = dict(game_state.world)
-    world[hex_pos] = Tile(
-        position=tile.position,
-        units=surviving_units
-    )
-    
     # Create combat record
     combat_record = {
         'position': hex_pos,
@@ -51,17 +45,22 @@ def combat_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         'player_2_casualties': min(damage_dealt.get(2, 0), initial_counts.get(2, 0))
     }
     
-    # Update turn state
-    turns = dict(game_state.turns)
+    return Tile(position=tile.position, units=surviving_units), combat_record
+
+def _commit_combats(game_state: GameState,
+                    updates: Dict[Tuple[int, int], Tile],
+                    combat_records: List[Dict[str, Any]]) -> GameState:
     current_turn = game_state.current_turn
     current_turn_state = game_state.turns[current_turn]
+    world = game_state.world.update(updates)
+    tally = game_state.board_tally.updated(world, game_state.world, updates)
     
     # Update player states using from_state
     new_player_one = PlayerState.from_state(
         current_turn_state.player_one,
         turn_model_output={
             **current_turn_state.player_one.turn_model_output,
-            'combats': [*current_turn_state.player_one.turn_model_output.get('combats', []), combat_record]
+            'combats': [*current_turn_state.player_one.turn_model_output.get('combats', []), *combat_records]
         }
     )
 
@@ -69,34 +68,47 @@ def combat_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         current_turn_state.player_two,
         turn_model_output={
             **current_turn_state.player_two.turn_model_output,
-            'combats': [*current_turn_state.player_two.turn_model_output.get('combats', []), combat_record]
+            'combats': [*current_turn_state.player_two.turn_model_output.get('combats', []), *combat_records]
         }
     )
 
-    new_turn_state = TurnState(
-        turn_number=current_turn_state.turn_number,
+    new_turn_state = replace(
+        current_turn_state,
         world=world,
         player_one=new_player_one,
         player_two=new_player_two,
-        combat_actions=[*current_turn_state.combat_actions, combat_record]
+        combat_actions=[*current_turn_state.combat_actions, *combat_records]
     )
-    
-    turns[current_turn] = new_turn_state
+    turns = game_state.turns.set(current_turn, new_turn_state)
     
     # Use builder to create new state
     return (GameState.builder(game_state)
-            .with_world(world)
+            .with_world(world, tally)
             .with_turns(turns)
             .build())
+
+def combat_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
+    result = _resolve_combat(game_state.world[hex_pos], hex_pos)
+    if result is None:
+        return game_state
     
-    # Log combat results
-    logger.log_combat(
-        game_state,
-        hex_pos,
-        damage_dealt
-    )
-    
-    return GameState.from_state(game_state, world=world, turns=turns) 
+    tile, combat_record = result
+    return _commit_combats(game_state, {hex_pos: tile}, [combat_record])
+
+def combat_phase(game_state: GameState) -> GameState:
+    """Resolves combat in every contested hex and commits the results as one state transition."""
+    updates = {}
+    combat_records = []
+    # Only contested hexes can fight; visit them in world order so dice rolls match the per-hex order
+    for hex_pos in game_state.in_world_order(game_state.board_tally.contested):
+        result = _resolve_combat(game_state.world[hex_pos], hex_pos)
+        if result is not None:
+            updates[hex_pos], combat_record = result
+            combat_records.append(combat_record)
+    
+    if not combat_records:
+        return game_state
+    return _commit_combats(game_state, updates, combat_records)
 
 def main():
     # Create a test configuration similar to input_action
@@ -1,118 +1,98 @@
-from typing import Dict, Any
-from game_state import GameState
+from typing import Dict, Any, Optional
+from game_state import GameState, TurnState
 from input_action import get_input_action
-from move_action import move_action
-from combat_action import combat_action
-from spawn_action import spawn_action
-from turn_end_action import turn_end_action
+from move_action import move_phase
+from combat_action import combat_phase
+from spawn_action import spawn_phase
+from turn_end_action import turn_end_phase
+from turn_history import compact_turn
+from output_sink import GAME_END, OutputSink, get_sink
 from utils.event_logger import GameEventLogger
-
-def turn(game_state: GameState) -> GameState:
+from utils.timing import PhaseTimings, collecting, timed
+from utils.metrics import metrics
+
+def turn(game_state: GameState, sink: Optional[OutputSink] = None) -> GameState:
+    """
+    Plays one turn, reporting each stage to sink (the console by default).
+    Each stage is timed into the collecting PhaseTimings (see utils.timing).
+    """
+    sink = get_sink(sink)
     logger = GameEventLogger()
-    new_state = game_state
+    new_state = game_state.begin_turn()
     
     # Log turn start
-    logger.log_action("turn_start", new_state)
-    print("\n\n" + "=" * 60)
-    # print("-" * 40)
-    print("Turn: " + str(new_state.current_turn))
-
+    with timed("logging"):
+        logger.log_action("turn_start", new_state)
+    with timed("output"):
+        sink.emit("turn_start", new_state)
     
     # Get input actions first
-    temp_state = get_input_action(new_state, (0, 0))
+    with timed("input"):
+        temp_state = get_input_action(new_state, (0, 0))
     if not new_state.is_valid_state_change(temp_state, 'input'):
         logger.log_error("input_validation", ValueError("Invalid state change"), new_state)
         return new_state
     new_state = temp_state
 
-    # Print input actions summary
-    current_turn_state = new_state.turns[new_state.current_turn]
-    print("\nInput actions this turn:")
-    print("-" * 40)
-    print("p_id\tsrc\tdest\tunits")
-    if current_turn_state.input_moves:
-        for pos, moves in current_turn_state.input_moves.items():
-            for player_id, player_moves in moves.items():
-                for move in player_moves:
-                    print(f"{player_id}\t{pos}\t{move['destination']}\t{move['units']}")
-    else:
-        print("No input actions")
+    with timed("output"):
+        sink.emit("input", new_state)
 
     # Process all moves first
-    for hex_pos in game_state.world.keys():
-        temp_state = move_action(new_state, hex_pos)
-        if not new_state.is_valid_state_change(temp_state, 'move'):
-            logger.log_error("move_validation", ValueError("Invalid state change"), new_state, {"position": hex_pos})
-            continue
+    with timed("move"):
+        temp_state = move_phase(new_state)
+    if not new_state.is_valid_state_change(temp_state, 'move'):
+        logger.log_error("move_validation", ValueError("Invalid state change"), new_state)
+    else:
         new_state = temp_state
 
-    # Print moves summary
-    current_turn_state = new_state.turns[new_state.current_turn]
-    print("\nMoves this turn:")
-    print("-" * 40)
-    print("p_id\tsrc\tdest\tunits")
-    if current_turn_state.move_actions:
-        for move in current_turn_state.move_actions:
-            print(f"{move['player_id']}\t{move['source']}\t{move['destination']}\t{move['units']}")
+    with timed("output"):
+        sink.emit("move", new_state)
 
     # Then process all combat
-    for hex_pos in game_state.world.keys():
-        temp_state = combat_action(new_state, hex_pos)
-        if not new_state.is_valid_state_change(temp_state, 'combat'):
-            logger.log_error("combat_validation", ValueError("Invalid state change"), new_state, {"position": hex_pos})
-            continue
+    with timed("combat"):
+        temp_state = combat_phase(new_state)
+    if not new_state.is_valid_state_change(temp_state, 'combat'):
+        logger.log_error("combat_validation", ValueError("Invalid state change"), new_state)
+    else:
         new_state = temp_state
 
-    # Print combat summary
-    current_turn_state = new_state.turns[new_state.current_turn]
-    print("\nCombats this turn:")
-    print("-" * 40)
-    print("pos\tp1_cas\tp2_cas")
-    if current_turn_state.combat_actions:
-        for combat in current_turn_state.combat_actions:
-            print(f"{combat['position']}\t{combat['player_1_casualties']}\t{combat['player_2_casualties']}")
+    with timed("output"):
+        sink.emit("combat", new_state)
 
     # Then process all spawns
-    for hex_pos in game_state.world.keys():
-        temp_state = spawn_action(new_state, hex_pos)
-        if not new_state.is_valid_state_change(temp_state, 'spawn'):
-            print(f"Warning: Invalid state change detected during spawn phase at {hex_pos}")
-            continue
+    with timed("spawn"):
+        temp_state = spawn_phase(new_state)
+    if not new_state.is_valid_state_change(temp_state, 'spawn'):
+        print("Warning: Invalid state change detected during spawn phase")
+    else:
         new_state = temp_state
     
-    # Print spawn summary
-    current_turn_state = new_state.turns[new_state.current_turn]
-    print(f"\nSpawns for turn {current_turn_state.turn_number}:")
-    print("-" * 40)
-    print("p_id\tposition")
-    if current_turn_state.spawn_actions:
-        for spawn in current_turn_state.spawn_actions:
-            print(f"{spawn['player_id']}\t{spawn['position']}")
+    with timed("output"):
+        sink.emit("spawn", new_state)
     
-    # Finally process all turn end actions
-    for hex_pos in game_state.world.keys():
-        temp_state = turn_end_action(new_state, hex_pos)
-        if not new_state.is_valid_state_change(temp_state, 'turn_end'):
-            print(f"Warning: Invalid state change detected during turn end phase at {hex_pos}")
-            continue
+    # Finally process the turn end
+    with timed("turn_end"):
+        temp_state = turn_end_phase(new_state)
+    if not new_state.is_valid_state_change(temp_state, 'turn_end'):
+        print("Warning: Invalid state change detected during turn end phase")
+    else:
         new_state = temp_state
     
     # Log turn end
-    logger.log_action("turn_end", new_state)
+    with timed("logging"):
+        logger.log_action("turn_end", new_state)
     
-    # Print world summary
-    new_state.print_world()
-
-    # Print scores
-    print("\nScores:")
-    print("-" * 40)
-    print("Player\tScore")
-    for player_id, score in new_state.scores.items():
-        print(f"{player_id}\t{score}")
-    print()
+    # World and scores
+    with timed("output"):
+        sink.emit("turn_end", new_state)
 
     # Log the final turn state
-    logger.log_turn_state(new_state, new_state.turns[new_state.current_turn])
+    with timed("logging"):
+        logger.log_turn_state(new_state, new_state.turns[new_state.current_turn])
+
+    # Keep only the deltas of the finished turn (and its world on keyframe turns)
+    with timed("compact"):
+        new_state = compact_turn(new_state, new_state.current_turn)
     
     # Update turn counter using from_state
     return GameState.from_state(new_state, current_turn=new_state.current_turn + 1)
@@ -121,14 +101,46 @@ def turn(game_state: GameState) -> GameState:
 def create_game_state(config: Dict[str, Any]) -> GameState:
     return GameState.from_config(config)
 
-def run_game(game_state: GameState) -> GameState:
+def run_game(game_state: GameState,
+             backend: str = "dict",
+             sink: Optional[OutputSink] = None,
+             timings: Optional[PhaseTimings] = None) -> GameState:
+    """
+    Runs turns until the game is over.
+    backend selects the phase resolver: "dict" resolves each hex in turn,
+    "numpy" resolves every phase for the whole board at once (see vector_engine).
+    sink receives the turn events (see output_sink); pass NullSink() to run headless.
+    timings, if given, collects how long each stage of each turn took; the
+    stage times are also added to the metrics registry (see utils.metrics).
+    """
+    sink = get_sink(sink)
     logger = GameEventLogger()
     logger.log_action("game_start", game_state)
 
-    while game_state.game_status != "game_over":
-        game_state = turn(game_state)
+    if backend == "numpy":
+        from vector_engine import turn as turn_fn
+    elif backend == "dict":
+        turn_fn = turn
+    else:
+        raise ValueError(f"Unknown engine backend: {backend}")
+
+    game_timings = PhaseTimings()
+    with collecting(game_timings):
+        while game_state.game_status != "game_over":
+            with timed("turn"):
+                game_state = turn_fn(game_state, sink)
+    
+    if timings is not None:
+        timings.merge(game_timings)
+    turns = game_timings.phases["turn"].count if "turn" in game_timings.phases else 0
+    metrics.inc("engine_turns_total", turns, help_text="Turns played")
+    metrics.inc("engine_games_total", help_text="Games played to the end")
+    metrics.observe_timings("turn_stage_seconds", game_timings, help_text="Time spent in each stage of a turn")
     
     logger.log_action("game_end", game_state)
+    logger.flush()
+    sink.emit(GAME_END, game_state)
+    sink.flush()
     return game_state
 
 def main():
@@ -1,8 +1,18 @@
+import cProfile
+import json
+import random
 import yaml
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from game_state import GameState
 from engine import run_game
+from replay import ReplaySink
+from utils.llm import get_client
+from utils.cassette import get_cassette
+from utils.timing import PhaseTimings
+from utils.metrics import MetricsExporter, metrics
+from utils.rate_limit import RequestScheduler, set_scheduler
 from itertools import combinations
 
 def load_experiment_config(config_path: str) -> Dict[str, Any]:
@@ -25,13 +35,89 @@ def setup_experiment_environment(experiment_config: Dict[str, Any]) -> Path:
     experiment_name = experiment_config['experiment_name']
     results_dir = Path('results') / experiment_name
     results_dir.mkdir(parents=True, exist_ok=True)
+    (results_dir / 'replays').mkdir(exist_ok=True)
+    (results_dir / 'profiles').mkdir(exist_ok=True)
 
     return results_dir
 
-def run_experiment(experiment_config: Dict[str, Any], results_dir: Path) -> List[GameState]:
+_in_worker = False
+
+def rate_limited_scheduler(experiment_config: Dict[str, Any], workers: int = 1) -> Optional[RequestScheduler]:
+    """
+    A scheduler for one of workers processes, with an even share of the
+    experiment's requests_per_minute and tokens_per_minute; None when the
+    config sets neither.
+    """
+    requests_per_minute = experiment_config.get('requests_per_minute')
+    tokens_per_minute = experiment_config.get('tokens_per_minute')
+    if not (requests_per_minute or tokens_per_minute):
+        return None
+    return RequestScheduler(
+        requests_per_minute=requests_per_minute / workers if requests_per_minute else None,
+        tokens_per_minute=tokens_per_minute / workers if tokens_per_minute else None,
+        max_retries=experiment_config.get('max_retries', 4)
+    )
+
+def _init_worker(experiment_config: Optional[Dict[str, Any]] = None, workers: int = 1) -> None:
+    """Runs once in each worker process, before its first game."""
+    global _in_worker
+    _in_worker = True
+    scheduler = rate_limited_scheduler(experiment_config or {}, workers)
+    if scheduler is not None:
+        set_scheduler(scheduler)
+    # Forked workers inherit the parent's random state; give each its own dice
+    random.seed()
+    try:
+        get_client()
+    except Exception:
+        # No API credentials: call_llm_api reports the error on each call
+        pass
+
+def play_game(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Plays one (matchup, iteration) job and returns its result summary."""
+    initial_state = GameState.from_config({
+        'board_size': 5,
+        'max_turns': 5,
+        'num_players': 2,
+        'end_criteria': {'type': 'elimination'},
+        'game_id': job['game_id'],
+        'player_one_config': job['player_one_config'],
+        'player_two_config': job['player_two_config'],
+    })
+    # Run the game, recording a binary replay of it and timing each turn stage
+    timings = PhaseTimings()
+    profile_path = job.get('profile_path')
+    if profile_path:
+        profiler = cProfile.Profile()
+        final_state = profiler.runcall(run_game, initial_state, sink=ReplaySink(job['replay_path']), timings=timings)
+        profiler.dump_stats(profile_path)
+    else:
+        final_state = run_game(initial_state, sink=ReplaySink(job['replay_path']), timings=timings)
+    cassette = get_cassette()
+    if cassette is not None:
+        # Worker processes exit without running atexit handlers
+        cassette.flush()
+    return {
+        'iteration': job['iteration'],
+        'final_scores': final_state.scores,
+        'player_one_name': job['player_one_name'],
+        'player_two_name': job['player_two_name'],
+        'game_id': job['game_id'],
+        'timings': timings.to_dict(),
+        # A worker's metrics go back to the parent, which exports them
+        **({'metrics': metrics.drain()} if _in_worker else {}),
+    }
+
+def build_jobs(experiment_config: Dict[str, Any], results_dir: Path) -> List[Dict[str, Any]]:
+    """
+    One job per (matchup, iteration), ordered by matchup then iteration.
+    Games whose id is listed under profile_games in the experiment config
+    get a cProfile dump in results_dir/profiles.
+    """
     iterations = experiment_config.get('iterations', 1)
+    profile_games = set(experiment_config.get('profile_games') or [])
     player_configs = experiment_config.get('player_configs', [])
-    experiment_results = []
+    jobs = []
 
     # Generate all possible pairs of player configurations
     player_pairs = list(combinations(player_configs, 2))
@@ -39,36 +125,67 @@ def run_experiment(experiment_config: Dict[str, Any], results_dir: Path) -> List
     for pair_idx, (player_one_config, player_two_config) in enumerate(player_pairs, start=1):
         player_one_name = player_one_config.get('name', f"Player_{pair_idx}_1")
         player_two_name = player_two_config.get('name', f"Player_{pair_idx}_2")
-        print(f"\nRunning games between {player_one_name} and {player_two_name}")
-        matchup_results = []
 
         # Update the player configs to match the new format if needed
         player_one_config = preprocess_player_config(player_one_config)
         player_two_config = preprocess_player_config(player_two_config)
 
         for i in range(iterations):
-            print(f"Running iteration {i+1}/{iterations}")
-            # Create initial game state with the experiment's configurations
-            initial_state = GameState.from_config({
-                'board_size': 5,
-                'max_turns': 5,
-                'num_players': 2,
-                'end_criteria': {'type': 'elimination'},
-                'player_one_config': player_one_config,
-                'player_two_config': player_two_config,
-            })
-            # Run the game
-            final_state = run_game(initial_state)
-            # Collect results
-            matchup_results.append({
+            game_id = f"{player_one_name}_vs_{player_two_name}_{i + 1}"
+            jobs.append({
                 'iteration': i + 1,
-                'final_scores': final_state.scores,
+                'game_id': game_id,
                 'player_one_name': player_one_name,
                 'player_two_name': player_two_name,
+                'player_one_config': player_one_config,
+                'player_two_config': player_two_config,
+                'replay_path': str(results_dir / 'replays' / f"{game_id}.hxr"),
+                'profile_path': str(results_dir / 'profiles' / f"{game_id}.prof") if game_id in profile_games else None,
             })
-            experiment_results.append(final_state)
-        # Save the results for this matchup
+    return jobs
+
+def run_experiment(experiment_config: Dict[str, Any], results_dir: Path) -> List[Dict[str, Any]]:
+    """
+    Plays every job from build_jobs and saves one results file per matchup.
+    With workers > 1 in the experiment config, jobs are spread over that many
+    worker processes, which send back only the result summaries.
+    While it runs, metrics.prom and metrics.json in results_dir are rewritten
+    every metrics_interval seconds (see utils.metrics).
+    """
+    jobs = build_jobs(experiment_config, results_dir)
+    workers = experiment_config.get('workers', 1)
+    exporter = MetricsExporter(results_dir, interval=experiment_config.get('metrics_interval', 15.0)).start()
+    try:
+        if workers > 1:
+            print(f"\nRunning {len(jobs)} games on {workers} worker processes")
+            experiment_results = []
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(experiment_config, workers)) as executor:
+                # map returns the summaries in job order
+                for result in executor.map(play_game, jobs):
+                    metrics.merge(result.pop('metrics'))
+                    experiment_results.append(result)
+        else:
+            scheduler = rate_limited_scheduler(experiment_config)
+            if scheduler is not None:
+                set_scheduler(scheduler)
+            experiment_results = []
+            for job in jobs:
+                if job['iteration'] == 1:
+                    print(f"\nRunning games between {job['player_one_name']} and {job['player_two_name']}")
+                print(f"Running iteration {job['iteration']}/{experiment_config.get('iterations', 1)}")
+                experiment_results.append(play_game(job))
+    finally:
+        exporter.stop()
+        if workers <= 1:
+            set_scheduler(None)
+
+    # Save the results for each matchup
+    matchups = {}
+    for result in experiment_results:
+        matchups.setdefault((result['player_one_name'], result['player_two_name']), []).append(result)
+    for (player_one_name, player_two_name), matchup_results in matchups.items():
         save_game_result(matchup_results, results_dir, player_one_name, player_two_name)
+    save_timings(experiment_results, results_dir)
     return experiment_results
 
 def save_game_result(matchup_results: List[Dict], results_dir: Path, player_one_name: str, player_two_name: str):
@@ -79,20 +196,36 @@ def save_game_result(matchup_results: List[Dict], results_dir: Path, player_one_
     matchup_path = results_dir / matchup_filename
 
     with open(matchup_path, 'w') as f:
-        yaml.dump(matchup_results, f)
+        # Stage timings go to timings.json instead (see save_timings)
+        yaml.dump([{k: v for k, v in result.items() if k != 'timings'} for result in matchup_results], f)
+
+def save_timings(experiment_results: List[Dict[str, Any]], results_dir: Path) -> PhaseTimings:
+    """
+    Writes timings.json: the stage timing histograms of each game and of the
+    whole experiment. Returns the experiment totals.
+    """
+    experiment_timings = PhaseTimings()
+    games = {}
+    for result in experiment_results:
+        experiment_timings.merge(PhaseTimings.from_dict(result['timings']))
+        games[result['game_id']] = result['timings']
+
+    with open(results_dir / 'timings.json', 'w') as f:
+        json.dump({'experiment': experiment_timings.to_dict(), 'games': games}, f, indent=2)
+    return experiment_timings
 
-def save_experiment_results(experiment_results: List[GameState], results_dir: Path):
+def save_experiment_results(experiment_results: List[Dict[str, Any]], results_dir: Path):
     """
     Saves the overall experiment results to a file.
     """
     experiment_results_data = []
 
-    for idx, game_state in enumerate(experiment_results, start=1):
+    for idx, result in enumerate(experiment_results, start=1):
         experiment_results_data.append({
             'game_number': idx,
-            'final_scores': game_state.scores,
-            'player_one_name': game_state.player_one_config.get('name'),
-            'player_two_name': game_state.player_two_config.get('name'),
+            'final_scores': result['final_scores'],
+            'player_one_name': result['player_one_name'],
+            'player_two_name': result['player_two_name'],
         })
 
     experiment_results_path = results_dir / 'experiment_results.yaml'
@@ -149,8 +282,8 @@ def main():
         print(f"Error running experiment: {e}")
 
     # Verify that the game results have been collected
-    for idx, game_state in enumerate(experiment_results, start=1):
-        print(f"Game {idx}: Final Scores - {game_state.scores}")
+    for idx, result in enumerate(experiment_results, start=1):
+        print(f"Game {idx}: Final Scores - {result['final_scores']}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Dict, FrozenSet, List, Set, Tuple, Any, Optional
 from enum import Enum
+from utils.pmap import PMap
+from hex_grid import HexTopology, get_topology
 
 
 @dataclass(frozen=True)
@@ -24,7 +26,7 @@ class Tile:
 
 @dataclass(frozen=True)
 class PlayerState:
-    name: str
+    name: str = ""
     player_config: Dict[str, Any] = field(default_factory=dict)
     turn_msg_chain: List[Dict[str, str]] = field(default_factory=list)
     turn_model_output: Dict[str, Any] = field(default_factory=lambda: {'moves': []})
@@ -51,6 +53,11 @@ class TurnState:
     combat_actions: List[Dict[str, Any]] = field(default_factory=list)  # Structure: [{'position': (x,y), 'player_1_casualties': n, 'player_2_casualties': n}, ...]
     scores: Dict[int, int] = field(default_factory=lambda: {1: 0, 2: 0})  # Added scores field
 
+    def __post_init__(self):
+        # Store the world as a persistent map so each turn shares unchanged tiles
+        if not isinstance(self.world, PMap):
+            object.__setattr__(self, 'world', PMap(self.world))
+
 @dataclass(frozen=True)
 class SpawnStateChange:
     world_updates: Dict[Tuple[int, int], Tile]
@@ -61,6 +68,97 @@ class CombatStateChange:
     world_updates: Dict[Tuple[int, int], Tile]
     turn_state_update: TurnState
 
+def _tile_unit_counts(tile: Tile) -> Dict[int, int]:
+    counts = {}
+    for unit in tile.units:
+        counts[unit.player_id] = counts.get(unit.player_id, 0) + 1
+    return counts
+
+@dataclass(frozen=True)
+class BoardTally:
+    """Per-player unit and controlled hex counts, plus an index of occupied hexes, for one world."""
+    world: Any = field(repr=False, compare=False)  # The world these counts describe
+    unit_counts: Dict[int, int] = field(default_factory=dict)
+    controlled_hexes: Dict[int, int] = field(default_factory=dict)
+    occupied: Dict[int, FrozenSet[Tuple[int, int]]] = field(default_factory=dict)  # player_id -> hexes holding that player's units
+    contested: FrozenSet[Tuple[int, int]] = frozenset()  # Hexes holding units of more than one player
+    counts: Any = field(default=None, repr=False, compare=False)  # (players, width, height) unit array, when the numpy backend built this tally
+
+    @classmethod
+    def from_world(cls, world: Dict[Tuple[int, int], Tile], num_players: int) -> 'BoardTally':
+        """Full recompute over every tile."""
+        unit_counts = {i: 0 for i in range(1, num_players + 1)}
+        controlled_hexes = {i: 0 for i in range(1, num_players + 1)}
+        occupied = {i: set() for i in range(1, num_players + 1)}
+        contested = set()
+        for pos, tile in world.items():
+            tile_counts = _tile_unit_counts(tile)
+            for player_id, count in tile_counts.items():
+                unit_counts[player_id] = unit_counts.get(player_id, 0) + count
+                occupied.setdefault(player_id, set()).add(pos)
+            if len(tile_counts) == 1:
+                (owner,) = tile_counts
+                controlled_hexes[owner] = controlled_hexes.get(owner, 0) + 1
+            elif len(tile_counts) > 1:
+                contested.add(pos)
+        occupied = {player_id: frozenset(hexes) for player_id, hexes in occupied.items()}
+        return cls(world, unit_counts, controlled_hexes, occupied, frozenset(contested))
+
+    def updated(self,
+                new_world: Dict[Tuple[int, int], Tile],
+                old_world: Dict[Tuple[int, int], Tile],
+                updates: Dict[Tuple[int, int], Tile]) -> 'BoardTally':
+        """Adjusts the counts for the changed tiles only."""
+        unit_counts = dict(self.unit_counts)
+        controlled_hexes = dict(self.controlled_hexes)
+        # Collect the changes and rebuild each changed set once
+        vacated: Dict[int, Set[Tuple[int, int]]] = {}
+        entered: Dict[int, Set[Tuple[int, int]]] = {}
+        no_longer_contested = set()
+        newly_contested = set()
+        for pos, new_tile in updates.items():
+            old_counts = _tile_unit_counts(old_world[pos])
+            new_counts = _tile_unit_counts(new_tile)
+            for sign, tile_counts in ((-1, old_counts), (1, new_counts)):
+                for player_id, count in tile_counts.items():
+                    unit_counts[player_id] = unit_counts.get(player_id, 0) + sign * count
+                if len(tile_counts) == 1:
+                    (owner,) = tile_counts
+                    controlled_hexes[owner] = controlled_hexes.get(owner, 0) + sign
+
+            for player_id in old_counts.keys() - new_counts.keys():
+                vacated.setdefault(player_id, set()).add(pos)
+            for player_id in new_counts.keys() - old_counts.keys():
+                entered.setdefault(player_id, set()).add(pos)
+            if len(new_counts) > 1 and pos not in self.contested:
+                newly_contested.add(pos)
+            elif len(new_counts) <= 1 and pos in self.contested:
+                no_longer_contested.add(pos)
+
+        occupied = dict(self.occupied)
+        for player_id in vacated.keys() | entered.keys():
+            hexes = occupied.get(player_id, frozenset())
+            occupied[player_id] = (hexes - vacated.get(player_id, set())) | entered.get(player_id, set())
+        contested = self.contested
+        if newly_contested or no_longer_contested:
+            contested = (contested - no_longer_contested) | newly_contested
+        return BoardTally(new_world, unit_counts, controlled_hexes, occupied, contested)
+
+    def held_hexes(self) -> List[Tuple[int, int]]:
+        """Hexes holding units of exactly one player."""
+        return [
+            pos
+            for hexes in self.occupied.values()
+            for pos in hexes
+            if pos not in self.contested
+        ]
+
+    def scores(self) -> Dict[int, int]:
+        return {
+            player_id: count + 2 * self.controlled_hexes.get(player_id, 0)
+            for player_id, count in self.unit_counts.items()
+        }
+
 @dataclass(frozen=True)
 class GameState:
     world: Dict[Tuple[int, int], Tile]
@@ -73,6 +171,19 @@ class GameState:
     player_two_config: Dict[str, Any]
     turns: Dict[int, TurnState]
     scores: Dict[int, int] = field(default_factory=lambda: {1: 0, 2: 0})  # Added scores field
+    board_size: int = 5
+    game_id: str = ""  # Names the game in recordings, see utils.cassette
+    keyframe_interval: int = 10  # Finished turns keep a full world every keyframe_interval turns, see turn_history
+    debug_checks: bool = False  # Cross-check the incremental tally against a full recompute on every phase
+    tally: Optional[BoardTally] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        # world and turns are persistent maps: updating one tile or one turn shares
+        # everything else with the previous state instead of copying it
+        if not isinstance(self.world, PMap):
+            object.__setattr__(self, 'world', PMap(self.world))
+        if not isinstance(self.turns, PMap):
+            object.__setattr__(self, 'turns', PMap(self.turns))
 
     @classmethod
     def from_config(cls, config: Dict[str, Any]) -> 'GameState':
@@ -99,41 +210,48 @@ class GameState:
                 
                 world[pos] = Tile(Position(x, y), units)
         
-        # Create all TurnStates from 1 to max_turns
-        max_turns = config.get('max_turns', 10)
-        turns = {}
-        player_one_name = config.get('player_one_config', {}).get('name', 'Player 1')
-        player_two_name = config.get('player_two_config', {}).get('name', 'Player 2')
-
-        for turn_num in range(1, max_turns + 1):
-            turns[turn_num] = TurnState(
-                turn_number=turn_num,
-                world=world,
-                player_one=PlayerState(
-                    name=player_one_name,  # Set player one name
-                    player_config=config.get('player_one_config', {}),
-                    turn_prompt_config=config.get('player_one_config', {}).get('turn_prompt_config', [])
-                ),
-                player_two=PlayerState(
-                    name=player_two_name,  # Set player two name
-                    player_config=config.get('player_two_config', {}),
-                    turn_prompt_config=config.get('player_two_config', {}).get('turn_prompt_config', [])
-                )
-            )
-
+        # TurnStates are created as each turn begins, so only turn 1 exists up front
         return cls(
-            world=world,
+            world=PMap(world),
             current_turn=1,
-            max_turns=max_turns,
+            max_turns=config.get('max_turns', 10),
             num_players=config.get('num_players', 2),
             game_status="in_progress",
             game_end_criteria=config.get('end_criteria', {'type': 'elimination'}),
             player_one_config=config.get('player_one_config', {}),
             player_two_config=config.get('player_two_config', {}),
-            turns=turns,
-            scores={i: 0 for i in range(1, config.get('num_players', 2) + 1)}  # Initialize scores
+            turns=PMap(),
+            scores={i: 0 for i in range(1, config.get('num_players', 2) + 1)},  # Initialize scores
+            board_size=size,
+            game_id=config.get('game_id', ""),
+            keyframe_interval=config.get('history_keyframe_interval', 10),
+            debug_checks=config.get('debug_checks', False)
+        ).begin_turn()
+
+    def new_turn_state(self, turn_number: int) -> TurnState:
+        """Creates a fresh TurnState for turn_number from the player configs."""
+        return TurnState(
+            turn_number=turn_number,
+            world=self.world,
+            player_one=PlayerState(
+                name=self.player_one_config.get('name', 'Player 1'),
+                player_config=self.player_one_config,
+                turn_prompt_config=self.player_one_config.get('turn_prompt_config', [])
+            ),
+            player_two=PlayerState(
+                name=self.player_two_config.get('name', 'Player 2'),
+                player_config=self.player_two_config,
+                turn_prompt_config=self.player_two_config.get('turn_prompt_config', [])
+            )
         )
 
+    def begin_turn(self) -> 'GameState':
+        """Returns a state whose turns include the current turn, creating it on demand."""
+        if self.current_turn in self.turns:
+            return self
+        turns = self.turns.set(self.current_turn, self.new_turn_state(self.current_turn))
+        return GameState.from_state(self, turns=turns)
+
     @classmethod
     def from_state(cls, state: 'GameState', **updates) -> 'GameState':
         # Create new state from existing one, with optional updates
@@ -141,9 +259,26 @@ class GameState:
         state_dict.update(updates)
         return cls(**state_dict)
 
+    @property
+    def topology(self) -> HexTopology:
+        """Cached neighbour and distance tables for this board size."""
+        return get_topology(self.board_size, self.board_size)
+
+    @property
+    def board_tally(self) -> BoardTally:
+        """Unit and control counts for the current world, recomputed only when missing or stale."""
+        if self.tally is None or self.tally.world is not self.world:
+            object.__setattr__(self, 'tally', BoardTally.from_world(self.world, self.num_players))
+        return self.tally
+
+    def in_world_order(self, positions) -> List[Tuple[int, int]]:
+        """Sorts hex positions into the order the world iterates them."""
+        return sorted(positions, key=self.world.index_of)
+
     def is_valid_state_change(self, new_state: 'GameState', phase: Optional[str] = None) -> bool:
         # TODO: Implement validation logic for each phase
-        # For now, always return True
+        if new_state.debug_checks and new_state.tally is not None and new_state.tally.world is new_state.world:
+            return new_state.tally == BoardTally.from_world(new_state.world, new_state.num_players)
         return True
 
     @classmethod
@@ -152,12 +287,9 @@ class GameState:
         return GameStateBuilder(state)
 
     def apply_spawn_change(self, change: SpawnStateChange) -> 'GameState':
-        world = dict(self.world)
-        world.update(change.world_updates)
-        
-        turns = dict(self.turns)
-        turns[self.current_turn] = change.turn_state_update
-        
+        world = self.world.update(change.world_updates)
+        turns = self.turns.set(self.current_turn, change.turn_state_update)
+
         return GameState.from_state(self, world=world, turns=turns)
 
     def apply_event(self, event: 'GameEvent') -> 'GameState':
@@ -168,8 +300,8 @@ class GameState:
         # ... etc
         
     def _apply_spawn_event(self, data: Dict[str, Any]) -> 'GameState':
-        world = dict(self.world)
-        turns = dict(self.turns)
+        world = self.world
+        turns = self.turns
         # Apply specific spawn changes
         return GameState.from_state(self, world=world, turns=turns)
 
@@ -215,33 +347,19 @@ class GameState:
         Calculate scores for each player based on:
         - 2 points for each fully controlled hex
         - 1 point for each unit
+        The counts come from the incrementally maintained board tally.
         """
-        scores = {i: 0 for i in range(1, self.num_players + 1)}
-        
-        for tile in self.world.values():
-            # Count units per player in this tile
-            units_per_player = {i: 0 for i in range(1, self.num_players + 1)}
-            for unit in tile.units:
-                units_per_player[unit.player_id] += 1
-                # Add 1 point for each unit
-                scores[unit.player_id] += 1
-            
-            # Check if any player fully controls the hex
-            players_present = [pid for pid, count in units_per_player.items() if count > 0]
-            if len(players_present) == 1:  # Only one player has units here
-                # Add 2 points for hex control
-                scores[players_present[0]] += 2
-                
-        return scores
+        return self.board_tally.scores()
 
 class GameStateBuilder:
     def __init__(self, original_state: GameState):
         self._original = original_state
         self._changes = {}
     
-    def with_world(self, world: Dict[Tuple[int, int], Tile]) -> 'GameStateBuilder':
-        """Updates the world state"""
+    def with_world(self, world: Dict[Tuple[int, int], Tile], tally: Optional[BoardTally] = None) -> 'GameStateBuilder':
+        """Updates the world state, along with its tally when the caller kept it up to date"""
         self._changes['world'] = world
+        self._changes['tally'] = tally
         return self
     
     def with_turns(self, turns: Dict[int, TurnState]) -> 'GameStateBuilder':
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Tuple
+
+# Boards use an "odd-q" offset layout: (x, y) is column x, row y, and odd
+# columns are shifted half a hex down. Each hex has up to six neighbours.
+
+_EVEN_COLUMN_OFFSETS = ((1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (0, 1))
+_ODD_COLUMN_OFFSETS = ((1, 1), (1, 0), (0, -1), (-1, 1), (-1, 0), (0, 1))
+
+
+def offset_to_axial(x: int, y: int) -> Tuple[int, int]:
+    """Converts odd-q offset coordinates to axial (q, r) coordinates."""
+    return x, y - (x - (x & 1)) // 2
+
+@dataclass(frozen=True)
+class HexTopology:
+    width: int
+    height: int
+    neighbors: Dict[Tuple[int, int], Tuple[Tuple[int, int], ...]]
+    neighbor_sets: Dict[Tuple[int, int], FrozenSet[Tuple[int, int]]]
+    axial: Dict[Tuple[int, int], Tuple[int, int]]
+
+    def __contains__(self, pos: Tuple[int, int]) -> bool:
+        return pos in self.axial
+
+    def is_adjacent(self, source: Tuple[int, int], destination: Tuple[int, int]) -> bool:
+        neighbor_set = self.neighbor_sets.get(source)
+        return neighbor_set is not None and destination in neighbor_set
+
+    def distance(self, source: Tuple[int, int], destination: Tuple[int, int]) -> int:
+        """Number of hex steps between two positions on the board."""
+        source_q, source_r = self.axial[source]
+        dest_q, dest_r = self.axial[destination]
+        dq, dr = dest_q - source_q, dest_r - source_r
+        return max(abs(dq), abs(dr), abs(dq + dr))
+
+    def is_legal_move(self, source: Tuple[int, int], destination: Tuple[int, int], movement_points: int = 1) -> bool:
+        if source == destination or source not in self.axial or destination not in self.axial:
+            return False
+        if movement_points == 1:
+            return destination in self.neighbor_sets[source]
+        return self.distance(source, destination) <= movement_points
+
+@lru_cache(maxsize=None)
+def get_topology(width: int, height: int) -> HexTopology:
+    """Builds (once per board size) the neighbour and coordinate tables for a width x height board."""
+    positions = [(x, y) for x in range(width) for y in range(height)]
+    neighbors = {}
+    for x, y in positions:
+        offsets = _ODD_COLUMN_OFFSETS if x & 1 else _EVEN_COLUMN_OFFSETS
+        neighbors[(x, y)] = tuple(
+            (x + dx, y + dy) for dx, dy in offsets
+            if 0 <= x + dx < width and 0 <= y + dy < height
+        )
+    return HexTopology(
+        width=width,
+        height=height,
+        neighbors=neighbors,
+        neighbor_sets={pos: frozenset(adjacent) for pos, adjacent in neighbors.items()},
+        axial={pos: offset_to_axial(*pos) for pos in positions}
+    )
@@ -1,7 +1,15 @@
-from typing import Dict, Tuple, Any
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple, Any, Optional
 from game_state import GameState, Tile, PlayerState, TurnState
-from utils.llm import create_message_chain, call_llm_api
+from utils.llm import LLMDeadlineExceeded, create_message_chain, call_llm_api, call_llm_api_with_deadline, hedge_delay
 from utils.prompt import generate_prompt_chain
+from utils.cassette import REPLAY, call_context, get_cassette
+from utils.timing import timed
+from utils.metrics import metrics
+from world_encoding import DEFAULT_ENCODING, encode_world
+from players import create_player
 import json
 from utils.logger import logger
 
@@ -70,13 +78,32 @@ def create_llm_world_representation(game_state: GameState, player_id: int) -> Di
 
 
 def get_ai_moves(game_state: GameState, player_id: int) -> Dict[str, Any]:
-    # Create game state representation
-    world_representation = create_llm_world_representation(game_state, player_id)
-    
+    # With a cassette (see utils.cassette), replays serve the recorded moves
+    # and recordings keep this turn's moves and LLM responses
+    cassette = get_cassette()
+    call_key = (game_state.game_id, game_state.current_turn, player_id)
+    if cassette is not None and cassette.mode == REPLAY:
+        recorded = cassette.lookup_moves(call_key)
+        if recorded is not None:
+            return recorded
+
+    with call_context(*call_key):
+        response = _request_ai_moves(game_state, player_id)
+    # Turns with no usable moves ({}) are recorded too, so a strict replay finds every turn
+    if cassette is not None and cassette.mode != REPLAY:
+        cassette.record_moves(call_key, response)
+    return response
+
+def _request_ai_moves(game_state: GameState, player_id: int) -> Dict[str, Any]:
     # Get current player state
     current_turn_state = game_state.turns[game_state.current_turn]
     player_state = current_turn_state.player_one if player_id == 1 else current_turn_state.player_two
 
+    # Create game state representation in the player's chosen encoding
+    encoding = player_state.player_config.get('world_encoding', DEFAULT_ENCODING)
+    with timed("encode_world"):
+        world_representation = encode_world(game_state, player_id, encoding)
+
     # Ensure prompt_configs is properly formatted
     prompt_configs = player_state.turn_prompt_config
     if not isinstance(prompt_configs, list):
@@ -86,40 +113,110 @@ def get_ai_moves(game_state: GameState, player_id: int) -> Dict[str, Any]:
     for config in prompt_configs:
         if not isinstance(config, dict) or 'prompt_filepath' not in config:
             raise ValueError("Each prompt config must be a dictionary with a 'prompt_filepath' key")
-        
-        if 'template_params' not in config:
-            config['template_params'] = {}
-        config['template_params']['world_representation'] = world_representation
+
+    # Add the world to copies of the configs: both players are prompted at
+    # the same time and may share config objects
+    prompt_configs = [
+        {**config, 'template_params': {**config.get('template_params', {}), 'world_representation': world_representation}}
+        for config in prompt_configs
+    ]
     
     # Generate prompt chain
-    prompt_chain = generate_prompt_chain(prompt_configs)
+    with timed("prompt"):
+        prompt_chain = generate_prompt_chain(prompt_configs)
 
-    # Create message chain from prompt chain
-    message_chain = create_message_chain(prompt_chain)
+        # Create message chain from prompt chain
+        message_chain = create_message_chain(prompt_chain)
     
-    # Get LLM response
-    response = call_llm_api(message_chain)
+    # Get LLM response, within the player's deadline if it has one
+    deadline = player_state.player_config.get('llm_deadline')
+    with timed("llm_call"):
+        if deadline is None:
+            response = call_llm_api(message_chain)
+        else:
+            try:
+                response = call_llm_api_with_deadline(message_chain, deadline, _hedge_after(player_state.player_config))
+            except LLMDeadlineExceeded:
+                return _fallback_moves(game_state, player_id, player_state.player_config)
     try:
-        response = json.loads(response)
+        with timed("parse"):
+            response = json.loads(response)
     except json.JSONDecodeError:
+        metrics.inc("ai_move_parse_failures_total", player=player_id, help_text="LLM responses that were not valid JSON")
         print("Error: LLM response is not a valid JSON.")
         # Optionally handle the error further, e.g., return an empty dictionary or raise an exception
         return {}
+    with timed("logging"):
+        logger.log_action(
+            "ai_move_generation",
+            game_state,
+            details={"player_id": player_id, "moves": response.get("moves", [])}
+        )
+    return response
+
+DEFAULT_FALLBACK_PLAYER = "greedy_expansion"
+
+def _hedge_after(player_config: Dict[str, Any]) -> Optional[float]:
+    """Seconds before a slow request is sent again: hedge_after, or the hedge_quantile of past latencies."""
+    if 'hedge_after' in player_config:
+        return player_config['hedge_after']
+    if 'hedge_quantile' in player_config:
+        return hedge_delay(player_config['hedge_quantile'])
+    return None
+
+def _fallback_moves(game_state: GameState, player_id: int, player_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Moves from the player's offline fallback_player strategy, for when the LLM misses its deadline."""
+    fallback_type = player_config.get('fallback_player', DEFAULT_FALLBACK_PLAYER)
+    fallback = create_player({**player_config, 'player_type': fallback_type})
+    if fallback.needs_network:
+        raise ValueError(f"fallback_player must be an offline strategy, not {fallback_type}")
+    print(f"Warning: player {player_id} missed its LLM deadline; using {fallback_type} moves")
+    metrics.inc("ai_move_fallbacks_total", player=player_id, help_text="Turns played by the fallback strategy after a missed deadline")
+    response = fallback.choose_moves(game_state, player_id)
     logger.log_action(
-        "ai_move_generation",
+        "ai_move_fallback",
         game_state,
-        details={"player_id": player_id, "moves": response.get("moves", [])}
+        details={"player_id": player_id, "fallback_player": fallback_type, "moves": response.get("moves", [])}
     )
     return response
 
+_player_executor: Optional[ThreadPoolExecutor] = None
+
+def _reset_player_executor() -> None:
+    global _player_executor
+    _player_executor = None
+
+if hasattr(os, 'register_at_fork'):
+    # A forked child has the executor object but none of its threads
+    os.register_at_fork(after_in_child=_reset_player_executor)
+
+def get_both_ai_moves(game_state: GameState) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Asks both players' strategies (see players.py) for their moves; returns
+    (player one moves, player two moves). Players that call the API are asked
+    at the same time.
+    """
+    global _player_executor
+    current_turn_state = game_state.turns[game_state.current_turn]
+    player_one = create_player(current_turn_state.player_one.player_config)
+    player_two = create_player(current_turn_state.player_two.player_config)
+    if not (player_one.needs_network or player_two.needs_network):
+        return player_one.choose_moves(game_state, 1), player_two.choose_moves(game_state, 2)
+
+    if _player_executor is None:
+        _player_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ai-moves")
+    # Each call runs in a copy of this context, so its stages are timed into this game
+    player_one_future = _player_executor.submit(contextvars.copy_context().run, player_one.choose_moves, game_state, 1)
+    player_two_future = _player_executor.submit(contextvars.copy_context().run, player_two.choose_moves, game_state, 2)
+    return player_one_future.result(), player_two_future.result()
+
 def get_input_action(game_state: GameState, cell_pos: Tuple[int, int]) -> GameState:
     # Get current turn state
     current_turn = game_state.current_turn
     current_turn_state = game_state.turns[current_turn]
 
-    # Get moves from both AIs
-    player_one_moves = get_ai_moves(game_state, 1)
-    player_two_moves = get_ai_moves(game_state, 2)
+    # Get moves from both AIs; they are merged in player order below
+    player_one_moves, player_two_moves = get_both_ai_moves(game_state)
     
     # Initialize all_moves dictionary
     all_moves = {}
@@ -146,6 +243,7 @@ def get_input_action(game_state: GameState, cell_pos: Tuple[int, int]) -> GameSt
                     )
 
     # Process and validate moves for each player
+    topology = game_state.topology
     for source, player_moves in [
         (1, player_one_moves.get('moves', [])), 
         (2, player_two_moves.get('moves', []))
@@ -155,6 +253,10 @@ def get_input_action(game_state: GameState, cell_pos: Tuple[int, int]) -> GameSt
             
             if source_pos not in game_state.world:
                 continue
+
+            # Drop moves that do not go to an adjacent hex
+            if not topology.is_legal_move(source_pos, tuple(move['destination'])):
+                continue
                 
             if source_pos not in all_moves:
                 all_moves[source_pos] = {1: [], 2: []}
@@ -199,8 +301,7 @@ def get_input_action(game_state: GameState, cell_pos: Tuple[int, int]) -> GameSt
     )
 
     # Update turns dictionary with new turn state
-    turns = dict(game_state.turns)
-    turns[current_turn] = new_turn_state
+    turns = game_state.turns.set(current_turn, new_turn_state)
     
     return (GameState.builder(game_state)
             .with_turns(turns)
@@ -1,18 +1,29 @@
-from typing import Dict, Tuple, Any
+from dataclasses import replace
+from typing import Dict, Tuple, Any, List
 from game_state import GameState, Tile, TurnState, PlayerState
 from utils.logger import logger
 
-def move_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
-    # Get current turn's state
-    current_turn = game_state.current_turn
-    turn_state = game_state.turns[current_turn]
-    # print(f"DEBUG - move_action - Current turn: {current_turn}")
-    
-    # Check if moves exist in input_moves for this hex
-    if hex_pos not in turn_state.input_moves:
-        return game_state
-    
-    world = dict(game_state.world)
+def _split_player_units(units, player_id: int, count: int):
+    # Take the first `count` units owned by player_id, keeping the rest in tile order
+    moving_units = []
+    remaining_units = []
+    for unit in units:
+        if unit.player_id == player_id and len(moving_units) < count:
+            moving_units.append(unit)
+        else:
+            remaining_units.append(unit)
+    return moving_units, remaining_units
+
+def _move_from_hex(game_state: GameState,
+                   hex_pos: Tuple[int, int],
+                   updates: Dict[Tuple[int, int], Tile]) -> List[Dict[str, Any]]:
+    """
+    Applies the input moves ordered from hex_pos, writing changed tiles into updates.
+    Tiles are read through updates so later hexes see the moves made earlier in the phase.
+    """
+    world = game_state.world
+    topology = game_state.topology
+    turn_state = game_state.turns[game_state.current_turn]
     moves = {
         1: turn_state.input_moves.get(hex_pos, {}).get(1, []),
         2: turn_state.input_moves.get(hex_pos, {}).get(2, [])
@@ -22,20 +33,23 @@ def move_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
     
     for player_id, player_moves in moves.items():
         for move in player_moves:
-            source_tile = world[hex_pos]
+            source_tile = updates.get(hex_pos) or world[hex_pos]
             dest_pos = move['destination']
             units_to_move = move['units']
             
-            if dest_pos not in world or len(source_tile.units) < units_to_move:
+            player_unit_count = sum(1 for unit in source_tile.units if unit.player_id == player_id)
+            if dest_pos not in world or player_unit_count < units_to_move:
+                continue
+            # Units have one movement point, so they can only reach adjacent hexes
+            if not topology.is_legal_move(hex_pos, dest_pos):
                 continue
             
-            moving_units = source_tile.units[:units_to_move]
-            remaining_units = source_tile.units[units_to_move:]
+            moving_units, remaining_units = _split_player_units(source_tile.units, player_id, units_to_move)
             
             # Update tiles
-            world[hex_pos] = Tile(position=source_tile.position, units=remaining_units)
-            dest_tile = world[dest_pos]
-            world[dest_pos] = Tile(position=dest_tile.position, units=list(dest_tile.units) + moving_units)
+            updates[hex_pos] = Tile(position=source_tile.position, units=remaining_units)
+            dest_tile = updates.get(dest_pos) or world[dest_pos]
+            updates[dest_pos] = Tile(position=dest_tile.position, units=list(dest_tile.units) + moving_units)
             
             # Log the movement
             logger.log_movement(
@@ -55,32 +69,51 @@ def move_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
             }
             move_records.append(move_record)
     
-    # Update turn state
-    turns = dict(game_state.turns)
-    
-    # Update player states using from_state
-    new_player_one = PlayerState.from_state(turn_state.player_one)
-    new_player_two = PlayerState.from_state(turn_state.player_two)
+    return move_records
 
-    new_turn_state = TurnState(
-        turn_number=turn_state.turn_number,
+def _commit_moves(game_state: GameState,
+                  updates: Dict[Tuple[int, int], Tile],
+                  move_records: List[Dict[str, Any]]) -> GameState:
+    current_turn = game_state.current_turn
+    turn_state = game_state.turns[current_turn]
+    world = game_state.world.update(updates)
+    tally = game_state.board_tally.updated(world, game_state.world, updates)
+
+    new_turn_state = replace(
+        turn_state,
         world=world,
-        player_one=new_player_one,
-        player_two=new_player_two,
-        input_moves=turn_state.input_moves,
-        move_actions=[*turn_state.move_actions, *move_records],
-        spawn_actions=turn_state.spawn_actions,
-        combat_actions=turn_state.combat_actions
+        move_actions=[*turn_state.move_actions, *move_records]
     )
-        
-    turns[current_turn] = new_turn_state
+    turns = game_state.turns.set(current_turn, new_turn_state)
+    
+    return (GameState.builder(game_state)
+            .with_world(world, tally)
+            .with_turns(turns)
+            .build())
+
+def move_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
+    turn_state = game_state.turns[game_state.current_turn]
     
-    new_game_state = (GameState.builder(game_state)
-                      .with_world(world)
-                      .with_turns(turns)
-                      .build())
+    # Check if moves exist in input_moves for this hex
+    if hex_pos not in turn_state.input_moves:
+        return game_state
     
-    return new_game_state
+    updates = {}
+    move_records = _move_from_hex(game_state, hex_pos, updates)
+    return _commit_moves(game_state, updates, move_records)
+
+def move_phase(game_state: GameState) -> GameState:
+    """Applies the moves from every hex and commits them as one state transition."""
+    input_moves = game_state.turns[game_state.current_turn].input_moves
+    if not input_moves:
+        return game_state
+
+    updates = {}
+    move_records = []
+    source_hexes = [hex_pos for hex_pos in input_moves if hex_pos in game_state.world]
+    for hex_pos in game_state.in_world_order(source_hexes):
+        move_records.extend(_move_from_hex(game_state, hex_pos, updates))
+    return _commit_moves(game_state, updates, move_records)
 
 def main():
     # Create a test configuration
@@ -131,8 +164,7 @@ def main():
         input_moves=test_moves
     )
     
-    turns = dict(game_state.turns)
-    turns[current_turn] = new_turn_state
+    turns = game_state.turns.set(current_turn, new_turn_state)
     game_state = GameState.builder(game_state).with_turns(turns).build()
 
     print("\n" + "="*80)
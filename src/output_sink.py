@@ -0,0 +1,169 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from game_state import GameState, TurnState
+
+# The engine reports each stage of a turn to an output sink as
+# (event, game_state). Sinks decide what, if anything, to build from the state,
+# so a NullSink costs one method call per event and does no formatting at all.
+#
+# Turn events, in order: turn_start, input, move, combat, spawn, turn_end.
+# run_game sends a final game_end event once the game is over.
+
+TURN_EVENTS = ("turn_start", "input", "move", "combat", "spawn", "turn_end")
+GAME_END = "game_end"
+
+
+def print_input_summary(turn_state: TurnState) -> None:
+    print("\nInput actions this turn:")
+    print("-" * 40)
+    print("p_id\tsrc\tdest\tunits")
+    if turn_state.input_moves:
+        for pos, moves in turn_state.input_moves.items():
+            for player_id, player_moves in moves.items():
+                for move in player_moves:
+                    print(f"{player_id}\t{pos}\t{move['destination']}\t{move['units']}")
+    else:
+        print("No input actions")
+
+def print_move_summary(turn_state: TurnState) -> None:
+    print("\nMoves this turn:")
+    print("-" * 40)
+    print("p_id\tsrc\tdest\tunits")
+    if turn_state.move_actions:
+        for move in turn_state.move_actions:
+            print(f"{move['player_id']}\t{move['source']}\t{move['destination']}\t{move['units']}")
+
+def print_combat_summary(turn_state: TurnState) -> None:
+    print("\nCombats this turn:")
+    print("-" * 40)
+    print("pos\tp1_cas\tp2_cas")
+    if turn_state.combat_actions:
+        for combat in turn_state.combat_actions:
+            print(f"{combat['position']}\t{combat['player_1_casualties']}\t{combat['player_2_casualties']}")
+
+def print_spawn_summary(turn_state: TurnState) -> None:
+    print(f"\nSpawns for turn {turn_state.turn_number}:")
+    print("-" * 40)
+    print("p_id\tposition")
+    if turn_state.spawn_actions:
+        for spawn in turn_state.spawn_actions:
+            print(f"{spawn['player_id']}\t{spawn['position']}")
+
+def print_scores(game_state: GameState) -> None:
+    print("\nScores:")
+    print("-" * 40)
+    print("Player\tScore")
+    for player_id, score in game_state.scores.items():
+        print(f"{player_id}\t{score}")
+    print()
+
+
+class OutputSink:
+    """Receives turn events from the engine. The base class ignores them all."""
+
+    def emit(self, event: str, game_state: GameState) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class NullSink(OutputSink):
+    """Discards every event; used for headless runs."""
+
+
+class ConsoleSink(OutputSink):
+    """Renders turn events as the tables the engine used to print."""
+
+    def emit(self, event: str, game_state: GameState) -> None:
+        if event == "turn_start":
+            print("\n\n" + "=" * 60)
+            print("Turn: " + str(game_state.current_turn))
+            return
+        if event == GAME_END:
+            # current_turn is already one past the last turn played
+            print("\n\n" + "=" * 60)
+            print("Final scores after turn " + str(game_state.current_turn - 1))
+            print_scores(game_state)
+            return
+
+        turn_state = game_state.turns[game_state.current_turn]
+        if event == "input":
+            print_input_summary(turn_state)
+        elif event == "move":
+            print_move_summary(turn_state)
+        elif event == "combat":
+            print_combat_summary(turn_state)
+        elif event == "spawn":
+            print_spawn_summary(turn_state)
+        elif event == "turn_end":
+            game_state.print_world()
+            print_scores(game_state)
+
+
+def turn_event_record(event: str, game_state: GameState) -> Dict[str, Any]:
+    """JSON-ready summary of a turn event: the records the event produced."""
+    record = {"event": event, "turn": game_state.current_turn}
+    if event == "turn_start":
+        return record
+    if event == GAME_END:
+        # current_turn is already one past the last turn played
+        record["turn"] = game_state.current_turn - 1
+        record["unit_counts"] = dict(game_state.board_tally.unit_counts)
+        record["scores"] = dict(game_state.scores)
+        record["game_status"] = game_state.game_status
+        return record
+
+    turn_state = game_state.turns[game_state.current_turn]
+    if event == "input":
+        record["moves"] = [
+            {"player_id": player_id, "source": source, "destination": move['destination'], "units": move['units']}
+            for source, moves in turn_state.input_moves.items()
+            for player_id, player_moves in moves.items()
+            for move in player_moves
+        ]
+    elif event == "move":
+        record["moves"] = list(turn_state.move_actions)
+    elif event == "combat":
+        record["combats"] = list(turn_state.combat_actions)
+    elif event == "spawn":
+        record["spawns"] = list(turn_state.spawn_actions)
+    elif event == "turn_end":
+        tally = game_state.board_tally
+        record["unit_counts"] = dict(tally.unit_counts)
+        record["scores"] = dict(game_state.scores)
+        record["game_status"] = game_state.game_status
+    return record
+
+
+class BufferedFileSink(OutputSink):
+    """
+    Appends one JSON line per turn event to path. Lines are kept in memory and
+    written buffer_size at a time, and on flush/close.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 256):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._lines: List[str] = []
+
+    def emit(self, event: str, game_state: GameState) -> None:
+        self._lines.append(json.dumps(turn_event_record(event, game_state)))
+        if len(self._lines) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._lines:
+            return
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(self._lines) + '\n')
+        self._lines = []
+
+
+def get_sink(sink: Optional[OutputSink]) -> OutputSink:
+    """The engine default: render to the console unless a sink is given."""
+    return ConsoleSink() if sink is None else sink
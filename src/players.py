@@ -0,0 +1,124 @@
+"""
+Player strategies: where a player's moves for a turn come from.
+
+A player config picks its strategy with player_type (default "llm"). The
+built-in offline strategies need no network, so engine benchmarks and load
+tests can play full games with them. Every strategy returns the LLM response
+shape: {'moves': [{'source': [x, y], 'destination': [x, y], 'units': n}, ...]}
+"""
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from game_state import GameState
+
+DEFAULT_PLAYER_TYPE = "llm"
+
+
+def _move(source: Tuple[int, int], destination: Tuple[int, int], units: int) -> Dict[str, Any]:
+    return {'source': list(source), 'destination': list(destination), 'units': units}
+
+def _own_hexes(game_state: GameState, player_id: int) -> List[Tuple[Tuple[int, int], int]]:
+    """(hex, unit count) for every hex holding the player's units, in world order."""
+    occupied = game_state.board_tally.occupied.get(player_id, frozenset())
+    return [
+        (pos, sum(1 for unit in game_state.world[pos].units if unit.player_id == player_id))
+        for pos in game_state.in_world_order(occupied)
+    ]
+
+class PlayerStrategy:
+    needs_network = False
+
+    def __init__(self, player_config: Optional[Dict[str, Any]] = None):
+        self.player_config = player_config or {}
+
+    def choose_moves(self, game_state: GameState, player_id: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _rng(self, game_state: GameState, player_id: int):
+        # With a seed in the player config, each turn's choices are reproducible;
+        # otherwise use the shared random module, which game workers reseed
+        seed = self.player_config.get('seed')
+        if seed is None:
+            return random
+        return random.Random(f"{seed}:{game_state.current_turn}:{player_id}")
+
+class LLMPlayer(PlayerStrategy):
+    """Builds the player's prompts and asks the model (see input_action.get_ai_moves)."""
+    needs_network = True
+
+    def choose_moves(self, game_state: GameState, player_id: int) -> Dict[str, Any]:
+        from input_action import get_ai_moves
+        return get_ai_moves(game_state, player_id)
+
+class RandomPlayer(PlayerStrategy):
+    """Each unit stays or moves to a random neighbouring hex."""
+
+    def choose_moves(self, game_state: GameState, player_id: int) -> Dict[str, Any]:
+        rng = self._rng(game_state, player_id)
+        topology = game_state.topology
+        moves = []
+        for pos, units in _own_hexes(game_state, player_id):
+            destinations = {}
+            options = (pos,) + topology.neighbors[pos]
+            for _ in range(units):
+                destination = rng.choice(options)
+                if destination != pos:
+                    destinations[destination] = destinations.get(destination, 0) + 1
+            moves.extend(_move(pos, destination, count) for destination, count in destinations.items())
+        return {'moves': moves}
+
+class GreedyExpansionPlayer(PlayerStrategy):
+    """Sends one unit into every empty neighbouring hex, keeping one unit behind."""
+
+    def choose_moves(self, game_state: GameState, player_id: int) -> Dict[str, Any]:
+        topology = game_state.topology
+        world = game_state.world
+        claimed = set()
+        moves = []
+        for pos, units in _own_hexes(game_state, player_id):
+            spare = units - 1
+            for neighbor in topology.neighbors[pos]:
+                if spare == 0:
+                    break
+                if world[neighbor].units or neighbor in claimed:
+                    continue
+                claimed.add(neighbor)
+                moves.append(_move(pos, neighbor, 1))
+                spare -= 1
+        return {'moves': moves}
+
+class GreedyAttackPlayer(PlayerStrategy):
+    """Marches every unit one hex closer to the nearest enemy units; expands when there are none."""
+
+    def choose_moves(self, game_state: GameState, player_id: int) -> Dict[str, Any]:
+        opponent_id = 2 if player_id == 1 else 1
+        enemy_hexes = list(game_state.board_tally.occupied.get(opponent_id, frozenset()))
+        if not enemy_hexes:
+            return GreedyExpansionPlayer(self.player_config).choose_moves(game_state, player_id)
+
+        topology = game_state.topology
+        moves = []
+        for pos, units in _own_hexes(game_state, player_id):
+            if pos in game_state.board_tally.contested:
+                continue
+            current = min(topology.distance(pos, enemy) for enemy in enemy_hexes)
+            best_distance, best = min(
+                (min(topology.distance(neighbor, enemy) for enemy in enemy_hexes), neighbor)
+                for neighbor in topology.neighbors[pos]
+            )
+            if best_distance < current:
+                moves.append(_move(pos, best, units))
+        return {'moves': moves}
+
+PLAYER_TYPES = {
+    "llm": LLMPlayer,
+    "random": RandomPlayer,
+    "greedy_expansion": GreedyExpansionPlayer,
+    "greedy_attack": GreedyAttackPlayer,
+}
+
+def create_player(player_config: Dict[str, Any]) -> PlayerStrategy:
+    player_type = player_config.get('player_type', DEFAULT_PLAYER_TYPE)
+    if player_type not in PLAYER_TYPES:
+        raise ValueError(f"Unknown player type: {player_type}")
+    return PLAYER_TYPES[player_type](player_config)
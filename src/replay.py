@@ -0,0 +1,195 @@
+"""
+Compact binary replay files, one per game.
+
+Layout (all integers little-endian):
+
+    header   magic b"HXRP", version u16, config length u32, config JSON
+    world    unit record count u32, then one UNIT record per (hex, player)
+    turns    per turn: turn header, then its MOVE, COMBAT and SPAWN records
+    index    per turn: turn number u32, file offset u64
+    trailer  index offset u64, turn count u32, magic b"HXIX"
+
+Every record has the same width, so a turn's records are one slice of the
+file. ReplayReader memory-maps the file and finds any turn through the index
+without reading the turns before it.
+"""
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from game_state import GameState, TurnState
+from output_sink import GAME_END, OutputSink
+
+MAGIC = b"HXRP"
+INDEX_MAGIC = b"HXIX"
+VERSION = 2
+
+UNIT, MOVE, COMBAT, SPAWN = 0, 1, 2, 3
+
+_HEADER = struct.Struct("<4sHI")
+_COUNT = struct.Struct("<I")
+# kind, player_id, x, y, x2, y2, a, b
+_RECORD = struct.Struct("<BBHHHHHH")
+# turn_number, moves, combats, spawns, player 1 score, player 2 score
+_TURN = struct.Struct("<IIIIii")
+_INDEX_ENTRY = struct.Struct("<IQ")
+_TRAILER = struct.Struct("<QI4s")
+
+
+def _replay_config(game_state: GameState) -> Dict[str, Any]:
+    return {
+        'board_size': game_state.board_size,
+        'max_turns': game_state.max_turns,
+        'player_one_config': game_state.player_one_config,
+        'player_two_config': game_state.player_two_config,
+    }
+
+class ReplayWriter:
+    """Streams a game to path: header and world on open, one block per turn, index on close."""
+
+    def __init__(self, path: str, game_state: GameState):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._index: List[Tuple[int, int]] = []
+
+        config = json.dumps(_replay_config(game_state), default=str).encode()
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(config)))
+        self._file.write(config)
+
+        records = []
+        for (x, y), tile in game_state.world.items():
+            tile_counts = {}
+            for unit in tile.units:
+                tile_counts[unit.player_id] = tile_counts.get(unit.player_id, 0) + 1
+            for player_id, count in sorted(tile_counts.items()):
+                records.append(_RECORD.pack(UNIT, player_id, x, y, 0, 0, count, 0))
+        self._file.write(_COUNT.pack(len(records)))
+        self._file.write(b"".join(records))
+
+    def write_turn(self, turn_state: TurnState, scores: Dict[int, int]) -> None:
+        self._index.append((turn_state.turn_number, self._file.tell()))
+        self._file.write(_TURN.pack(
+            turn_state.turn_number,
+            len(turn_state.move_actions),
+            len(turn_state.combat_actions),
+            len(turn_state.spawn_actions),
+            scores.get(1, 0),
+            scores.get(2, 0)
+        ))
+        records = []
+        for move in turn_state.move_actions:
+            (x, y), (x2, y2) = move['source'], move['destination']
+            records.append(_RECORD.pack(MOVE, move['player_id'], x, y, x2, y2, move['units'], 0))
+        for combat in turn_state.combat_actions:
+            x, y = combat['position']
+            records.append(_RECORD.pack(
+                COMBAT, 0, x, y, 0, 0, combat['player_1_casualties'], combat['player_2_casualties']
+            ))
+        for spawn in turn_state.spawn_actions:
+            x, y = spawn['position']
+            records.append(_RECORD.pack(SPAWN, spawn['player_id'], x, y, 0, 0, 1, 0))
+        self._file.write(b"".join(records))
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(b"".join(_INDEX_ENTRY.pack(turn, offset) for turn, offset in self._index))
+        self._file.write(_TRAILER.pack(index_offset, len(self._index), INDEX_MAGIC))
+        self._file.close()
+
+
+class ReplaySink(OutputSink):
+    """Records a game to a replay file as it is played (see engine.run_game)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[ReplayWriter] = None
+
+    def emit(self, event: str, game_state: GameState) -> None:
+        if event == "turn_start" and self._writer is None:
+            self._writer = ReplayWriter(self.path, game_state)
+        elif event == "turn_end" and self._writer is not None:
+            self._writer.write_turn(game_state.turns[game_state.current_turn], game_state.scores)
+        elif event == GAME_END:
+            self.close()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ReplayReader:
+    """Random access to the turns of a replay file through a memory map."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, config_length = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version} in {path}")
+        offset = _HEADER.size
+        self.config = json.loads(self._buffer[offset:offset + config_length])
+        offset += config_length
+        (self._unit_count,) = _COUNT.unpack_from(self._buffer, offset)
+        self._units_offset = offset + _COUNT.size
+
+        index_offset, turn_count, index_magic = _TRAILER.unpack_from(self._buffer, len(self._buffer) - _TRAILER.size)
+        if index_magic != INDEX_MAGIC:
+            raise ValueError(f"{path} has no turn index (game not finished?)")
+        self._offsets = dict(_INDEX_ENTRY.iter_unpack(self._buffer[index_offset:index_offset + turn_count * _INDEX_ENTRY.size]))
+
+    def __enter__(self) -> 'ReplayReader':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    @property
+    def turn_numbers(self) -> List[int]:
+        return list(self._offsets)
+
+    def _records(self, offset: int, count: int) -> Iterator[Tuple[int, ...]]:
+        return _RECORD.iter_unpack(self._buffer[offset:offset + count * _RECORD.size])
+
+    def initial_units(self) -> Dict[Tuple[int, int], Dict[int, int]]:
+        """Unit counts per hex and player at the start of the game."""
+        units = {}
+        for _, player_id, x, y, _, _, count, _ in self._records(self._units_offset, self._unit_count):
+            units.setdefault((x, y), {})[player_id] = count
+        return units
+
+    def scores(self, turn_number: int) -> Dict[int, int]:
+        """Scores at the end of turn_number, read from the turn header alone."""
+        _, _, _, _, score_one, score_two = _TURN.unpack_from(self._buffer, self._offsets[turn_number])
+        return {1: score_one, 2: score_two}
+
+    def final_scores(self) -> Dict[int, int]:
+        return self.scores(max(self._offsets)) if self._offsets else {1: 0, 2: 0}
+
+    def turn(self, turn_number: int) -> Dict[str, Any]:
+        """The move, combat and spawn records of turn_number, in the TurnState format."""
+        offset = self._offsets[turn_number]
+        _, move_count, combat_count, spawn_count, score_one, score_two = _TURN.unpack_from(self._buffer, offset)
+        turn = {'turn_number': turn_number, 'move_actions': [], 'combat_actions': [], 'spawn_actions': [],
+                'scores': {1: score_one, 2: score_two}}
+        for kind, player_id, x, y, x2, y2, a, b in self._records(offset + _TURN.size, move_count + combat_count + spawn_count):
+            if kind == MOVE:
+                turn['move_actions'].append({
+                    'player_id': player_id, 'source': (x, y), 'destination': (x2, y2), 'units': a
+                })
+            elif kind == COMBAT:
+                turn['combat_actions'].append({
+                    'position': (x, y), 'player_1_casualties': a, 'player_2_casualties': b
+                })
+            else:
+                turn['spawn_actions'].append({'player_id': player_id, 'position': (x, y)})
+        return turn
@@ -1,15 +1,15 @@
-from typing import Dict, Tuple, Any
+from dataclasses import replace
+from typing import Dict, Tuple, Any, List, Optional
 from game_state import GameState, Tile, Unit, PlayerState, TurnState, SpawnStateChange
 from utils.logger import logger
 from game_state import GameEvent
 import json
 
-def spawn_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
-    tile = game_state.world[hex_pos]
-    
+def _resolve_spawn(game_state: GameState, tile: Tile, hex_pos: Tuple[int, int]) -> Optional[Tuple[Tile, Dict[str, Any]]]:
+    """Returns the tile with its new unit and the spawn record, or None when nothing spawns."""
     # Skip if no units in tile
     if not tile.units:
-        return game_state
+        return None
     
     # Group units by player
     players_units = {}
@@ -20,13 +20,11 @@ def spawn_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
     
     # Only spawn if one player controls the hex and has at least one unit
     if len(players_units) != 1:
-        return game_state
+        return None
         
-    # print("players_units at", hex_pos, ":", players_units)
     player_id = list(players_units.keys())[0]
     if len(players_units[player_id]) < 1:
-        return game_state
-    # print(f"Turn {game_state.current_turn}: Spawning unit for player {player_id} at {hex_pos}")
+        return None
 
     # Create new unit
     new_unit = Unit(
@@ -35,13 +33,6 @@ def spawn_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         movement_points=1
     )
     
-    # Update world with new unit
-    world = dict(game_state.world)
-    world[hex_pos] = Tile(
-        position=tile.position,
-        units=list(tile.units) + [new_unit]
-    )
-    
     # Log spawn event
     logger.log_action(
         "spawn",
@@ -56,17 +47,22 @@ def spawn_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         'player_id': player_id
     }
     
-    # Update turn state
-    turns = dict(game_state.turns)
+    return Tile(position=tile.position, units=list(tile.units) + [new_unit]), spawn_record
+
+def _commit_spawns(game_state: GameState,
+                   updates: Dict[Tuple[int, int], Tile],
+                   spawn_records: List[Dict[str, Any]]) -> GameState:
     current_turn = game_state.current_turn
     current_turn_state = game_state.turns[current_turn]
+    world = game_state.world.update(updates)
+    tally = game_state.board_tally.updated(world, game_state.world, updates)
     
     # Update player states using from_state
     new_player_one = PlayerState.from_state(
         current_turn_state.player_one,
         turn_model_output={
             **current_turn_state.player_one.turn_model_output,
-            'spawns': [*current_turn_state.player_one.turn_model_output.get('spawns', []), spawn_record]
+            'spawns': [*current_turn_state.player_one.turn_model_output.get('spawns', []), *spawn_records]
         }
     )
 
@@ -74,24 +70,46 @@ def spawn_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
         current_turn_state.player_two,
         turn_model_output={
             **current_turn_state.player_two.turn_model_output,
-            'spawns': [*current_turn_state.player_two.turn_model_output.get('spawns', []), spawn_record]
+            'spawns': [*current_turn_state.player_two.turn_model_output.get('spawns', []), *spawn_records]
         }
     )
 
-    new_turn_state = TurnState(
-        turn_number=current_turn_state.turn_number,
+    new_turn_state = replace(
+        current_turn_state,
         world=world,
         player_one=new_player_one,
         player_two=new_player_two,
-        spawn_actions=[*current_turn_state.spawn_actions, spawn_record]
+        spawn_actions=[*current_turn_state.spawn_actions, *spawn_records]
     )
-    
-    turns[current_turn] = new_turn_state
+    turns = game_state.turns.set(current_turn, new_turn_state)
     
     return (GameState.builder(game_state)
-            .with_world(world)
+            .with_world(world, tally)
             .with_turns(turns)
-            .build()) 
+            .build())
+
+def spawn_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
+    result = _resolve_spawn(game_state, game_state.world[hex_pos], hex_pos)
+    if result is None:
+        return game_state
+    
+    tile, spawn_record = result
+    return _commit_spawns(game_state, {hex_pos: tile}, [spawn_record])
+
+def spawn_phase(game_state: GameState) -> GameState:
+    """Spawns in every singly held hex and commits the results as one state transition."""
+    updates = {}
+    spawn_records = []
+    # Only hexes held by a single player can spawn
+    for hex_pos in game_state.in_world_order(game_state.board_tally.held_hexes()):
+        result = _resolve_spawn(game_state, game_state.world[hex_pos], hex_pos)
+        if result is not None:
+            updates[hex_pos], spawn_record = result
+            spawn_records.append(spawn_record)
+    
+    if not spawn_records:
+        return game_state
+    return _commit_spawns(game_state, updates, spawn_records)
 
 def main():
     # Create a test configuration (same as input_action.py)
@@ -3,18 +3,21 @@ from game_state import GameState, TurnState, Tile
 from utils.logger import logger
 
 def turn_end_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameState:
+    # Turn end runs once per turn, keyed to the first hex of the world
     if hex_pos != next(iter(game_state.world)):
         return game_state
-    
+    return turn_end_phase(game_state)
+
+def turn_end_phase(game_state: GameState) -> GameState:
+    """Scores the turn and checks the end conditions."""
     # Calculate scores for current turn
     scores = game_state.calculate_scores()
     
     # Update both the turn state and game state scores
-    turns = dict(game_state.turns)
-    current_turn_state = turns[game_state.current_turn]
-    turns[game_state.current_turn] = TurnState(
+    current_turn_state = game_state.turns[game_state.current_turn]
+    turns = game_state.turns.set(game_state.current_turn, TurnState(
         **{**current_turn_state.__dict__, 'scores': scores}
-    )
+    ))
     
     # Create new game state with updated scores
     new_game_state = GameState.from_state(
@@ -37,10 +40,7 @@ def turn_end_action(game_state: GameState, hex_pos: Tuple[int, int]) -> GameStat
             game_status='game_over'
         )
     
-    player_units = {i: 0 for i in range(1, game_state.num_players + 1)}
-    for tile in game_state.world.values():
-        for unit in tile.units:
-            player_units[unit.player_id] += 1
+    player_units = dict(game_state.board_tally.unit_counts)
     
     if any(count == 0 for count in player_units.values()):
         eliminated_players = [player_id for player_id, count in player_units.items() if count == 0]
@@ -0,0 +1,94 @@
+from dataclasses import replace
+from typing import Dict, Tuple, Any
+
+from game_state import GameState, TurnState, PlayerState, Tile, Unit
+from utils.pmap import PMap
+
+# Finished turns keep their move, combat and spawn records, which are the
+# deltas between consecutive worlds. Only every keyframe_interval-th turn also
+# keeps its full world; any other turn's world is rebuilt from the closest
+# earlier keyframe by replaying those records.
+
+_NO_WORLD = PMap()
+
+
+def is_keyframe(turn_number: int, keyframe_interval: int) -> bool:
+    return keyframe_interval <= 1 or (turn_number - 1) % keyframe_interval == 0
+
+def _without_phase_copies(player_state: PlayerState) -> PlayerState:
+    # combats and spawns are copies of the turn level records
+    model_output = {
+        key: value for key, value in player_state.turn_model_output.items()
+        if key not in ('combats', 'spawns')
+    }
+    return PlayerState.from_state(player_state, turn_model_output=model_output)
+
+def compact_turn(game_state: GameState, turn_number: int) -> GameState:
+    """Reduces a finished turn to its deltas, keeping the world only on keyframe turns."""
+    turn_state = game_state.turns.get(turn_number)
+    if turn_state is None:
+        return game_state
+
+    world = turn_state.world if is_keyframe(turn_number, game_state.keyframe_interval) else _NO_WORLD
+    compacted = replace(
+        turn_state,
+        world=world,
+        player_one=_without_phase_copies(turn_state.player_one),
+        player_two=_without_phase_copies(turn_state.player_two)
+    )
+    return GameState.from_state(game_state, turns=game_state.turns.set(turn_number, compacted))
+
+def _apply_turn_deltas(counts: Dict[Tuple[int, int], Dict[int, int]],
+                       world: PMap,
+                       turn_state: TurnState) -> None:
+    def tile_counts(pos: Tuple[int, int]) -> Dict[int, int]:
+        if pos not in counts:
+            tile_count = {}
+            for unit in world[pos].units:
+                tile_count[unit.player_id] = tile_count.get(unit.player_id, 0) + 1
+            counts[pos] = tile_count
+        return counts[pos]
+
+    for move in turn_state.move_actions:
+        source = tile_counts(tuple(move['source']))
+        destination = tile_counts(tuple(move['destination']))
+        source[move['player_id']] = source.get(move['player_id'], 0) - move['units']
+        destination[move['player_id']] = destination.get(move['player_id'], 0) + move['units']
+
+    for combat in turn_state.combat_actions:
+        tile_count = tile_counts(tuple(combat['position']))
+        tile_count[1] = tile_count.get(1, 0) - combat['player_1_casualties']
+        tile_count[2] = tile_count.get(2, 0) - combat['player_2_casualties']
+
+    for spawn in turn_state.spawn_actions:
+        tile_count = tile_counts(tuple(spawn['position']))
+        tile_count[spawn['player_id']] = tile_count.get(spawn['player_id'], 0) + 1
+
+def world_at(game_state: GameState, turn_number: int) -> PMap:
+    """Returns the world as it stood at the end of turn_number."""
+    if turn_number not in game_state.turns:
+        raise KeyError(f"Turn {turn_number} has not been played")
+
+    keyframe_turn = turn_number
+    while not game_state.turns[keyframe_turn].world:
+        keyframe_turn -= 1
+        if keyframe_turn not in game_state.turns:
+            raise KeyError(f"No keyframe found before turn {turn_number}")
+
+    world = game_state.turns[keyframe_turn].world
+    counts = {}
+    for replay_turn in range(keyframe_turn + 1, turn_number + 1):
+        _apply_turn_deltas(counts, world, game_state.turns[replay_turn])
+
+    updates = {
+        pos: Tile(
+            position=world[pos].position,
+            units=[
+                Unit(player_id=player_id, health=1, movement_points=1)
+                for player_id in sorted(tile_count)
+                for _ in range(tile_count[player_id])
+            ]
+        )
+        for pos, tile_count in counts.items()
+    }
+    return world.update(updates)
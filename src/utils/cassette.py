@@ -0,0 +1,163 @@
+import atexit
+import contextvars
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# A cassette records what the players decided during real games so the same
+# games can be played again without the API. Entries are keyed by
+# (game_id, turn, player_id): "moves" entries hold the parsed move set from
+# get_ai_moves and "llm" entries hold call_llm_api responses, also keyed by
+# the request hash. The file is gzipped JSON lines, loaded into memory for
+# replay. Recordings are appended as whole gzip members, so the game workers
+# of an experiment can share one file.
+
+RECORD = "record"
+REPLAY = "replay"
+
+CallKey = Tuple[str, int, int]
+
+_call_context: contextvars.ContextVar = contextvars.ContextVar("llm_call_context", default=("", 0, 0))
+
+
+class CassetteMissError(KeyError):
+    """A strict replay asked for a decision the cassette does not hold."""
+
+
+@contextmanager
+def call_context(game_id: str, turn: int, player_id: int) -> Iterator[None]:
+    """Tags the LLM calls made inside the block with the game, turn and player they are for."""
+    token = _call_context.set((game_id, turn, player_id))
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+def current_call_key() -> CallKey:
+    return _call_context.get()
+
+class Cassette:
+    """
+    In RECORD mode, entries are buffered and appended to path on flush and
+    close.
+    In REPLAY mode, path is loaded up front and lookups are served from
+    memory; with strict set, a missing entry raises CassetteMissError,
+    otherwise it returns None and the caller goes to the API.
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, strict: bool = True):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.strict = strict
+        self._moves: Dict[CallKey, Dict[str, Any]] = {}
+        self._responses: Dict[Tuple[CallKey, str], str] = {}
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, 'rt') as f:
+            for line in f:
+                entry = json.loads(line)
+                key = (entry['game'], entry['turn'], entry['player'])
+                if entry['kind'] == 'moves':
+                    self._moves[key] = entry['moves']
+                else:
+                    self._responses[(key, entry['request'])] = entry['response']
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending.append(json.dumps(entry, separators=(',', ':')))
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            data = gzip.compress(('\n'.join(self._pending) + '\n').encode())
+            self._pending = []
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        # One write on an O_APPEND file keeps members from different processes whole
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _forget_pending(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def _miss(self, what: str, key: CallKey) -> None:
+        if self.strict:
+            game_id, turn, player_id = key
+            raise CassetteMissError(
+                f"No recorded {what} for game {game_id!r}, turn {turn}, player {player_id} in {self.path}"
+            )
+        return None
+
+    def record_moves(self, key: CallKey, moves: Dict[str, Any]) -> None:
+        self._moves[key] = moves
+        self._append({'kind': 'moves', 'game': key[0], 'turn': key[1], 'player': key[2], 'moves': moves})
+
+    def record_response(self, key: CallKey, request_hash: str, response: str) -> None:
+        self._responses[(key, request_hash)] = response
+        self._append({
+            'kind': 'llm', 'game': key[0], 'turn': key[1], 'player': key[2],
+            'request': request_hash, 'response': response
+        })
+
+    def lookup_moves(self, key: CallKey) -> Optional[Dict[str, Any]]:
+        moves = self._moves.get(key)
+        return self._miss("moves", key) if moves is None else moves
+
+    def lookup_response(self, key: CallKey, request_hash: str) -> Optional[str]:
+        response = self._responses.get((key, request_hash))
+        return self._miss("LLM response", key) if response is None else response
+
+    def close(self) -> None:
+        self.flush()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_configured = False
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    The cassette get_ai_moves and call_llm_api use, set up from the
+    environment on first use: LLM_CASSETTE (file) and LLM_CASSETTE_MODE
+    (record, replay or replay_lenient; default replay).
+    """
+    global _cassette, _cassette_configured
+    if not _cassette_configured:
+        path = os.environ.get("LLM_CASSETTE")
+        if path:
+            mode = os.environ.get("LLM_CASSETTE_MODE", REPLAY)
+            if mode == "replay_lenient":
+                _cassette = Cassette(path, REPLAY, strict=False)
+            else:
+                _cassette = Cassette(path, mode)
+            atexit.register(_cassette.close)
+        _cassette_configured = True
+    return _cassette
+
+def set_cassette(cassette: Optional[Cassette]) -> None:
+    """Replaces the cassette in use; None turns recording and replay off."""
+    global _cassette, _cassette_configured
+    _cassette = cassette
+    _cassette_configured = True
+
+def _reset_after_fork() -> None:
+    # Entries buffered before the fork are the parent's to write
+    if _cassette is not None:
+        _cassette._forget_pending()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,13 +1,97 @@
+import atexit
 import json
 import os
-from typing import Dict, Any, Optional, Tuple
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 def setup_logging():
     """Create logs directory if it doesn't exist"""
     log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
+
+class BufferedLogWriter:
+    """
+    Appends JSON lines to a file from a background thread.
+    Lines are batched in memory and written when max_batch lines are waiting
+    or flush_interval seconds have passed, and synchronously on flush()/close().
+    """
+
+    def __init__(self, path: str, max_batch: int = 512, flush_interval: float = 1.0):
+        self.path = path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._reset()
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            # A forked child has the parent's buffer but not its thread
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lines: List[str] = []
+        self._condition = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def write(self, line: str) -> None:
+        with self._condition:
+            self._lines.append(line)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+                self._thread.start()
+            if len(self._lines) >= self.max_batch:
+                self._condition.notify()
+
+    def _take_lines(self) -> List[str]:
+        lines, self._lines = self._lines, []
+        return lines
+
+    def _write_batch(self, lines: List[str]) -> None:
+        # Caller holds _file_lock, taken before the batch left the buffer,
+        # so batches reach the file in the order they were queued
+        try:
+            if lines:
+                log_dir = os.path.dirname(self.path)
+                if log_dir:
+                    # Experiment workers may create it at the same moment
+                    os.makedirs(log_dir, exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write('\n'.join(lines) + '\n')
+        finally:
+            self._file_lock.release()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or len(self._lines) >= self.max_batch,
+                    timeout=self.flush_interval
+                )
+                closed = self._closed
+                self._file_lock.acquire()
+                lines = self._take_lines()
+            self._write_batch(lines)
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """Writes every buffered line before returning."""
+        with self._condition:
+            self._file_lock.acquire()
+            lines = self._take_lines()
+        self._write_batch(lines)
+
+    def close(self) -> None:
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+        self._closed = False
 
 class GameEventLogger:
     _instance = None
@@ -16,11 +100,12 @@ class GameEventLogger:
         if cls._instance is None:
             cls._instance = super(GameEventLogger, cls).__new__(cls)
             cls._instance.log_file = f"logs/game_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+            cls._instance._writer = BufferedLogWriter(cls._instance.log_file)
             setup_logging()
         return cls._instance
 
     def _write_log(self, log_level: str, event_type: str, **event_data):
-        """Write a log entry to the log file"""
+        """Queue a log entry as one JSON line; BufferedLogWriter writes it to the log file"""
         timestamp = datetime.now().isoformat()
         log_entry = {
             "timestamp": timestamp,
@@ -28,16 +113,16 @@ class GameEventLogger:
             "event_type": event_type,
             **event_data
         }
-        
-        with open(self.log_file, 'a') as f:
-            f.write(json.dumps(log_entry, indent=2) + '\n\n')
-            
+
+        self._writer.write(json.dumps(log_entry, separators=(',', ':')))
+
+    def flush(self) -> None:
+        """Writes every queued entry to the log file"""
+        self._writer.flush()
+
     def _get_world_state_summary(self, game_state: 'GameState') -> Dict[str, Any]:
-        unit_counts = {1: 0, 2: 0}
-        for tile in game_state.world.values():
-            for unit in tile.units:
-                unit_counts[unit.player_id] += 1
-                
+        unit_counts = dict(game_state.board_tally.unit_counts)
+
         return {
             "unit_counts": unit_counts,
             "current_turn": game_state.current_turn,
@@ -1,9 +1,21 @@
 # Imports
+import contextvars
 import yaml
 import os
-from typing import List, Dict, Any, Tuple
-from anthropic import Anthropic
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from anthropic import Anthropic, AsyncAnthropic
 from string import Template
+from .llm_cache import cache_key, get_response_cache
+from .cassette import REPLAY, current_call_key, get_cassette
+from .metrics import metrics
+from .rate_limit import estimate_request_tokens, get_scheduler
+from .timing import Histogram
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20240620"
 
 def load_prompt_from_file(prompt_path: str) -> str:
   with open(prompt_path, 'r') as f:
@@ -16,28 +28,371 @@ def load_game_prompts(filename: str) -> str:
   except FileNotFoundError:
     raise FileNotFoundError(f"Could not find prompt file at {prompt_path}")
 
+# Clients
+@dataclass(frozen=True)
+class ClientSettings:
+  """HTTP connection pool and timeout settings for an API client."""
+  max_connections: int = 10
+  max_keepalive_connections: int = 10
+  keepalive_expiry: float = 30.0
+  timeout: float = 60.0
+  connect_timeout: float = 5.0
+  # Retries are scheduled by utils.rate_limit, which also knows the rate budgets
+  max_retries: int = 0
+
+class ClientRegistry:
+  """
+  Long-lived sync and async Anthropic clients, one per (model, settings).
+  Each client keeps its pooled keep-alive connections between calls.
+  use_transport() sends every request through another httpx transport
+  instead, e.g. an httpx.MockTransport in tests.
+  """
+
+  def __init__(self, settings: Optional[ClientSettings] = None):
+    self.settings = settings or ClientSettings()
+    self._lock = threading.Lock()
+    self._forget_clients()
+    self._transport = None
+    self._async_transport = None
+    self._api_key: Optional[str] = None
+
+  def _forget_clients(self) -> None:
+    self._clients: Dict[Tuple[str, ClientSettings], Anthropic] = {}
+    self._async_clients: Dict[Tuple[str, ClientSettings], AsyncAnthropic] = {}
+
+  def _http_options(self, settings: ClientSettings) -> Dict[str, Any]:
+    import httpx
+    return {
+      'limits': httpx.Limits(
+        max_connections=settings.max_connections,
+        max_keepalive_connections=settings.max_keepalive_connections,
+        keepalive_expiry=settings.keepalive_expiry
+      ),
+      'timeout': httpx.Timeout(settings.timeout, connect=settings.connect_timeout),
+    }
+
+  def get_client(self, model: str = DEFAULT_MODEL, settings: Optional[ClientSettings] = None) -> Anthropic:
+    import httpx
+    settings = settings or self.settings
+    with self._lock:
+      client = self._clients.get((model, settings))
+      if client is None:
+        options = self._http_options(settings)
+        client = Anthropic(
+          api_key=self._api_key,
+          max_retries=settings.max_retries,
+          timeout=options['timeout'],
+          http_client=httpx.Client(transport=self._transport, **options)
+        )
+        self._clients[(model, settings)] = client
+      return client
+
+  def get_async_client(self, model: str = DEFAULT_MODEL, settings: Optional[ClientSettings] = None) -> AsyncAnthropic:
+    """Async client; its connections belong to the event loop that first uses them."""
+    import httpx
+    settings = settings or self.settings
+    with self._lock:
+      client = self._async_clients.get((model, settings))
+      if client is None:
+        options = self._http_options(settings)
+        client = AsyncAnthropic(
+          api_key=self._api_key,
+          max_retries=settings.max_retries,
+          timeout=options['timeout'],
+          http_client=httpx.AsyncClient(transport=self._async_transport, **options)
+        )
+        self._async_clients[(model, settings)] = client
+      return client
+
+  def use_transport(self, transport=None, async_transport=None, api_key: Optional[str] = "test-key") -> None:
+    """
+    Routes clients created from now on through the given httpx transports.
+    use_transport() with no arguments goes back to the network and the
+    API key from the environment.
+    """
+    self.close()
+    with self._lock:
+      self._transport = transport
+      self._async_transport = async_transport
+      self._api_key = api_key if transport is not None or async_transport is not None else None
+
+  def close(self) -> None:
+    """Closes the sync clients and drops every client; later calls create new ones."""
+    with self._lock:
+      clients = list(self._clients.values())
+      self._forget_clients()
+    for client in clients:
+      client.close()
+
+registry = ClientRegistry()
+
+if hasattr(os, 'register_at_fork'):
+  # Pooled connections belong to the parent process; a forked child starts without clients
+  os.register_at_fork(after_in_child=registry._forget_clients)
+
+def get_client(model: str = DEFAULT_MODEL) -> Anthropic:
+  """Shared Anthropic client for model (see ClientRegistry)."""
+  return registry.get_client(model)
+
+def get_async_client(model: str = DEFAULT_MODEL) -> AsyncAnthropic:
+  return registry.get_async_client(model)
+
 # Functions
-def call_llm_api(message_chain: List[Dict[str, str]]) -> str:
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+  """Input tokens of text sent as one user message, as counted by the API."""
+  result = get_client(model).beta.messages.count_tokens(
+    model=model,
+    messages=[{'role': 'user', 'content': text}]
+  )
+  return result.input_tokens
+
+# Coalescing
+class _Flight:
+  def __init__(self):
+    self.done = threading.Event()
+    self.result: Any = None
+    self.error: Optional[BaseException] = None
+
+class SingleFlight:
+  """
+  do(key, call) runs call() unless a call for the same key is already
+  running, in which case it waits for that call and shares its result (or
+  its exception). Nothing is kept once a call finishes: unlike the response
+  cache, it only merges requests that overlap in time. It only sees this
+  process's calls; call_llm_api coalesces across processes with claims in
+  the response cache.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._flights: Dict[str, _Flight] = {}
+
+  def do(self, key: str, call: Callable[[], Any]) -> Tuple[Any, bool]:
+    """(result, shared): shared is True when the result came from another caller's call."""
+    with self._lock:
+      flight = self._flights.get(key)
+      leader = flight is None
+      if leader:
+        flight = self._flights[key] = _Flight()
+
+    if not leader:
+      flight.done.wait()
+      if flight.error is not None:
+        raise flight.error
+      return flight.result, True
+
+    try:
+      flight.result = call()
+      return flight.result, False
+    except BaseException as e:
+      flight.error = e
+      raise
+    finally:
+      with self._lock:
+        del self._flights[key]
+      flight.done.set()
+
+  def _forget_flights(self) -> None:
+    self._lock = threading.Lock()
+    self._flights = {}
+
+in_flight = SingleFlight()
+
+if hasattr(os, 'register_at_fork'):
+  # The parent's requests do not finish in a forked child
+  os.register_at_fork(after_in_child=in_flight._forget_flights)
+
+# Deadlines and hedging
+HEDGE_MIN_SAMPLES = 20
+
+# Latency of every API request this process has sent, for hedge_delay()
+_request_latency = Histogram()
+_latency_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+# time.monotonic() by which the requests made in this context must be done
+_request_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_request_deadline", default=None)
+
+class LLMDeadlineExceeded(TimeoutError):
+  """No response arrived before the request's deadline."""
+
+def _time_left() -> Optional[float]:
+  """Seconds until the current request deadline (see call_llm_api_with_deadline); None without one."""
+  deadline = _request_deadline.get()
+  return None if deadline is None else deadline - time.monotonic()
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+  global _hedge_executor
+  with _hedge_executor_lock:
+    if _hedge_executor is None:
+      _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+    return _hedge_executor
+
+def _reset_hedge_executor() -> None:
+  global _hedge_executor, _hedge_executor_lock, _latency_lock
+  _hedge_executor = None
+  _hedge_executor_lock = threading.Lock()
+  _latency_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+  os.register_at_fork(after_in_child=_reset_hedge_executor)
+
+def hedge_delay(quantile: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+  """
+  The quantile of this process's API latency (to histogram bucket
+  precision), or None until min_samples requests have been timed.
+  """
+  with _latency_lock:
+    if _request_latency.count < min_samples:
+      return None
+    return _request_latency.quantile(quantile)
+
+def call_llm_api_with_deadline(message_chain: List[Dict[str, str]],
+                               deadline: float,
+                               hedge_after: Optional[float] = None) -> str:
+  """
+  call_llm_api, but gives up after deadline seconds with LLMDeadlineExceeded.
+  If no response has arrived after hedge_after seconds, the same request is
+  sent again and the first response to arrive wins. The HTTP requests time
+  out at the deadline too, so abandoned requests do not hold on to the
+  executor's threads.
+  """
+  executor = _get_hedge_executor()
+  start = time.monotonic()
+  # The requests run in copies of this context, keeping its cassette key,
+  # timings and deadline
+  context = contextvars.copy_context()
+  context.run(_request_deadline.set, start + deadline)
+  pending = {executor.submit(context.copy().run, call_llm_api, message_chain)}
+  hedged = hedge_after is None or hedge_after >= deadline
+
+  while pending:
+    until = deadline if hedged else hedge_after
+    done, pending = wait(pending, timeout=max(0.0, until - (time.monotonic() - start)), return_when=FIRST_COMPLETED)
+    for future in done:
+      output = future.result()
+      if output:
+        return output
+    if done:
+      # A request failed (call_llm_api returned ""); wait on the other one, if any
+      continue
+    if not hedged:
+      metrics.inc("llm_hedged_requests_total", help_text="Duplicate requests sent for slow LLM responses")
+      # The duplicate must not just wait on the slow request (see SingleFlight)
+      pending.add(executor.submit(context.copy().run, call_llm_api, message_chain, coalesce=False))
+      hedged = True
+    else:
+      raise LLMDeadlineExceeded(f"No LLM response within {deadline}s")
+  return ""
+
+def _request_output(system: Any, messages: List[Dict[str, Any]], params: Dict[str, Any], estimated_tokens: int) -> str:
+  """Sends one request to the API and returns the response text ("" for a non-200 reply)."""
+  client = get_client(DEFAULT_MODEL)
+
+  def send() -> Any:
+    # Under a deadline, the HTTP request gives up when it passes (and is not retried after)
+    time_left = _time_left()
+    if time_left is not None and time_left <= 0:
+      raise LLMDeadlineExceeded("LLM request deadline passed")
+    options = {} if time_left is None else {'timeout': time_left}
+    start = time.perf_counter()
+    try:
+      return client.messages.create(
+        model=DEFAULT_MODEL,
+        messages=messages,
+        system=system,
+        **params,
+        **options
+      )
+    finally:
+      elapsed = time.perf_counter() - start
+      metrics.observe("llm_request_seconds", elapsed, help_text="Anthropic API request latency")
+      with _latency_lock:
+        _request_latency.observe(elapsed)
+
+  # Wait for the rate budgets, retrying rate limits and server errors (see utils.rate_limit)
+  scheduler = get_scheduler()
+  response = scheduler.run(send, tokens=estimated_tokens, queue=current_call_key()[0])
+  input_tokens = record_usage(response)
+  if input_tokens is not None:
+    scheduler.settle(estimated_tokens, input_tokens)
+  
+  # Check response status
+  if hasattr(response, 'status_code') and response.status_code != 200:
+      print(f"Warning: LLM API returned non-200 status code: {response.status_code}")
+      print(f"Response payload: {response}")
+      return ""  # Return empty string on error
+
+  return process_model_output(response)
+
+def call_llm_api(message_chain: List[Dict[str, str]], use_cache: bool = True, coalesce: bool = True) -> str:
+  """
+  The response text for message_chain, or "" if the request failed. Unless
+  coalesce is False, a request identical to one already in flight waits for
+  that one's response instead of being sent again: within this process
+  through in_flight, and across the experiment's worker processes through a
+  claim in the response cache (see utils.llm_cache), when there is one.
+  """
   system_message, updated_chain = extract_system_message(message_chain)
+  params = {'max_tokens': 4096, 'temperature': 0.0}
+  key = cache_key(DEFAULT_MODEL, system_message, updated_chain, params)
+
+  # A replayed game gets the recorded response (see utils.cassette)
+  cassette = get_cassette()
+  if cassette is not None and cassette.mode == REPLAY:
+    recorded = cassette.lookup_response(current_call_key(), key)
+    if recorded is not None:
+      metrics.inc("llm_requests_total", source="replay", help_text="LLM responses by where they came from")
+      return recorded
+
+  # Identical requests get the stored response (see utils.llm_cache)
+  cache = get_response_cache() if use_cache else None
+  if cache is not None:
+    cached = cache.get(key)
+    if cached is not None:
+      if cassette is not None and cassette.mode != REPLAY:
+        cassette.record_response(current_call_key(), key, cached)
+      metrics.inc("llm_requests_total", source="cache", help_text="LLM responses by where they came from")
+      return cached
 
   try:
-    client = Anthropic()
-    response = client.messages.create(
-      model="claude-3-5-sonnet-20240620",
-      max_tokens=4096,
-      temperature=0.0,
-      messages=updated_chain,
-      system=system_message
-    )
-    
-    # Check response status
-    if hasattr(response, 'status_code') and response.status_code != 200:
-        print(f"Warning: LLM API returned non-200 status code: {response.status_code}")
-        print(f"Response payload: {response}")
-        return ""  # Return empty string on error
-        
-    return process_model_output(response)
+    # The turn-invariant start of the prompt is cached by the API
+    system, messages = with_cache_control(message_chain)
+    estimated_tokens = estimate_request_tokens(system_message, updated_chain)
+
+    def send() -> Tuple[str, bool]:
+      # Another worker process sending the same request: wait for its response in the cache
+      # (if it gives up without one, the waiters race for the claim again)
+      claiming = coalesce and cache is not None and not cache.bypass
+      while claiming and not cache.claim(key):
+        time_left = _time_left()
+        if time_left is not None and time_left <= 0:
+          raise LLMDeadlineExceeded("LLM request deadline passed")
+        stored = cache.wait_for(key) if time_left is None else cache.wait_for(key, timeout=time_left)
+        if stored is not None:
+          return stored, True
+      try:
+        output = _request_output(system, messages, params, estimated_tokens)
+        if cache is not None and output:
+          cache.put(key, output)
+        return output, False
+      finally:
+        if claiming:
+          cache.release(key)
+
+    if coalesce:
+      (output, waited), shared = in_flight.do(key, send)
+    else:
+      output, waited = send()
+      shared = False
+    metrics.inc("llm_requests_total", source="coalesced" if shared or waited else "api", help_text="LLM responses by where they came from")
+    # Empty outputs are recorded too, so a strict replay finds every call
+    if cassette is not None and cassette.mode != REPLAY:
+      cassette.record_response(current_call_key(), key, output)
+    return output
   except Exception as e:
+    metrics.inc("llm_request_errors_total", error=type(e).__name__, help_text="Failed LLM requests by exception type")
     print(f"Error calling Anthropic API: {str(e)}")
     print(f"Full error details: {e}")
     return ""
@@ -94,6 +449,62 @@ def extract_system_message(message_chain: List[Dict[str, str]]) -> Tuple[str, Li
       updated_chain.append(message)
   return system_message, updated_chain
 
+def _cached_text(text: str) -> List[Dict[str, Any]]:
+  return [{'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}]
+
+def with_cache_control(message_chain: List[Dict[str, str]]) -> Tuple[Any, List[Dict[str, Any]]]:
+  """
+  The system and messages arguments for messages.create. When the chain is
+  a PromptChain (see utils.prompt) whose leading messages are the same every
+  turn, the last of them gets a cache_control breakpoint, so the API caches
+  the system prompt and that prefix. LLM_PROMPT_CACHING=off sends the plain
+  chain instead.
+  """
+  system_message, updated_chain = extract_system_message(message_chain)
+  static_prefix = getattr(message_chain, 'static_prefix', 0)
+  if not static_prefix or os.environ.get("LLM_PROMPT_CACHING") == "off":
+    return system_message, updated_chain
+
+  # The system prompt comes first in the cached prefix, so it must be static too
+  system_indexes = [i for i, message in enumerate(message_chain) if message['role'] == 'system']
+  if system_indexes and system_indexes[-1] >= static_prefix:
+    return system_message, updated_chain
+
+  static_messages = sum(1 for message in message_chain[:static_prefix] if message['role'] != 'system')
+  if static_messages:
+    messages = list(updated_chain)
+    last = messages[static_messages - 1]
+    messages[static_messages - 1] = {**last, 'content': _cached_text(last['content'])}
+    return system_message, messages
+  if system_message:
+    return _cached_text(system_message), updated_chain
+  return system_message, updated_chain
+
+def record_usage(response: Any) -> Optional[int]:
+  """
+  Adds the input, output and prompt cache tokens reported in response.usage
+  to the token counters; returns the input tokens that count towards the
+  rate limit, or None if the response has no usage.
+  """
+  usage = getattr(response, 'usage', None)
+  if usage is None:
+    return None
+  for kind in ('input', 'output'):
+    tokens = getattr(usage, f'{kind}_tokens', None)
+    if isinstance(tokens, int):
+      metrics.inc(f"llm_{kind}_tokens_total", tokens, help_text=f"{kind.capitalize()} tokens billed by the API")
+  cache_writes = getattr(usage, 'cache_creation_input_tokens', None)
+  if isinstance(cache_writes, int):
+    metrics.inc("llm_prompt_cache_write_tokens_total", cache_writes, help_text="Input tokens written to the API's prompt cache")
+  cache_reads = getattr(usage, 'cache_read_input_tokens', None)
+  if isinstance(cache_reads, int):
+    metrics.inc("llm_prompt_cache_read_tokens_total", cache_reads, help_text="Input tokens read from the API's prompt cache")
+  input_tokens = getattr(usage, 'input_tokens', None)
+  if not isinstance(input_tokens, int):
+    return None
+  # Cache writes count towards the input rate limit; cache reads do not
+  return input_tokens + (cache_writes if isinstance(cache_writes, int) else 0)
+
 def process_model_output(response: Any) -> str:
   return response.content[0].text
 
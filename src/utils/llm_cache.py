@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+# LLM calls run at temperature 0, so a response is stored under a hash of
+# everything that went into the request and reused for identical requests.
+# The cache file is shared by the experiment's worker processes, so it also
+# holds claims: the process sending a request claims its key, and the others
+# wait for its response rather than sending the same request at once.
+
+DEFAULT_CACHE_PATH = ".cache/llm_responses.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# A claim outlives three request timeouts (see utils.llm.ClientSettings) at
+# most, so one left by a crashed worker holds the others up only that long
+CLAIM_SECONDS = 180.0
+CLAIM_POLL_SECONDS = 0.05
+
+
+def cache_key(model: str, system_message: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "system": system_message, "messages": messages, "params": params},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite store of response texts by cache_key, evicting least recently used
+    entries once the stored texts exceed max_bytes.
+    With bypass set, lookups always miss but fresh responses are still stored.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, bypass: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._owner = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per process; a forked child opens its own
+        if self._pid != os.getpid():
+            # Claims name the process (and cache) that holds them
+            self._owner = uuid.uuid4().hex
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        if self.bypass:
+            return None
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        size = len(response.encode())
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._evict(connection)
+
+    def claim(self, key: str, seconds: float = CLAIM_SECONDS) -> bool:
+        """
+        Marks key as being requested by this cache (this process) for up to
+        seconds. False if another one holds an unexpired claim on it.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM claims WHERE key = ? AND expires < ?", (key, now))
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO claims (key, owner, expires) VALUES (?, ?, ?)",
+                    (key, self._owner, now + seconds)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return cursor.rowcount == 1
+
+    def release(self, key: str) -> None:
+        """Drops this cache's claim on key, if it holds one."""
+        with self._lock:
+            self._connect().execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, self._owner))
+
+    def wait_for(self, key: str, timeout: float = CLAIM_SECONDS, poll: float = CLAIM_POLL_SECONDS) -> Optional[str]:
+        """
+        The response stored for key once no unexpired claim is held on it;
+        None if the claim holder stored nothing or timeout seconds pass.
+        """
+        give_up = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                connection = self._connect()
+                claimed = connection.execute(
+                    "SELECT 1 FROM claims WHERE key = ? AND expires >= ?", (key, time.time())
+                ).fetchone()
+            if not claimed or time.monotonic() >= give_up:
+                return self.get(key)
+            time.sleep(poll)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        (total,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        stale_keys = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+        self.evictions += len(stale_keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+_response_cache: Optional[ResponseCache] = None
+_cache_configured = False
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    The cache call_llm_api uses, set up from the environment on first use:
+    LLM_CACHE_PATH (file, or "off" to disable), LLM_CACHE_MAX_BYTES and
+    LLM_CACHE_BYPASS=1.
+    """
+    global _response_cache, _cache_configured
+    if not _cache_configured:
+        path = os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if path != "off":
+            _response_cache = ResponseCache(
+                path,
+                max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                bypass=os.environ.get("LLM_CACHE_BYPASS") == "1"
+            )
+        _cache_configured = True
+    return _response_cache
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Replaces the cache call_llm_api uses; None turns caching off."""
+    global _response_cache, _cache_configured
+    _response_cache = cache
+    _cache_configured = True
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .timing import BUCKET_BOUNDS, Histogram, PhaseTimings
+
+# Process-wide counters, gauges and histograms for long experiment runs.
+# Code updates the shared `metrics` registry; a MetricsExporter writes it to
+# metrics.prom (Prometheus text format, for node_exporter's textfile
+# collector or a plain scrape of the file) and metrics.json every few
+# seconds. Nothing listens on a port.
+#
+# Experiment workers are separate processes: each game's updates are taken
+# from the worker's registry with drain() and merged into the parent's.
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float('inf') else f"{bound:g}"
+
+class MetricsRegistry:
+    """
+    Named metrics, each a counter, gauge or histogram (of seconds, see
+    utils.timing.Histogram) with one value per label set. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._types: Dict[str, str] = {}
+        self._values: Dict[str, Dict[LabelKey, Any]] = {}
+
+    def _series(self, name: str, kind: str, help_text: str) -> Dict[LabelKey, Any]:
+        # Called with the lock held
+        series = self._values.get(name)
+        if series is None:
+            self._types[name] = kind
+            self._help[name] = help_text
+            series = self._values[name] = {}
+        elif self._types[name] != kind:
+            raise ValueError(f"Metric {name} is a {self._types[name]}, not a {kind}")
+        return series
+
+    def inc(self, name: str, amount: float = 1, help_text: str = "", **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series(name, COUNTER, help_text)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, help_text: str = "", **labels: Any) -> None:
+        with self._lock:
+            self._series(name, GAUGE, help_text)[_label_key(labels)] = value
+
+    def observe(self, name: str, seconds: float, help_text: str = "", **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series(name, HISTOGRAM, help_text)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_timings(self, name: str, timings: PhaseTimings, help_text: str = "") -> None:
+        """Adds each stage histogram of timings to name, labelled by stage."""
+        stages = timings.to_dict()
+        with self._lock:
+            series = self._series(name, HISTOGRAM, help_text)
+            for stage, summary in stages.items():
+                series.setdefault(_label_key({'stage': stage}), Histogram()).merge(Histogram.from_dict(summary))
+
+    def value(self, name: str, **labels: Any) -> Any:
+        """The current value (a number, or a Histogram) of one series; None if never set."""
+        with self._lock:
+            return self._values.get(name, {}).get(_label_key(labels))
+
+    def _dump_locked(self) -> Dict[str, Any]:
+        return {
+            name: {
+                'type': self._types[name],
+                'help': self._help[name],
+                'series': [
+                    (key, value.to_dict() if self._types[name] == HISTOGRAM else value)
+                    for key, value in series.items()
+                ],
+            }
+            for name, series in self._values.items()
+        }
+
+    def dump(self) -> Dict[str, Any]:
+        """Picklable copy of every metric, for merge()."""
+        with self._lock:
+            return self._dump_locked()
+
+    def drain(self) -> Dict[str, Any]:
+        """dump(), then reset(), in one step."""
+        with self._lock:
+            dumped = self._dump_locked()
+            self._values = {}
+        return dumped
+
+    def merge(self, dumped: Dict[str, Any]) -> None:
+        """Adds another registry's dump(): counters and histograms add up, gauges take the new value."""
+        with self._lock:
+            for name, metric in dumped.items():
+                series = self._series(name, metric['type'], metric['help'])
+                for key, value in metric['series']:
+                    key = tuple(tuple(pair) for pair in key)
+                    if metric['type'] == COUNTER:
+                        series[key] = series.get(key, 0) + value
+                    elif metric['type'] == GAUGE:
+                        series[key] = value
+                    else:
+                        series.setdefault(key, Histogram()).merge(Histogram.from_dict(value))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._values):
+                kind = self._types[name]
+                if self._help[name]:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self._values[name].items()):
+                    if kind != HISTOGRAM:
+                        lines.append(f"{name}{_format_labels(key)} {value:g}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKET_BOUNDS, value.buckets):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_bound(bound)))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {value.total:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-ready view: every series by name, histograms summarised as in PhaseTimings.to_dict()."""
+        with self._lock:
+            return {
+                name: {
+                    'type': self._types[name],
+                    'series': [
+                        {
+                            'labels': dict(key),
+                            'value': value.to_dict() if self._types[name] == HISTOGRAM else value,
+                        }
+                        for key, value in sorted(series.items())
+                    ],
+                }
+                for name, series in sorted(self._values.items())
+            }
+
+
+    def _after_fork(self) -> None:
+        # A forked worker starts empty: its drain() must not send the parent's counts back to it
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+metrics = MetricsRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=metrics._after_fork)
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    # Readers of the file never see it half written
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+class MetricsExporter:
+    """
+    Writes registry to directory/metrics.prom and directory/metrics.json
+    every interval seconds from a daemon thread, and once more on stop().
+    Also sets engine_turns_per_second from engine_turns_total since start().
+    """
+
+    def __init__(self, directory: Path, registry: MetricsRegistry = metrics, interval: float = 15.0):
+        self.directory = Path(directory)
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = time.monotonic()
+        self._turns_at_start = 0.0
+
+    def _turns(self) -> float:
+        return self.registry.value("engine_turns_total") or 0
+
+    def start(self) -> "MetricsExporter":
+        self._started_at = time.monotonic()
+        self._turns_at_start = self._turns()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self) -> None:
+        elapsed = time.monotonic() - self._started_at
+        if elapsed > 0:
+            self.registry.set(
+                "engine_turns_per_second", (self._turns() - self._turns_at_start) / elapsed,
+                help_text="Turns played per second since the exporter started"
+            )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_atomically(self.directory / "metrics.prom", self.registry.to_prometheus())
+        _write_atomically(self.directory / "metrics.json", json.dumps(self.registry.snapshot(), indent=2))
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
@@ -0,0 +1,323 @@
+from collections.abc import Mapping
+from typing import Any, Iterator, List, Optional, Tuple
+
+# Hash array mapped trie with path copying: an update copies only the nodes on
+# the path to the changed key and shares every other node with the old map.
+# Iteration follows insertion order, like dict, which the engine relies on for
+# its hex visiting order.
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+
+class _Leaf:
+    __slots__ = ('hash', 'key', 'slot', 'value')
+
+    def __init__(self, hash_: int, key: Any, slot: int, value: Any):
+        self.hash = hash_
+        self.key = key
+        self.slot = slot
+        self.value = value
+
+
+class _Collision:
+    __slots__ = ('hash', 'leaves')
+
+    def __init__(self, hash_: int, leaves: Tuple[_Leaf, ...]):
+        self.hash = hash_
+        self.leaves = leaves
+
+
+class _Node:
+    __slots__ = ('bitmap', 'children')
+
+    def __init__(self, bitmap: int, children: tuple):
+        self.bitmap = bitmap
+        self.children = children
+
+
+_EMPTY_NODE = _Node(0, ())
+
+
+def _index(bitmap: int, bit: int) -> int:
+    return (bitmap & (bit - 1)).bit_count()
+
+def _find(node: _Node, hash_: int, key: Any) -> Optional[_Leaf]:
+    shift = 0
+    while True:
+        bit = 1 << ((hash_ >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return None
+        child = node.children[_index(node.bitmap, bit)]
+        if isinstance(child, _Leaf):
+            if child.hash == hash_ and (child.key is key or child.key == key):
+                return child
+            return None
+        if isinstance(child, _Collision):
+            for leaf in child.leaves:
+                if leaf.key is key or leaf.key == key:
+                    return leaf
+            return None
+        node = child
+        shift += _BITS
+
+def _build(leaves: List[_Leaf], shift: int) -> _Node:
+    """A node holding leaves, which have distinct keys, the way _assoc would lay them out."""
+    groups: List[List[_Leaf]] = [[] for _ in range(_WIDTH)]
+    for leaf in leaves:
+        groups[(leaf.hash >> shift) & _MASK].append(leaf)
+    bitmap = 0
+    children = []
+    for index, group in enumerate(groups):
+        if not group:
+            continue
+        bitmap |= 1 << index
+        if len(group) == 1:
+            children.append(group[0])
+        elif all(leaf.hash == group[0].hash for leaf in group):
+            children.append(_Collision(group[0].hash, tuple(group)))
+        else:
+            children.append(_build(group, shift + _BITS))
+    return _Node(bitmap, tuple(children))
+
+def _merge(a, b, shift: int) -> _Node:
+    # a and b are leaves or collisions with different hashes
+    index_a = (a.hash >> shift) & _MASK
+    index_b = (b.hash >> shift) & _MASK
+    if index_a == index_b:
+        return _Node(1 << index_a, (_merge(a, b, shift + _BITS),))
+    children = (a, b) if index_a < index_b else (b, a)
+    return _Node((1 << index_a) | (1 << index_b), children)
+
+def _assoc(node: _Node, shift: int, leaf: _Leaf) -> Tuple[_Node, Optional[_Leaf]]:
+    """Returns the new node and the leaf it replaced, if any."""
+    bit = 1 << ((leaf.hash >> shift) & _MASK)
+    pos = _index(node.bitmap, bit)
+    if not node.bitmap & bit:
+        children = node.children[:pos] + (leaf,) + node.children[pos:]
+        return _Node(node.bitmap | bit, children), None
+
+    child = node.children[pos]
+    replaced = None
+    if isinstance(child, _Node):
+        new_child, replaced = _assoc(child, shift + _BITS, leaf)
+    elif isinstance(child, _Leaf):
+        if child.hash == leaf.hash and (child.key is leaf.key or child.key == leaf.key):
+            new_child, replaced = leaf, child
+        elif child.hash == leaf.hash:
+            new_child = _Collision(leaf.hash, (child, leaf))
+        else:
+            new_child = _merge(child, leaf, shift + _BITS)
+    elif child.hash == leaf.hash:
+        leaves = list(child.leaves)
+        for i, existing in enumerate(leaves):
+            if existing.key is leaf.key or existing.key == leaf.key:
+                leaves[i], replaced = leaf, existing
+                break
+        else:
+            leaves.append(leaf)
+        new_child = _Collision(child.hash, tuple(leaves))
+    else:
+        new_child = _merge(child, leaf, shift + _BITS)
+
+    children = node.children[:pos] + (new_child,) + node.children[pos + 1:]
+    return _Node(node.bitmap, children), replaced
+
+def _dissoc(node: _Node, shift: int, hash_: int, key: Any):
+    """Returns the new node (None when empty) and the removed leaf, if any."""
+    bit = 1 << ((hash_ >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node, None
+    pos = _index(node.bitmap, bit)
+    child = node.children[pos]
+
+    if isinstance(child, _Node):
+        new_child, removed = _dissoc(child, shift + _BITS, hash_, key)
+    elif isinstance(child, _Leaf):
+        if child.hash != hash_ or not (child.key is key or child.key == key):
+            return node, None
+        new_child, removed = None, child
+    else:
+        remaining = tuple(leaf for leaf in child.leaves if not (leaf.key is key or leaf.key == key))
+        if len(remaining) == len(child.leaves):
+            return node, None
+        removed = next(leaf for leaf in child.leaves if leaf.key is key or leaf.key == key)
+        new_child = remaining[0] if len(remaining) == 1 else _Collision(child.hash, remaining)
+
+    if removed is None:
+        return node, None
+    if new_child is None:
+        if node.bitmap == bit:
+            return None, removed
+        children = node.children[:pos] + node.children[pos + 1:]
+        return _Node(node.bitmap & ~bit, children), removed
+    children = node.children[:pos] + (new_child,) + node.children[pos + 1:]
+    return _Node(node.bitmap, children), removed
+
+
+class _KeyOrder:
+    """Append-only persistent vector of (slot, key) entries in insertion order; PMap rebuilds it once mostly dead."""
+    __slots__ = ('count', 'shift', 'root', 'tail')
+
+    def __init__(self, count: int = 0, shift: int = _BITS, root: tuple = (), tail: tuple = ()):
+        self.count = count
+        self.shift = shift
+        self.root = root
+        self.tail = tail
+
+    def append(self, item: Any) -> '_KeyOrder':
+        if len(self.tail) < _WIDTH:
+            return _KeyOrder(self.count + 1, self.shift, self.root, self.tail + (item,))
+        pushed = self._push_full_tail()
+        return _KeyOrder(self.count + 1, pushed.shift, pushed.root, (item,))
+
+    @classmethod
+    def from_items(cls, items: List[Any]) -> '_KeyOrder':
+        """The vector holding items, built a full leaf at a time."""
+        order = cls()
+        for start in range(0, len(items), _WIDTH):
+            chunk = tuple(items[start:start + _WIDTH])
+            if order.tail:
+                order = order._push_full_tail()
+            order = _KeyOrder(order.count + len(chunk), order.shift, order.root, chunk)
+        return order
+
+    def _push_full_tail(self) -> '_KeyOrder':
+        # Moves a full tail into the tree, leaving the tail empty
+        tail_offset = self.count - len(self.tail)
+        if (tail_offset >> _BITS) >= (1 << self.shift):
+            root = (self.root, self._new_path(self.shift, self.tail))
+            return _KeyOrder(self.count, self.shift + _BITS, root, ())
+        return _KeyOrder(self.count, self.shift, self._push_tail(tail_offset, self.shift, self.root, self.tail), ())
+
+    @classmethod
+    def _new_path(cls, level: int, node: tuple) -> tuple:
+        return node if level == 0 else (cls._new_path(level - _BITS, node),)
+
+    @classmethod
+    def _push_tail(cls, tail_offset: int, level: int, parent: tuple, tail: tuple) -> tuple:
+        index = (tail_offset >> level) & _MASK
+        if level == _BITS:
+            child = tail
+        elif index < len(parent):
+            child = cls._push_tail(tail_offset, level - _BITS, parent[index], tail)
+        else:
+            child = cls._new_path(level - _BITS, tail)
+        return parent[:index] + (child,) + parent[index + 1:]
+
+    def __iter__(self) -> Iterator[Any]:
+        stack = [(self.root, self.shift)]
+        while stack:
+            node, level = stack.pop()
+            if level == 0:
+                yield from node
+            else:
+                stack.extend((child, level - _BITS) for child in reversed(node))
+        yield from self.tail
+
+
+def _live_entries(root: _Node, order: _KeyOrder) -> Iterator[Tuple[int, Any]]:
+    for slot, key in order:
+        # Skip keys that were deleted (or deleted and re-added under a later slot)
+        leaf = _find(root, hash(key), key)
+        if leaf is not None and leaf.slot == slot:
+            yield slot, key
+
+def _compact(root: _Node, order: _KeyOrder, count: int) -> _KeyOrder:
+    # Deleted keys stay in the order vector until they outnumber the live
+    # ones, then it is rebuilt from the live entries (keeping their slots), so
+    # iteration stays O(len) and the rebuild is paid for by the deletes
+    if order.count - count <= count + _WIDTH:
+        return order
+    return _KeyOrder.from_items(list(_live_entries(root, order)))
+
+
+class PMap(Mapping):
+    """
+    Immutable, insertion-ordered mapping with structural sharing.
+    set/delete/update return a new PMap in O(log n) per key and leave this one untouched.
+    """
+    __slots__ = ('_root', '_order', '_count', '_next_slot')
+
+    def __init__(self, initial: Optional[Mapping] = None):
+        self._root = _EMPTY_NODE
+        self._order = _KeyOrder()
+        self._count = 0
+        self._next_slot = 0
+        if initial:
+            # Built in one pass rather than one set() at a time
+            leaves = [_Leaf(hash(key), key, slot, value) for slot, (key, value) in enumerate(initial.items())]
+            self._root = _build(leaves, 0)
+            self._order = _KeyOrder.from_items([(leaf.slot, leaf.key) for leaf in leaves])
+            self._count = self._next_slot = len(leaves)
+
+    @classmethod
+    def _create(cls, root: _Node, order: _KeyOrder, count: int, next_slot: int) -> 'PMap':
+        new_map = cls.__new__(cls)
+        new_map._root = root
+        new_map._order = order
+        new_map._count = count
+        new_map._next_slot = next_slot
+        return new_map
+
+    def __getitem__(self, key: Any) -> Any:
+        leaf = _find(self._root, hash(key), key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf.value
+
+    def index_of(self, key: Any) -> int:
+        """Insertion rank of key: keys added later have larger ranks."""
+        leaf = _find(self._root, hash(key), key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf.slot
+
+    def __contains__(self, key: Any) -> bool:
+        return _find(self._root, hash(key), key) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._order.count == self._count:
+            # No deleted keys in the order vector, so no lookups needed
+            for _, key in self._order:
+                yield key
+            return
+        for _, key in _live_entries(self._root, self._order):
+            yield key
+
+    def __repr__(self) -> str:
+        return f"PMap({dict(self.items())!r})"
+
+    def __reduce__(self):
+        return (PMap, (dict(self.items()),))
+
+    def set(self, key: Any, value: Any) -> 'PMap':
+        hash_ = hash(key)
+        existing = _find(self._root, hash_, key)
+        if existing is not None:
+            if existing.value is value:
+                return self
+            root, _ = _assoc(self._root, 0, _Leaf(hash_, key, existing.slot, value))
+            return PMap._create(root, self._order, self._count, self._next_slot)
+        slot = self._next_slot
+        root, _ = _assoc(self._root, 0, _Leaf(hash_, key, slot, value))
+        order = _compact(root, self._order.append((slot, key)), self._count + 1)
+        return PMap._create(root, order, self._count + 1, slot + 1)
+
+    def update(self, updates: Mapping) -> 'PMap':
+        new_map = self
+        for key, value in updates.items():
+            new_map = new_map.set(key, value)
+        return new_map
+
+    def delete(self, key: Any) -> 'PMap':
+        root, removed = _dissoc(self._root, 0, hash(key), key)
+        if removed is None:
+            raise KeyError(key)
+        root = root or _EMPTY_NODE
+        order = _compact(root, self._order, self._count - 1)
+        return PMap._create(root, order, self._count - 1, self._next_slot)
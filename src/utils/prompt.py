@@ -1,9 +1,117 @@
-from typing import List, Dict, Any
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+import os
 import yaml
 from pathlib import Path
 from string import Template
 import json
 
+# Prompt files are YAML lists of messages whose content may hold ${param}
+# placeholders. Each file is parsed once (per mtime) into a CompiledPrompt:
+# static messages are kept as-is and dynamic ones keep their placeholders, so
+# composing a turn's prompt only substitutes the parameters.
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    text: str
+    messages: Tuple[Dict[str, str], ...]
+    # Per message: indentation of the literal block holding its content, or
+    # None for messages without placeholders
+    block_indents: Tuple[Optional[int], ...]
+    # False when placeholders sit where substituting into parsed content could
+    # differ from substituting into the text; such files take the text path
+    compiled: bool
+
+    @property
+    def is_static(self) -> bool:
+        return self.compiled and all(indent is None for indent in self.block_indents)
+
+class PromptChain(list):
+    """
+    A composed list of messages that also records how many of its leading
+    messages are the same on every turn (static_prefix): those come from
+    prompt files without placeholders, so call_llm_api can ask the API to
+    cache them (see utils.llm.with_cache_control).
+    """
+
+    def __init__(self, messages=(), static_prefix: int = 0):
+        super().__init__(messages)
+        self.static_prefix = static_prefix
+
+# libyaml's emitter, when installed, gives the same output several times faster
+_Dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+
+_compiled_prompts: Dict[str, Tuple[Tuple[int, int], CompiledPrompt]] = {}
+
+
+def _placeholder_count(text: str) -> int:
+    return sum(1 for _ in Template.pattern.finditer(text))
+
+def _literal_block_indent(text: str, node: yaml.ScalarNode) -> Optional[int]:
+    """Indentation of the lines of a "content: |" block scalar; None for other scalar styles."""
+    if node.style != '|':
+        return None
+    lines = text.splitlines()
+    header = lines[node.start_mark.line][node.start_mark.column:]
+    if any(char.isdigit() for char in header):
+        return None
+    for line in lines[node.start_mark.line + 1:]:
+        if line.strip():
+            return len(line) - len(line.lstrip(' '))
+    return None
+
+def compile_prompt(text: str) -> CompiledPrompt:
+    not_compiled = CompiledPrompt(text, (), (), False)
+    try:
+        root = yaml.compose(text)
+        parsed = yaml.safe_load(text)
+    except yaml.YAMLError:
+        return not_compiled
+    if not isinstance(root, yaml.SequenceNode):
+        return not_compiled
+
+    messages, block_indents = [], []
+    placeholders = 0
+    for item, message in zip(root.value, parsed):
+        if not isinstance(item, yaml.MappingNode):
+            return not_compiled
+        fields = {key.value: value for key, value in item.value}
+        if not isinstance(fields.get('content'), yaml.ScalarNode) or not isinstance(message.get('role'), str):
+            return not_compiled
+        content_placeholders = _placeholder_count(message['content'])
+        block_indent = None
+        if content_placeholders:
+            block_indent = _literal_block_indent(text, fields['content'])
+            if block_indent is None:
+                return not_compiled
+        placeholders += content_placeholders
+        messages.append({'role': message['role'], 'content': message['content']})
+        block_indents.append(block_indent)
+
+    # Placeholders outside message contents (names, roles, comments) also need the text path
+    if placeholders != _placeholder_count(text):
+        return not_compiled
+    return CompiledPrompt(text, tuple(messages), tuple(block_indents), True)
+
+def _unindent_value(value: str, indent: int) -> Optional[str]:
+    """
+    The text a parameter value contributes to a parsed block scalar: the YAML
+    parser strips the block indentation from every line after the first.
+    Returns None when the value would not stay inside the block.
+    """
+    if value.endswith('\n') or '\r' in value:
+        return None
+    lines = value.split('\n')
+    prefix = ' ' * indent
+    for i in range(1, len(lines)):
+        if lines[i].startswith(prefix):
+            lines[i] = lines[i][indent:]
+        elif not lines[i].strip(' '):
+            lines[i] = ''
+        else:
+            return None
+    return '\n'.join(lines)
+
 class PromptComposer:
     def __init__(self, prompts_dir: str = "src/prompts"):
         self.prompts_dir = Path(prompts_dir)
@@ -13,43 +121,96 @@ class PromptComposer:
         with open(full_path, 'r') as f:
             return f.read()
 
-    def compose_prompt(self, prompt_configs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
-        composed_chain = []
+    def load_compiled_prompt(self, filepath: str) -> CompiledPrompt:
+        """The compiled prompt file, reloaded whenever the file's mtime or size changes."""
+        full_path = str(self.prompts_dir / filepath)
+        stat = os.stat(full_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = _compiled_prompts.get(full_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        compiled = compile_prompt(self.load_prompt_file(filepath))
+        _compiled_prompts[full_path] = (version, compiled)
+        return compiled
+
+    def _template_params(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        template_params = config['template_params'].copy()
+        # Convert any dictionary values to YAML strings AND indent them properly
+        for key, value in template_params.items():
+            if isinstance(value, dict):
+                # Convert to YAML and indent each line by 4 spaces
+                yaml_str = yaml.dump(value, Dumper=_Dumper, default_flow_style=False)
+                indented_yaml = '\n'.join('    ' + line for line in yaml_str.splitlines())
+                template_params[key] = indented_yaml
+            elif isinstance(value, str) and '\n' in value:
+                # Keep the later lines of multi-line text inside the content block
+                template_params[key] = value.replace('\n', '\n    ')
+        return template_params
+
+    def _substitute_messages(self, compiled: CompiledPrompt, template_params: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
+        messages = []
+        for message, block_indent in zip(compiled.messages, compiled.block_indents):
+            if block_indent is None:
+                messages.append(dict(message))
+                continue
+            params = {}
+            for key, value in template_params.items():
+                params[key] = _unindent_value(str(value), block_indent)
+                if params[key] is None:
+                    return None
+            try:
+                content = Template(message['content']).substitute(params)
+            except KeyError as e:
+                raise KeyError(f"Missing template variable in prompt: {e}")
+            messages.append({'role': message['role'], 'content': content})
+        return messages
+
+    def _render_text(self, prompt_content: str, template_params: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        # Substitute into the whole text, then parse it
+        if template_params is not None:
+            # Use Template for ${variable} syntax
+            template = Template(prompt_content)
+            try:
+                prompt_content = template.substitute(template_params)
+            except KeyError as e:
+                raise KeyError(f"Missing template variable in prompt: {e}")
+        prompt_messages = yaml.safe_load(prompt_content)
+        if not isinstance(prompt_messages, list):
+            return []
+        return [
+            {'role': msg['role'], 'content': msg['content']}
+            for msg in prompt_messages
+        ]
+
+    def compose_prompt(self, prompt_configs: List[Dict[str, Any]]) -> PromptChain:
+        composed_chain = PromptChain()
+        prefix_is_static = True
         
         for config in prompt_configs:
-            # Load the raw prompt content
-            prompt_content = self.load_prompt_file(config['prompt_filepath'])
-            
-            # First apply template parameters if they exist
-            if 'template_params' in config:
-                template_params = config['template_params'].copy()
-                # Convert any dictionary values to YAML strings AND indent them properly
-                for key, value in template_params.items():
-                    if isinstance(value, dict):
-                        # Convert to YAML and indent each line by 4 spaces
-                        yaml_str = yaml.dump(value, default_flow_style=False)
-                        indented_yaml = '\n'.join('    ' + line for line in yaml_str.splitlines())
-                        template_params[key] = indented_yaml
-                
-                # Use Template for ${variable} syntax
-                template = Template(prompt_content)
-                try:
-                    prompt_content = template.substitute(template_params)
-                except KeyError as e:
-                    raise KeyError(f"Missing template variable in prompt: {e}")
-            # print(prompt_content)
-            # Then parse the templated content as YAML
-            prompt_messages = yaml.safe_load(prompt_content)
-            if isinstance(prompt_messages, list):
-                filtered_messages = [
-                    {'role': msg['role'], 'content': msg['content']}
-                    for msg in prompt_messages
-                ]
-                composed_chain.extend(filtered_messages)
+            compiled = self.load_compiled_prompt(config['prompt_filepath'])
+            template_params = self._template_params(config) if 'template_params' in config else None
+
+            messages = None
+            if compiled.compiled and template_params is not None:
+                messages = self._substitute_messages(compiled, template_params)
+            elif compiled.compiled and compiled.is_static:
+                messages = [dict(message) for message in compiled.messages]
+            if messages is None:
+                messages = self._render_text(compiled.text, template_params)
+                static = [template_params is None or _placeholder_count(compiled.text) == 0] * len(messages)
+            else:
+                # Messages without placeholders are copied from the file unchanged
+                static = [indent is None for indent in compiled.block_indents]
+            composed_chain.extend(messages)
+
+            for message_is_static in static:
+                prefix_is_static = prefix_is_static and message_is_static
+                if prefix_is_static:
+                    composed_chain.static_prefix += 1
                 
         return composed_chain
 
-def generate_prompt_chain(prompt_configs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+def generate_prompt_chain(prompt_configs: List[Dict[str, Any]]) -> PromptChain:
     composer = PromptComposer()
     return composer.compose_prompt(prompt_configs) 
 
@@ -0,0 +1,222 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Dict, List, Optional, TypeVar
+
+from .metrics import metrics
+
+# Every API request goes through one RequestScheduler per process. It holds a
+# request until the requests-per-minute and tokens-per-minute budgets allow
+# it, hands out slots round-robin between queues (one per game) so a busy game
+# cannot starve the others, and retries rate limits, overloads, server errors
+# and dropped connections with jittered exponential backoff. The anthropic
+# client's own retries are off (see ClientSettings.max_retries) so a request
+# is never retried twice over.
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, overloads, server errors, timeouts and connection errors."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    import anthropic
+    return isinstance(error, anthropic.APIConnectionError)
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait (its retry-after header), if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    value = headers.get('retry-after') if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def estimate_request_tokens(system_message: str, messages: List[Dict[str, str]]) -> int:
+    """Rough input tokens of a request (four characters a token), for the tokens-per-minute budget."""
+    characters = len(system_message or "") + sum(len(str(message.get('content', ""))) for message in messages)
+    return characters // 4 + 1
+
+
+class TokenBucket:
+    """
+    per_minute units refill continuously into a bucket of capacity units
+    (by default one second's worth). A request larger than the bucket is let
+    through when the bucket is full and leaves it in debt.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken; 0 if it can be taken now."""
+        self._refill()
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        """Corrects an earlier take(): negative amounts take more."""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    run(call, tokens, queue) waits for a slot under the budgets (None means
+    unlimited), calls call() and retries it up to max_retries times while it
+    raises retryable errors. Waiting requests are served one queue at a time,
+    in turn.
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 4,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        self.requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._condition = threading.Condition()
+        self._queues: Dict[str, Deque[object]] = {}
+        self._turns: Deque[str] = deque()
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0, queue: str = "") -> None:
+        """Blocks until this request is first in line and within budget, then spends its budget."""
+        ticket = object()
+        with self._condition:
+            if queue not in self._queues:
+                self._queues[queue] = deque()
+                self._turns.append(queue)
+            self._queues[queue].append(ticket)
+            while True:
+                head = self._queues[self._turns[0]][0]
+                if head is ticket:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+
+            # Spend the budget and pass the turn to the next queue
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self._turns.popleft()
+            self._queues[queue].popleft()
+            if self._queues[queue]:
+                self._turns.append(queue)
+            else:
+                del self._queues[queue]
+            self._condition.notify_all()
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charges the tokens budget for what a request really used instead of its estimate."""
+        if self.tokens is not None:
+            with self._condition:
+                self.tokens.give_back(estimated_tokens - actual_tokens)
+                self._condition.notify_all()
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Full-jitter exponential backoff, but never less than the server's retry-after."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error) if error is not None else None
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
+
+    def run(self, call: Callable[[], T], tokens: int = 0, queue: str = "") -> T:
+        attempt = 0
+        while True:
+            self.acquire(tokens, queue)
+            try:
+                return call()
+            except Exception as error:
+                if attempt >= self.max_retries or not is_retryable(error):
+                    raise
+                delay = self.backoff(attempt, error)
+                metrics.inc(
+                    "llm_retries_total",
+                    status=getattr(error, 'status_code', type(error).__name__),
+                    help_text="LLM requests retried, by status code or error"
+                )
+                attempt += 1
+                self._sleep(delay)
+
+
+_scheduler: Optional[RequestScheduler] = None
+
+def _env_number(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+def get_scheduler() -> RequestScheduler:
+    """
+    The scheduler call_llm_api uses, set up from the environment on first
+    use: LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE (both unlimited by
+    default) and LLM_MAX_RETRIES (default 4).
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler(
+            requests_per_minute=_env_number("LLM_REQUESTS_PER_MINUTE"),
+            tokens_per_minute=_env_number("LLM_TOKENS_PER_MINUTE"),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", 4))
+        )
+    return _scheduler
+
+def set_scheduler(scheduler: Optional[RequestScheduler]) -> None:
+    """Replaces the scheduler call_llm_api uses; None goes back to the environment's."""
+    global _scheduler
+    _scheduler = scheduler
+
+def _reset_after_fork() -> None:
+    # Waiters and the condition's lock belong to the parent's threads
+    set_scheduler(None)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,144 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Wall-clock timing of the stages of a turn. Code marks a stage with
+# `with timed("move"):`, which costs two perf_counter calls and a context
+# variable lookup, and nothing at all when no PhaseTimings is collecting.
+# run_game collects a PhaseTimings per game; the experiment runner merges
+# them into per-experiment histograms.
+
+# Upper bucket bounds in seconds, roughly 1-2.5-5 per decade from 10us to 60s
+BUCKET_BOUNDS = tuple(
+    scale * 10.0 ** exponent
+    for exponent in range(-5, 2)
+    for scale in (1.0, 2.5, 5.0)
+) + (60.0, float('inf'))
+
+_collector: contextvars.ContextVar = contextvars.ContextVar("phase_timings", default=None)
+
+
+class Histogram:
+    """Counts of observed durations per BUCKET_BOUNDS bucket, plus their count, sum, min and max."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKET_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram") -> None:
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (capped at the largest observation)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {
+                ('inf' if bound == float('inf') else f"{bound:g}"): count
+                for bound, count in zip(BUCKET_BOUNDS, self.buckets) if count
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        histogram = cls()
+        index = {('inf' if bound == float('inf') else f"{bound:g}"): i for i, bound in enumerate(BUCKET_BOUNDS)}
+        for bound, count in data['buckets'].items():
+            histogram.buckets[index[bound]] = count
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min'] if data['count'] else float('inf')
+        histogram.max = data['max']
+        return histogram
+
+
+class PhaseTimings:
+    """A Histogram per stage name. Thread-safe: both players' calls record into the same one."""
+
+    def __init__(self):
+        self.phases: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def merge(self, other: "PhaseTimings") -> None:
+        with self._lock:
+            for phase, histogram in other.phases.items():
+                self.phases.setdefault(phase, Histogram()).merge(histogram)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {phase: histogram.to_dict() for phase, histogram in sorted(self.phases.items())}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Any]]) -> "PhaseTimings":
+        timings = cls()
+        timings.phases = {phase: Histogram.from_dict(histogram) for phase, histogram in data.items()}
+        return timings
+
+
+def current_timings() -> Optional[PhaseTimings]:
+    return _collector.get()
+
+@contextmanager
+def collecting(timings: Optional[PhaseTimings]) -> Iterator[Optional[PhaseTimings]]:
+    """Sends the stages timed inside the block to timings."""
+    token = _collector.set(timings)
+    try:
+        yield timings
+    finally:
+        _collector.reset(token)
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    timings = _collector.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record(phase, time.perf_counter() - start)
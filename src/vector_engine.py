@@ -0,0 +1,302 @@
+"""
+Vectorized NumPy backend for the move, combat and spawn phases.
+
+The board is held as a (players x width x height) array of unit counts and
+every phase is resolved for the whole board in one pass. Outcomes match the
+per-hex actions for the same random seed: combat dice are drawn from the
+`random` module for all contested hexes at once, in the same hex and player
+order the per-hex combat_action uses.
+"""
+import random
+from dataclasses import replace
+from typing import Dict, Tuple, Any, List, Optional
+
+import numpy as np
+
+from game_state import GameState, Tile, Unit, PlayerState, BoardTally
+from input_action import get_input_action
+from output_sink import OutputSink, get_sink
+from turn_end_action import turn_end_phase
+from turn_history import compact_turn
+from utils.event_logger import GameEventLogger
+from utils.logger import logger
+from utils.pmap import PMap
+from utils.timing import timed
+
+
+def board_shape(world: Dict[Tuple[int, int], Tile]) -> Tuple[int, int]:
+    width = max(pos[0] for pos in world.keys()) + 1
+    height = max(pos[1] for pos in world.keys()) + 1
+    return width, height
+
+def world_to_counts(world: Dict[Tuple[int, int], Tile], num_players: int) -> np.ndarray:
+    """Returns a (num_players, width, height) array of unit counts."""
+    width, height = board_shape(world)
+    counts = np.zeros((num_players, width, height), dtype=np.int64)
+    for (x, y), tile in world.items():
+        for unit in tile.units:
+            counts[unit.player_id - 1, x, y] += 1
+    return counts
+
+def game_state_counts(game_state: GameState) -> np.ndarray:
+    """
+    The (num_players, board_size, board_size) unit counts of game_state's
+    world: the array the last resolve_phases kept on the tally, or else one
+    filled from the tally's occupied hexes rather than from every tile.
+    Callers must not modify it.
+    """
+    tally = game_state.board_tally
+    if tally.counts is not None:
+        return tally.counts
+    counts = np.zeros((game_state.num_players, game_state.board_size, game_state.board_size), dtype=np.int64)
+    world = game_state.world
+    for player_id, hexes in tally.occupied.items():
+        for x, y in hexes:
+            counts[player_id - 1, x, y] = sum(1 for unit in world[(x, y)].units if unit.player_id == player_id)
+    return counts
+
+def counts_to_world(counts: np.ndarray,
+                    world: PMap,
+                    previous_counts: np.ndarray) -> PMap:
+    """Rebuilds only the tiles whose counts differ from previous_counts."""
+    new_world = world
+    changed_xs, changed_ys = np.nonzero((counts != previous_counts).any(axis=0))
+    for x, y in zip(changed_xs.tolist(), changed_ys.tolist()):
+        units = [
+            Unit(player_id=player_idx + 1, health=1, movement_points=1)
+            for player_idx in range(counts.shape[0])
+            for _ in range(int(counts[player_idx, x, y]))
+        ]
+        new_world = new_world.set((x, y), Tile(position=world[(x, y)].position, units=units))
+    return new_world
+
+def counts_to_tally(counts: np.ndarray, world: PMap) -> BoardTally:
+    present = counts > 0
+    players_present = present.sum(axis=0)
+    held = present & (players_present == 1)
+    unit_counts = counts.sum(axis=(1, 2)).tolist()
+    controlled_hexes = held.sum(axis=(1, 2)).tolist()
+    occupied = {}
+    for player_idx in range(counts.shape[0]):
+        xs, ys = np.nonzero(present[player_idx])
+        occupied[player_idx + 1] = frozenset(zip(xs.tolist(), ys.tolist()))
+    contested_xs, contested_ys = np.nonzero(players_present > 1)
+    return BoardTally(
+        world,
+        {player_idx + 1: count for player_idx, count in enumerate(unit_counts)},
+        {player_idx + 1: count for player_idx, count in enumerate(controlled_hexes)},
+        occupied,
+        frozenset(zip(contested_xs.tolist(), contested_ys.tolist())),
+        counts
+    )
+
+def hex_distance(source: np.ndarray, destination: np.ndarray) -> np.ndarray:
+    """Vectorized hex_grid distance for (n, 2) arrays of odd-q offset positions."""
+    source_r = source[:, 1] - (source[:, 0] - (source[:, 0] & 1)) // 2
+    dest_r = destination[:, 1] - (destination[:, 0] - (destination[:, 0] & 1)) // 2
+    dq = destination[:, 0] - source[:, 0]
+    dr = dest_r - source_r
+    return np.maximum(np.maximum(np.abs(dq), np.abs(dr)), np.abs(dq + dr))
+
+def move_phase(counts: np.ndarray,
+               input_moves: Dict[Tuple[int, int], Dict[int, List[Dict[str, Any]]]]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Applies every input move at once.
+    Moves are checked against the counts at the start of the phase, which is
+    what get_input_action already caps them to.
+    """
+    num_players, width, height = counts.shape
+    # Flatten moves in the order the per-hex engine visits them: source hex, player, list order
+    flat_moves = sorted(
+        (
+            (source[0] * height + source[1], player_id, order, source, tuple(move['destination']), move['units'])
+            for source, player_moves in input_moves.items()
+            for player_id, moves in player_moves.items()
+            for order, move in enumerate(moves)
+        ),
+        key=lambda move: move[:3]
+    )
+    if not flat_moves:
+        return counts, []
+
+    _, player_ids, _, sources, destinations, units = zip(*flat_moves)
+    player_idx = np.array(player_ids, dtype=np.int64) - 1
+    src = np.array(sources, dtype=np.int64)
+    dest = np.array(destinations, dtype=np.int64)
+    units = np.array(units, dtype=np.int64)
+
+    dest_on_board = ((dest[:, 0] >= 0) & (dest[:, 0] < width) &
+                     (dest[:, 1] >= 0) & (dest[:, 1] < height))
+    legal = dest_on_board & (hex_distance(src, dest) == 1)
+    requested = np.where(legal, units, 0)
+
+    # Running total of units requested from each (player, source) group
+    group = (player_idx * width + src[:, 0]) * height + src[:, 1]
+    order = np.argsort(group, kind='stable')
+    sorted_group = group[order]
+    sorted_requested = requested[order]
+    sorted_cumsum = np.cumsum(sorted_requested)
+    group_start = np.r_[True, sorted_group[1:] != sorted_group[:-1]]
+    start_idx = np.maximum.accumulate(np.where(group_start, np.arange(len(order)), 0))
+    cumulative = np.empty_like(requested)
+    cumulative[order] = sorted_cumsum - (sorted_cumsum - sorted_requested)[start_idx]
+
+    available = counts[player_idx, src[:, 0], src[:, 1]]
+    valid = legal & (cumulative <= available)
+
+    new_counts = counts.copy()
+    np.add.at(new_counts, (player_idx[valid], src[valid, 0], src[valid, 1]), -units[valid])
+    np.add.at(new_counts, (player_idx[valid], dest[valid, 0], dest[valid, 1]), units[valid])
+
+    move_records = [
+        {
+            'source': source,
+            'destination': destination,
+            'units': int(unit_count),
+            'player_id': player_id
+        }
+        for is_valid, player_id, source, destination, unit_count
+        in zip(valid.tolist(), player_ids, sources, destinations, units.tolist())
+        if is_valid
+    ]
+    return new_counts, move_records
+
+def combat_phase(counts: np.ndarray) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Resolves combat in every contested hex with one batch of dice rolls."""
+    present = counts > 0
+    contested_xs, contested_ys = np.nonzero(present.sum(axis=0) >= 2)
+    if contested_xs.size == 0:
+        return counts, []
+
+    # (contested hexes, players) views, rows in world order
+    initial = counts[:, contested_xs, contested_ys].T
+    rolling = present[:, contested_xs, contested_ys].T
+
+    # One roll per present player per hex, drawn in hex then player id order
+    rolls = np.zeros(initial.shape, dtype=np.int64)
+    rolls[rolling] = [random.randint(1, 10) for _ in range(int(rolling.sum()))]
+    success = rolling & (rolls > 4)
+
+    # Each successful player deals its initial unit count to every other player
+    dealt = np.where(success, initial, 0)
+    damage = dealt.sum(axis=1, keepdims=True) - dealt
+    casualties = np.minimum(damage, initial)
+
+    new_counts = counts.copy()
+    new_counts[:, contested_xs, contested_ys] -= casualties.T
+
+    combat_records = [
+        {
+            'position': (x, y),
+            'player_1_casualties': int(casualty_row[0]),
+            'player_2_casualties': int(casualty_row[1]) if len(casualty_row) > 1 else 0
+        }
+        for x, y, casualty_row in zip(contested_xs.tolist(), contested_ys.tolist(), casualties.tolist())
+    ]
+    return new_counts, combat_records
+
+def spawn_phase(counts: np.ndarray) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Spawns one unit in every hex held by a single player."""
+    present = counts > 0
+    held_xs, held_ys = np.nonzero(present.sum(axis=0) == 1)
+    owners = np.argmax(present[:, held_xs, held_ys], axis=0)
+
+    new_counts = counts.copy()
+    new_counts[owners, held_xs, held_ys] += 1
+
+    spawn_records = [
+        {'position': (x, y), 'player_id': owner + 1}
+        for x, y, owner in zip(held_xs.tolist(), held_ys.tolist(), owners.tolist())
+    ]
+    return new_counts, spawn_records
+
+def resolve_phases(game_state: GameState) -> GameState:
+    """Runs the move, combat and spawn phases for the current turn on the whole board."""
+    turn_state = game_state.turns[game_state.current_turn]
+
+    initial_counts = game_state_counts(game_state)
+    counts, move_records = move_phase(initial_counts, turn_state.input_moves)
+    counts, combat_records = combat_phase(counts)
+    counts, spawn_records = spawn_phase(counts)
+    world = counts_to_world(counts, game_state.world, initial_counts)
+
+    for move in move_records:
+        logger.log_movement(game_state, move['source'], move['destination'], move['units'], move['player_id'])
+    for spawn in spawn_records:
+        logger.log_action("spawn", game_state, position=spawn['position'], details={"player_id": spawn['player_id']})
+
+    def with_records(player_state: PlayerState) -> PlayerState:
+        return PlayerState.from_state(
+            player_state,
+            turn_model_output={
+                **player_state.turn_model_output,
+                'combats': [*player_state.turn_model_output.get('combats', []), *combat_records],
+                'spawns': [*player_state.turn_model_output.get('spawns', []), *spawn_records]
+            }
+        )
+
+    new_turn_state = replace(
+        turn_state,
+        world=world,
+        player_one=with_records(turn_state.player_one),
+        player_two=with_records(turn_state.player_two),
+        move_actions=[*turn_state.move_actions, *move_records],
+        combat_actions=[*turn_state.combat_actions, *combat_records],
+        spawn_actions=[*turn_state.spawn_actions, *spawn_records]
+    )
+    turns = game_state.turns.set(game_state.current_turn, new_turn_state)
+
+    return (GameState.builder(game_state)
+            .with_world(world, counts_to_tally(counts, world))
+            .with_turns(turns)
+            .build())
+
+def turn(game_state: GameState, sink: Optional[OutputSink] = None) -> GameState:
+    """Same turn flow as engine.turn, with the board phases resolved by resolve_phases."""
+    sink = get_sink(sink)
+    event_logger = GameEventLogger()
+    new_state = game_state.begin_turn()
+
+    with timed("logging"):
+        event_logger.log_action("turn_start", new_state)
+    with timed("output"):
+        sink.emit("turn_start", new_state)
+
+    with timed("input"):
+        temp_state = get_input_action(new_state, (0, 0))
+    if not new_state.is_valid_state_change(temp_state, 'input'):
+        event_logger.log_error("input_validation", ValueError("Invalid state change"), new_state)
+        return new_state
+    new_state = temp_state
+    with timed("output"):
+        sink.emit("input", new_state)
+
+    with timed("board"):
+        temp_state = resolve_phases(new_state)
+    if not new_state.is_valid_state_change(temp_state, 'board'):
+        event_logger.log_error("board_validation", ValueError("Invalid state change"), new_state)
+        return new_state
+    new_state = temp_state
+
+    with timed("output"):
+        sink.emit("move", new_state)
+        sink.emit("combat", new_state)
+        sink.emit("spawn", new_state)
+
+    with timed("turn_end"):
+        temp_state = turn_end_phase(new_state)
+    if not new_state.is_valid_state_change(temp_state, 'turn_end'):
+        print("Warning: Invalid state change detected during turn end phase")
+    else:
+        new_state = temp_state
+
+    with timed("logging"):
+        event_logger.log_action("turn_end", new_state)
+    with timed("output"):
+        sink.emit("turn_end", new_state)
+    with timed("logging"):
+        event_logger.log_turn_state(new_state, new_state.turns[new_state.current_turn])
+    with timed("compact"):
+        new_state = compact_turn(new_state, new_state.current_turn)
+
+    return GameState.from_state(new_state, current_turn=new_state.current_turn + 1)
@@ -0,0 +1,142 @@
+"""
+Board encodings for the world_representation prompt parameter.
+
+"nested" is the original per-cell dict, which the prompt composer renders as
+YAML. The compact encodings are plain text and describe empty hexes briefly
+or not at all:
+
+    sparse  one line per occupied hex
+    rle     one line per row, with runs of empty hexes collapsed
+    dense   a table with one "yours/enemy" cell per hex
+
+A player picks one with the world_encoding key of its player config.
+"""
+import re
+import sys
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import yaml
+
+from game_state import GameState
+
+DEFAULT_ENCODING = "nested"
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]| {2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Offline approximation of a text's input tokens: one per word, number,
+    punctuation mark and run of indentation. Use utils.llm.count_tokens for
+    the exact count.
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+def _cell_counts(game_state: GameState, player_id: int) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """(your units, enemy units) for every occupied hex."""
+    counts = {}
+    for pos, tile in game_state.world.items():
+        if not tile.units:
+            continue
+        yours = sum(1 for unit in tile.units if unit.player_id == player_id)
+        counts[pos] = (yours, len(tile.units) - yours)
+    return counts
+
+def _header(game_state: GameState) -> List[str]:
+    return [
+        f"turn {game_state.current_turn} of {game_state.max_turns}, {game_state.game_status}",
+        f"board {game_state.board_size}x{game_state.board_size}, hexes are x,y",
+    ]
+
+def _cell_token(yours: int, enemy: int) -> str:
+    return (f"Y{yours}" if yours else "") + (f"E{enemy}" if enemy else "")
+
+def encode_sparse(game_state: GameState, player_id: int) -> str:
+    lines = _header(game_state) + ["occupied hexes (x,y yours enemy), all others are empty:"]
+    for (x, y), (yours, enemy) in sorted(_cell_counts(game_state, player_id).items()):
+        lines.append(f"{x},{y} {yours} {enemy}")
+    return "\n".join(lines)
+
+def encode_rle(game_state: GameState, player_id: int) -> str:
+    counts = _cell_counts(game_state, player_id)
+    lines = _header(game_state) + ["rows by y, hexes by x: Y<n> your units, E<n> enemy units, .<n> n empty hexes"]
+    for y in range(game_state.board_size):
+        tokens = []
+        empty_run = 0
+        for x in range(game_state.board_size):
+            if (x, y) in counts:
+                if empty_run:
+                    tokens.append(f".{empty_run}")
+                    empty_run = 0
+                tokens.append(_cell_token(*counts[(x, y)]))
+            else:
+                empty_run += 1
+        if empty_run:
+            tokens.append(f".{empty_run}")
+        lines.append(f"y{y}: {' '.join(tokens)}")
+    return "\n".join(lines)
+
+def encode_dense(game_state: GameState, player_id: int) -> str:
+    counts = _cell_counts(game_state, player_id)
+    size = game_state.board_size
+    lines = _header(game_state) + ["cells are yours/enemy, - is empty", "y\\x " + " ".join(str(x) for x in range(size))]
+    for y in range(size):
+        cells = [
+            f"{counts[(x, y)][0]}/{counts[(x, y)][1]}" if (x, y) in counts else "-"
+            for x in range(size)
+        ]
+        lines.append(f"{y} | " + " ".join(cells))
+    return "\n".join(lines)
+
+def _encode_nested(game_state: GameState, player_id: int) -> Dict[str, Any]:
+    from input_action import create_llm_world_representation
+    return create_llm_world_representation(game_state, player_id)
+
+ENCODINGS: Dict[str, Callable[[GameState, int], Union[str, Dict[str, Any]]]] = {
+    "nested": _encode_nested,
+    "sparse": encode_sparse,
+    "rle": encode_rle,
+    "dense": encode_dense,
+}
+
+def encode_world(game_state: GameState, player_id: int, encoding: str = DEFAULT_ENCODING) -> Union[str, Dict[str, Any]]:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown world encoding: {encoding}")
+    return ENCODINGS[encoding](game_state, player_id)
+
+def encoding_text(game_state: GameState, player_id: int, encoding: str) -> str:
+    """The text an encoding adds to the prompt (nested is rendered as YAML, as the composer does)."""
+    encoded = encode_world(game_state, player_id, encoding)
+    if isinstance(encoded, dict):
+        return yaml.dump(encoded, default_flow_style=False)
+    return encoded
+
+def encoding_token_counts(game_state: GameState,
+                          player_id: int,
+                          counter: Callable[[str], int] = estimate_tokens) -> Dict[str, int]:
+    """Token count of every encoding of this board, by encoding name."""
+    return {
+        encoding: counter(encoding_text(game_state, player_id, encoding))
+        for encoding in ENCODINGS
+    }
+
+def main():
+    # Compare the encodings of a fresh board; pass --api for exact counts from the API
+    counter = estimate_tokens
+    if "--api" in sys.argv:
+        from utils.llm import count_tokens
+        counter = count_tokens
+    for board_size in (5, 9, 15):
+        game_state = GameState.from_config({
+            'board_size': board_size,
+            'max_turns': 10,
+            'num_players': 2,
+            'player_one_config': {},
+            'player_two_config': {},
+        })
+        print(f"\nBoard {board_size}x{board_size}:")
+        for encoding, tokens in encoding_token_counts(game_state, 1, counter).items():
+            print(f"{encoding:8}{tokens:8}")
+
+if __name__ == "__main__":
+    main()
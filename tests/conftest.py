@@ -21,3 +21,35 @@ def basic_config():
 @pytest.fixture
 def initial_game_state(basic_config):
     return GameState.from_config(basic_config)
+
+@pytest.fixture(autouse=True)
+def no_response_cache():
+    # Tests never read or fill the on-disk LLM response cache
+    from utils.llm_cache import set_response_cache
+    set_response_cache(None)
+    yield
+    set_response_cache(None)
+
+@pytest.fixture(autouse=True)
+def no_cassette():
+    # Tests record and replay only through cassettes they set up themselves
+    from utils.cassette import set_cassette
+    set_cassette(None)
+    yield
+    set_cassette(None)
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    # Every test starts counting from zero
+    from utils.metrics import metrics
+    metrics.reset()
+    yield
+    metrics.reset()
+
+@pytest.fixture(autouse=True)
+def default_scheduler():
+    # No rate budgets leak between tests
+    from utils.rate_limit import set_scheduler
+    set_scheduler(None)
+    yield
+    set_scheduler(None)
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+# A local stand-in for the Messages API. Each request takes the next scripted
+# (status, delay) reply; once the script runs out every reply is a 200.
+# 429 replies carry a retry-after header, like the real API's.
+
+
+def message_body(text: str) -> dict:
+    return {
+        "id": "msg_fake",
+        "type": "message",
+        "role": "assistant",
+        "model": "fake-model",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 5},
+    }
+
+class FakeAnthropicServer:
+    def __init__(self, text: str = '{"moves": []}', script: Optional[List[Tuple[int, float]]] = None, retry_after: float = 0):
+        self.text = text
+        self.script = list(script or [])
+        self.retry_after = retry_after
+        self.requests: List[dict] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['content-length'])))
+                with server._lock:
+                    server.requests.append(body)
+                    status, delay = server.script.pop(0) if server.script else (200, 0.0)
+                time.sleep(delay)
+                if status == 200:
+                    payload = message_body(server.text)
+                else:
+                    payload = {"type": "error", "error": {"type": "rate_limit_error", "message": "slow down"}}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(data)))
+                if status == 429:
+                    self.send_header('retry-after', str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeAnthropicServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
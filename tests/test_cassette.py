@@ -0,0 +1,112 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from game_state import GameState
+from input_action import get_ai_moves
+from utils.cassette import RECORD, REPLAY, Cassette, CassetteMissError, call_context, set_cassette
+from utils.llm import call_llm_api
+
+MESSAGES = [{'role': 'user', 'content': 'Your move.'}]
+MOVES = {'moves': [{'source': [0, 2], 'destination': [1, 2], 'units': 1}]}
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    return str(tmp_path / "cassettes" / "games.jsonl.gz")
+
+@pytest.fixture
+def named_game(basic_config):
+    return GameState.from_config({**basic_config, 'game_id': "alpha_vs_beta_1"})
+
+def fake_client(text):
+    client = MagicMock()
+    client.messages.create.return_value = SimpleNamespace(content=[SimpleNamespace(text=text)])
+    return client
+
+def test_recorded_entries_replay_by_game_turn_and_player(cassette_path):
+    recorder = Cassette(cassette_path, RECORD)
+    recorder.record_moves(("g1", 1, 1), MOVES)
+    recorder.record_response(("g1", 1, 2), "hash", '{"moves": []}')
+    recorder.close()
+
+    player = Cassette(cassette_path, REPLAY)
+    assert player.lookup_moves(("g1", 1, 1)) == MOVES
+    assert player.lookup_response(("g1", 1, 2), "hash") == '{"moves": []}'
+
+def test_strict_replay_fails_on_a_miss(cassette_path):
+    recorder = Cassette(cassette_path, RECORD)
+    recorder.record_moves(("g1", 1, 1), MOVES)
+    recorder.close()
+
+    with pytest.raises(CassetteMissError, match="turn 2, player 1"):
+        Cassette(cassette_path, REPLAY).lookup_moves(("g1", 2, 1))
+    assert Cassette(cassette_path, REPLAY, strict=False).lookup_moves(("g1", 2, 1)) is None
+
+def test_flushes_append_to_one_file(cassette_path):
+    # Each flush adds a gzip member, as each experiment worker does after a game
+    for game_id in ("g1", "g2"):
+        recorder = Cassette(cassette_path, RECORD)
+        recorder.record_moves((game_id, 1, 1), MOVES)
+        recorder.flush()
+
+    player = Cassette(cassette_path, REPLAY)
+    assert player.lookup_moves(("g1", 1, 1)) == player.lookup_moves(("g2", 1, 1)) == MOVES
+
+def test_call_llm_api_records_and_replays_within_call_context(cassette_path):
+    recorder = Cassette(cassette_path, RECORD)
+    set_cassette(recorder)
+    with patch('utils.llm.get_client', return_value=fake_client('{"moves": []}')):
+        with call_context("g1", 3, 2):
+            assert call_llm_api(MESSAGES) == '{"moves": []}'
+    recorder.close()
+
+    set_cassette(Cassette(cassette_path, REPLAY))
+    client = fake_client("unused")
+    with patch('utils.llm.get_client', return_value=client):
+        with call_context("g1", 3, 2):
+            assert call_llm_api(MESSAGES) == '{"moves": []}'
+        with call_context("g1", 4, 2), pytest.raises(CassetteMissError):
+            call_llm_api(MESSAGES)
+    client.messages.create.assert_not_called()
+
+def test_get_ai_moves_replays_recorded_moves_without_the_api(cassette_path, named_game):
+    recorder = Cassette(cassette_path, RECORD)
+    set_cassette(recorder)
+    with patch('input_action.call_llm_api', return_value='{"moves": [{"source": [0, 2], "destination": [1, 2], "units": 1}]}') as api:
+        assert get_ai_moves(named_game, 1) == MOVES
+    assert api.call_count == 1
+    recorder.close()
+
+    set_cassette(Cassette(cassette_path, REPLAY))
+    with patch('input_action.call_llm_api') as api:
+        assert get_ai_moves(named_game, 1) == MOVES
+        with pytest.raises(CassetteMissError):
+            get_ai_moves(named_game, 2)
+    api.assert_not_called()
+
+def test_parse_failure_turns_are_recorded_and_replay_strictly(cassette_path, named_game):
+    recorder = Cassette(cassette_path, RECORD)
+    set_cassette(recorder)
+    with patch('utils.llm.get_client', return_value=fake_client("not json")):
+        assert get_ai_moves(named_game, 1) == {}
+    recorder.close()
+
+    set_cassette(Cassette(cassette_path, REPLAY))
+    client = fake_client("unused")
+    with patch('utils.llm.get_client', return_value=client):
+        assert get_ai_moves(named_game, 1) == {}
+    client.messages.create.assert_not_called()
+
+def test_empty_llm_responses_are_recorded(cassette_path):
+    recorder = Cassette(cassette_path, RECORD)
+    set_cassette(recorder)
+    with patch('utils.llm.get_client', return_value=fake_client("")):
+        with call_context("g1", 1, 1):
+            assert call_llm_api(MESSAGES) == ""
+    recorder.close()
+
+    set_cassette(Cassette(cassette_path, REPLAY))
+    client = fake_client("unused")
+    with patch('utils.llm.get_client', return_value=client):
+        with call_context("g1", 1, 1):
+            assert call_llm_api(MESSAGES) == ""
+    client.messages.create.assert_not_called()
@@ -1,5 +1,5 @@
 import pytest
-from combat_action import combat_action
+from combat_action import combat_action, combat_phase
 from game_state import GameState, Unit, Tile, Position, TurnState, PlayerState
 import random
 
@@ -107,4 +107,28 @@ def test_combat_action_failed_roll(initial_game_state):
         new_state = combat_action(state, (0, 2))
         
         # Both rolls fail, no casualties
-        assert len(new_state.world[(0, 2)].units) == 2 
\ No newline at end of file
+        assert len(new_state.world[(0, 2)].units) == 2 
+
+def test_combat_phase_matches_per_hex_actions(initial_game_state):
+    world = dict(initial_game_state.world)
+    world[(1, 1)] = Tile(position=Position(1, 1), units=[
+        Unit(player_id=1, health=1, movement_points=1),
+        Unit(player_id=2, health=1, movement_points=1)
+    ])
+    world[(3, 3)] = Tile(position=Position(3, 3), units=[
+        Unit(player_id=2, health=1, movement_points=1),
+        Unit(player_id=1, health=1, movement_points=1),
+        Unit(player_id=1, health=1, movement_points=1)
+    ])
+    state = GameState.from_state(initial_game_state, world=world)
+
+    random.seed(3)
+    expected = state
+    for hex_pos in state.world.keys():
+        expected = combat_action(expected, hex_pos)
+    random.seed(3)
+    actual = combat_phase(state)
+
+    assert actual.world == expected.world
+    assert actual.turns[1].combat_actions == expected.turns[1].combat_actions
+    assert len(actual.turns[1].combat_actions) == 2
@@ -0,0 +1,65 @@
+import json
+import time
+import pytest
+from utils.event_logger import BufferedLogWriter, GameEventLogger
+
+@pytest.fixture
+def log_path(tmp_path):
+    return tmp_path / "game.log"
+
+def read_lines(path):
+    return path.read_text().splitlines() if path.exists() else []
+
+def test_lines_are_buffered_until_flush(log_path):
+    writer = BufferedLogWriter(str(log_path), max_batch=100, flush_interval=60)
+    writer.write('{"n":1}')
+    writer.write('{"n":2}')
+
+    assert read_lines(log_path) == []
+    writer.flush()
+    assert read_lines(log_path) == ['{"n":1}', '{"n":2}']
+    writer.close()
+
+def test_background_thread_writes_full_batches(log_path):
+    writer = BufferedLogWriter(str(log_path), max_batch=10, flush_interval=60)
+    for n in range(25):
+        writer.write(json.dumps({"n": n}))
+
+    deadline = time.monotonic() + 5
+    while len(read_lines(log_path)) < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(read_lines(log_path)) >= 20
+
+    writer.close()
+    assert [json.loads(line)["n"] for line in read_lines(log_path)] == list(range(25))
+
+def test_background_thread_writes_after_interval(log_path):
+    writer = BufferedLogWriter(str(log_path), max_batch=100, flush_interval=0.05)
+    writer.write('{"n":1}')
+
+    deadline = time.monotonic() + 5
+    while not read_lines(log_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read_lines(log_path) == ['{"n":1}']
+    writer.close()
+
+def test_writer_can_be_reused_after_close(log_path):
+    writer = BufferedLogWriter(str(log_path), max_batch=100, flush_interval=60)
+    writer.write('{"n":1}')
+    writer.close()
+    writer.write('{"n":2}')
+    writer.close()
+
+    assert read_lines(log_path) == ['{"n":1}', '{"n":2}']
+
+def test_event_logger_writes_compact_json_lines(initial_game_state, log_path, monkeypatch):
+    logger = GameEventLogger()
+    monkeypatch.setattr(logger, "_writer", BufferedLogWriter(str(log_path), flush_interval=60))
+
+    logger.log_movement(initial_game_state, (0, 0), (1, 0), 1, 1)
+    logger.log_action("turn_end", initial_game_state)
+    logger.flush()
+
+    entries = [json.loads(line) for line in read_lines(log_path)]
+    assert [entry["action"] for entry in entries] == ["movement", "turn_end"]
+    assert entries[0]["details"]["units_moved"] == 1
@@ -0,0 +1,90 @@
+import json
+import pytest
+import yaml
+import engine
+import experiment_runner
+from experiment_runner import build_jobs, run_experiment, setup_experiment_environment
+
+def no_input_action(game_state, cell_pos):
+    return game_state
+
+@pytest.fixture
+def experiment_config():
+    return {
+        'experiment_name': 'pool_test',
+        'iterations': 2,
+        'player_configs': [
+            {'name': 'Alpha', 'turn_prompt_config': ['expansion.txt']},
+            {'name': 'Beta', 'turn_prompt_config': ['attack.txt']},
+            {'name': 'Gamma', 'turn_prompt_config': ['attack.txt']},
+        ],
+    }
+
+@pytest.fixture
+def results_dir(experiment_config, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Forked workers inherit the patched engine
+    monkeypatch.setattr(engine, "get_input_action", no_input_action)
+    monkeypatch.setattr(experiment_runner, "get_client", lambda: None)
+    return setup_experiment_environment(experiment_config)
+
+def test_build_jobs_covers_every_matchup_and_iteration(experiment_config, results_dir):
+    jobs = build_jobs(experiment_config, results_dir)
+
+    assert [(job['player_one_name'], job['player_two_name'], job['iteration']) for job in jobs] == [
+        ('Alpha', 'Beta', 1), ('Alpha', 'Beta', 2),
+        ('Alpha', 'Gamma', 1), ('Alpha', 'Gamma', 2),
+        ('Beta', 'Gamma', 1), ('Beta', 'Gamma', 2),
+    ]
+    assert jobs[0]['player_one_config']['turn_prompt_config'][0]['prompt_filepath'] == 'expansion.txt'
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_results_are_saved_per_matchup(experiment_config, results_dir, workers):
+    results = run_experiment({**experiment_config, 'workers': workers}, results_dir)
+
+    assert len(results) == 6
+    assert all(
+        set(result) == {'iteration', 'final_scores', 'player_one_name', 'player_two_name', 'game_id', 'timings'}
+        for result in results
+    )
+    with open(results_dir / 'Alpha_vs_Gamma.yaml') as f:
+        matchup_results = yaml.safe_load(f)
+    assert [result['iteration'] for result in matchup_results] == [1, 2]
+    assert all(result['player_two_name'] == 'Gamma' for result in matchup_results)
+    assert len(list((results_dir / 'replays').iterdir())) == 6
+
+def test_stage_timings_are_saved_per_game_and_experiment(experiment_config, results_dir):
+    run_experiment(experiment_config, results_dir)
+
+    with open(results_dir / 'timings.json') as f:
+        timings = json.load(f)
+    assert set(timings['games']) == {job['game_id'] for job in build_jobs(experiment_config, results_dir)}
+    turns = sum(game['turn']['count'] for game in timings['games'].values())
+    assert timings['experiment']['turn']['count'] == turns
+    assert {'move', 'combat', 'spawn', 'turn_end', 'output', 'logging'} <= set(timings['experiment'])
+    with open(results_dir / 'Alpha_vs_Beta.yaml') as f:
+        assert 'timings' not in yaml.safe_load(f)[0]
+
+def test_listed_games_are_profiled(experiment_config, results_dir):
+    run_experiment({**experiment_config, 'profile_games': ['Alpha_vs_Beta_2']}, results_dir)
+
+    assert [path.name for path in (results_dir / 'profiles').iterdir()] == ['Alpha_vs_Beta_2.prof']
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_metrics_from_every_game_are_exported(experiment_config, results_dir, workers):
+    run_experiment({**experiment_config, 'workers': workers}, results_dir)
+
+    with open(results_dir / 'timings.json') as f:
+        turns = json.load(f)['experiment']['turn']['count']
+    with open(results_dir / 'metrics.json') as f:
+        snapshot = json.load(f)
+    assert snapshot['engine_games_total']['series'][0]['value'] == 6
+    assert snapshot['engine_turns_total']['series'][0]['value'] == turns
+    assert f"engine_turns_total {turns}" in (results_dir / 'metrics.prom').read_text()
+
+def test_rate_budgets_are_split_between_workers():
+    assert experiment_runner.rate_limited_scheduler({}) is None
+    scheduler = experiment_runner.rate_limited_scheduler({'requests_per_minute': 600, 'tokens_per_minute': 90000}, workers=3)
+
+    assert scheduler.requests.rate * 60 == pytest.approx(200)
+    assert scheduler.tokens.rate * 60 == pytest.approx(30000)
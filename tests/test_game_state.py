@@ -0,0 +1,78 @@
+import pytest
+from game_state import GameState
+
+def test_from_config_only_creates_first_turn(basic_config):
+    state = GameState.from_config({**basic_config, 'max_turns': 5000})
+
+    assert list(state.turns.keys()) == [1]
+    assert state.max_turns == 5000
+
+def test_begin_turn_creates_turn_on_demand(basic_config):
+    config = {**basic_config, 'player_one_config': {'name': 'Alpha', 'turn_prompt_config': [{'prompt_filepath': 'test_1.txt'}]}}
+    state = GameState.from_config(config)
+    state = GameState.from_state(state, current_turn=2).begin_turn()
+
+    assert list(state.turns.keys()) == [1, 2]
+    turn_state = state.turns[2]
+    assert turn_state.turn_number == 2
+    assert turn_state.player_one.name == 'Alpha'
+    assert turn_state.player_one.turn_prompt_config == [{'prompt_filepath': 'test_1.txt'}]
+    assert turn_state.player_two.name == 'Player 2'
+
+def test_begin_turn_keeps_existing_turn(initial_game_state):
+    assert initial_game_state.begin_turn() is initial_game_state
+
+def test_board_tally_follows_phases(initial_game_state):
+    from dataclasses import replace
+    from move_action import move_phase
+    from spawn_action import spawn_phase
+    from game_state import BoardTally
+
+    turns = initial_game_state.turns.set(1, replace(
+        initial_game_state.turns[1],
+        input_moves={(0, 2): {1: [{'destination': (1, 2), 'units': 1}], 2: []}}
+    ))
+    state = spawn_phase(move_phase(GameState.from_state(initial_game_state, turns=turns)))
+
+    assert state.tally.world is state.world
+    assert state.tally == BoardTally.from_world(state.world, 2)
+    assert state.board_tally.unit_counts == {1: 4, 2: 3}
+    assert state.board_tally.controlled_hexes == {1: 2, 2: 1}
+    assert state.calculate_scores() == {1: 8, 2: 5}
+
+def test_board_tally_recomputed_for_replaced_world(initial_game_state):
+    world = dict(initial_game_state.world)
+    world[(2, 2)] = world[(0, 2)]
+    state = GameState.from_state(initial_game_state, world=world, tally=initial_game_state.board_tally)
+
+    assert state.board_tally.unit_counts == {1: 4, 2: 2}
+
+def test_debug_checks_catch_stale_tally(basic_config):
+    from game_state import BoardTally
+
+    state = GameState.from_config({**basic_config, 'debug_checks': True})
+    tally = BoardTally(state.world, {1: 99, 2: 2}, {1: 1, 2: 1})
+    broken = GameState.from_state(state, tally=tally)
+
+    assert state.is_valid_state_change(GameState.from_state(state, tally=state.board_tally))
+    assert not state.is_valid_state_change(broken)
+
+def test_board_tally_tracks_occupied_and_contested_hexes(initial_game_state):
+    from game_state import BoardTally, Tile, Unit
+
+    contested_tile = Tile(position=(2, 2), units=[
+        Unit(player_id=1, health=1, movement_points=1),
+        Unit(player_id=2, health=1, movement_points=1)
+    ])
+    updates = {(2, 2): contested_tile, (4, 2): Tile(position=(4, 2), units=[])}
+    world = initial_game_state.world.update(updates)
+    tally = initial_game_state.board_tally.updated(world, initial_game_state.world, updates)
+
+    assert set(tally.occupied[1]) == {(0, 2), (2, 2)}
+    assert set(tally.occupied[2]) == {(2, 2)}
+    assert list(tally.contested) == [(2, 2)]
+    assert tally.held_hexes() == [(0, 2)]
+    assert tally == BoardTally.from_world(world, 2)
+
+def test_in_world_order(initial_game_state):
+    assert initial_game_state.in_world_order([(3, 1), (0, 4), (1, 0)]) == [(0, 4), (1, 0), (3, 1)]
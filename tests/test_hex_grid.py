@@ -0,0 +1,44 @@
+import pytest
+from hex_grid import get_topology, offset_to_axial
+
+def test_neighbors_even_and_odd_columns():
+    topology = get_topology(5, 5)
+
+    assert set(topology.neighbors[(2, 2)]) == {(3, 2), (3, 1), (2, 1), (1, 1), (1, 2), (2, 3)}
+    assert set(topology.neighbors[(1, 1)]) == {(2, 2), (2, 1), (1, 0), (0, 2), (0, 1), (1, 2)}
+
+def test_neighbors_are_clipped_at_board_edge():
+    topology = get_topology(5, 5)
+
+    assert set(topology.neighbors[(0, 0)]) == {(1, 0), (0, 1)}
+    assert all(pos in topology for pos in topology.neighbors[(4, 4)])
+
+def test_adjacency_is_symmetric():
+    topology = get_topology(6, 4)
+
+    for pos, adjacent in topology.neighbors.items():
+        for other in adjacent:
+            assert topology.is_adjacent(other, pos)
+            assert topology.distance(pos, other) == 1
+
+@pytest.mark.parametrize("source,destination,expected", [
+    ((0, 0), (0, 0), 0),
+    ((0, 0), (4, 0), 4),
+    ((0, 0), (0, 4), 4),
+    ((1, 1), (3, 3), 3),
+])
+def test_distance(source, destination, expected):
+    assert get_topology(5, 5).distance(source, destination) == expected
+
+def test_is_legal_move():
+    topology = get_topology(5, 5)
+
+    assert topology.is_legal_move((2, 2), (2, 3))
+    assert not topology.is_legal_move((2, 2), (2, 2))
+    assert not topology.is_legal_move((2, 2), (3, 3))
+    assert not topology.is_legal_move((4, 4), (5, 4))
+    assert topology.is_legal_move((2, 2), (4, 2), movement_points=2)
+
+def test_get_topology_is_cached():
+    assert get_topology(5, 5) is get_topology(5, 5)
+    assert offset_to_axial(3, 3) == (3, 2)
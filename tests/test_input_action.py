@@ -1,3 +1,4 @@
+import threading
 import pytest
 from input_action import (
     create_llm_world_representation,
@@ -108,3 +109,103 @@ def test_get_ai_moves_invalid_response(mock_create_chain, mock_call_api, sample_
     result = get_ai_moves(sample_game_state, player_id=1)
     
     assert result == {}
+
+def test_get_input_action_prompts_players_concurrently(sample_game_state):
+    # Each call waits for the other one, so sequential calls would time out
+    barrier = threading.Barrier(2, timeout=5)
+    moves = {
+        1: {"moves": [{"source": [1, 1], "destination": [1, 2], "units": 1}]},
+        2: {"moves": [{"source": [1, 1], "destination": [1, 0], "units": 1}]},
+    }
+
+    def waiting_ai_moves(game_state, player_id):
+        barrier.wait()
+        return moves[player_id]
+
+    with patch('input_action.get_ai_moves', side_effect=waiting_ai_moves):
+        new_state = get_input_action(sample_game_state, (0, 0))
+
+    input_moves = new_state.turns[1].input_moves
+    assert list(input_moves) == [(1, 1)]
+    assert input_moves[(1, 1)][1][0]['destination'] == (1, 2)
+    assert input_moves[(1, 1)][2][0]['destination'] == (1, 0)
+
+@patch('input_action.call_llm_api')
+@patch('input_action.generate_prompt_chain')
+def test_get_ai_moves_leaves_prompt_config_unchanged(mock_generate_chain, mock_call_api, sample_game_state):
+    prompt_config = {'prompt_filepath': 'expansion.txt', 'template_params': {}}
+    turn_state = sample_game_state.turns[1]
+    turns = {1: TurnState(
+        turn_number=1,
+        world=turn_state.world,
+        player_one=PlayerState(turn_prompt_config=[prompt_config]),
+        player_two=PlayerState(turn_prompt_config=[prompt_config])
+    )}
+    game_state = GameState.from_state(sample_game_state, turns=turns)
+    mock_generate_chain.return_value = []
+    mock_call_api.return_value = '{"moves": []}'
+
+    get_ai_moves(game_state, player_id=1)
+
+    assert prompt_config == {'prompt_filepath': 'expansion.txt', 'template_params': {}}
+    sent_config = mock_generate_chain.call_args[0][0][0]
+    assert sent_config['template_params']['world_representation']['board']['cells']['1,1']['units']['your_units'] == 1
+
+@patch('input_action.call_llm_api', return_value='{"moves": []}')
+@patch('input_action.create_message_chain', return_value=["test chain"])
+def test_ai_move_stages_are_timed_from_worker_threads(mock_create_chain, mock_call_api, sample_game_state):
+    from input_action import get_both_ai_moves
+    from utils.timing import PhaseTimings, collecting
+    timings = PhaseTimings()
+    with collecting(timings):
+        get_both_ai_moves(sample_game_state)
+
+    for stage in ("encode_world", "prompt", "llm_call", "parse"):
+        assert timings.phases[stage].count == 2
+
+@patch('input_action.call_llm_api', return_value='not json')
+@patch('input_action.create_message_chain', return_value=["test chain"])
+def test_parse_failures_are_counted(mock_create_chain, mock_call_api, sample_game_state):
+    from utils.metrics import metrics
+    get_ai_moves(sample_game_state, player_id=2)
+
+    assert metrics.value("ai_move_parse_failures_total", player=2) == 1
+
+def deadline_game_state(sample_game_state, player_config):
+    turn_state = sample_game_state.turns[1]
+    turns = {1: TurnState(
+        turn_number=1,
+        world=turn_state.world,
+        player_one=PlayerState(player_config=player_config),
+        player_two=PlayerState()
+    )}
+    return GameState(**{**sample_game_state.__dict__, 'turns': turns})
+
+@patch('input_action.create_message_chain', return_value=["test chain"])
+def test_missed_deadline_falls_back_to_offline_moves(mock_create_chain, sample_game_state):
+    from utils.llm import LLMDeadlineExceeded
+    from utils.metrics import metrics
+    game_state = deadline_game_state(sample_game_state, {'llm_deadline': 0.1, 'fallback_player': 'greedy_expansion'})
+    with patch('input_action.call_llm_api_with_deadline', side_effect=LLMDeadlineExceeded("late")) as api:
+        result = get_ai_moves(game_state, player_id=1)
+
+    assert api.call_args.args[1] == 0.1
+    assert result['moves']
+    assert all(move['units'] == 1 for move in result['moves'])
+    assert metrics.value("ai_move_fallbacks_total", player=1) == 1
+
+@patch('input_action.create_message_chain', return_value=["test chain"])
+def test_deadline_settings_reach_the_hedged_call(mock_create_chain, sample_game_state):
+    game_state = deadline_game_state(sample_game_state, {'llm_deadline': 5.0, 'hedge_after': 1.5})
+    with patch('input_action.call_llm_api_with_deadline', return_value='{"moves": []}') as api:
+        assert get_ai_moves(game_state, player_id=1) == {"moves": []}
+
+    assert api.call_args.args[1:] == (5.0, 1.5)
+
+@patch('input_action.create_message_chain', return_value=["test chain"])
+def test_fallback_player_must_be_offline(mock_create_chain, sample_game_state):
+    from utils.llm import LLMDeadlineExceeded
+    game_state = deadline_game_state(sample_game_state, {'llm_deadline': 0.1, 'fallback_player': 'llm'})
+    with patch('input_action.call_llm_api_with_deadline', side_effect=LLMDeadlineExceeded("late")):
+        with pytest.raises(ValueError, match="offline"):
+            get_ai_moves(game_state, player_id=1)
@@ -1,3 +1,5 @@
+import threading
+import time
 import pytest
 import yaml
 from string import Template
@@ -8,7 +10,10 @@ from utils.llm import (
     call_llm_api,
     create_message_chain,
     extract_system_message,
-    process_model_output
+    process_model_output,
+    registry,
+    ClientSettings,
+    DEFAULT_MODEL
 )
 
 @pytest.fixture
@@ -94,3 +99,271 @@ def test_create_message_chain_with_variables(tmp_path):
     message_chain = create_message_chain(str(prompt_file), variables)
     
     assert message_chain[0]['content'] == 'Hello Alice, your score is 100'
+
+def message_response(text):
+    return {
+        "id": "msg_test",
+        "type": "message",
+        "role": "assistant",
+        "model": DEFAULT_MODEL,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 1, "output_tokens": 1},
+    }
+
+@pytest.fixture
+def fake_api():
+    httpx = pytest.importorskip("httpx")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=message_response('{"moves": []}'))
+
+    registry.use_transport(httpx.MockTransport(handler))
+    yield requests
+    registry.use_transport()
+
+def test_registry_reuses_clients(fake_api):
+    client = registry.get_client()
+
+    assert registry.get_client() is client
+    assert registry.get_client(settings=ClientSettings(timeout=5.0)) is not client
+    assert registry.get_client("another-model") is not client
+
+def test_registry_applies_settings(fake_api):
+    client = registry.get_client(settings=ClientSettings(timeout=5.0, connect_timeout=1.0, max_retries=0))
+
+    assert client.max_retries == 0
+    assert client.timeout.read == 5.0
+    assert client.timeout.connect == 1.0
+
+def test_call_llm_api_uses_fake_transport(fake_api):
+    result = call_llm_api([
+        {'role': 'system', 'content': 'You are a player.'},
+        {'role': 'user', 'content': 'Your move.'},
+    ])
+
+    assert result == '{"moves": []}'
+    assert len(fake_api) == 1
+    assert fake_api[0].url.path == "/v1/messages"
+
+def test_use_transport_replaces_existing_clients(fake_api):
+    httpx = pytest.importorskip("httpx")
+    client = registry.get_client()
+    registry.use_transport(httpx.MockTransport(lambda request: httpx.Response(500)))
+
+    assert registry.get_client() is not client
+
+def slow_responses(*delays_and_outputs):
+    # Each call takes the next (delay, output)
+    calls = iter(delays_and_outputs)
+    lock = threading.Lock()
+
+    def fake_call(message_chain, **kwargs):
+        with lock:
+            delay, output = next(calls)
+        time.sleep(delay)
+        return output
+    return fake_call
+
+def test_deadline_returns_a_fast_response():
+    from utils.llm import call_llm_api_with_deadline
+    with patch('utils.llm.call_llm_api', side_effect=slow_responses((0.0, "fast"))):
+        assert call_llm_api_with_deadline([], deadline=1.0) == "fast"
+
+def test_hedged_request_wins_when_the_first_is_slow():
+    from utils.llm import call_llm_api_with_deadline
+    from utils.metrics import metrics
+    fake = slow_responses((0.5, "slow"), (0.0, "hedge"))
+    with patch('utils.llm.call_llm_api', side_effect=fake) as api:
+        assert call_llm_api_with_deadline([], deadline=2.0, hedge_after=0.05) == "hedge"
+    assert api.call_count == 2
+    assert api.call_args_list[1].kwargs == {'coalesce': False}
+    assert metrics.value("llm_hedged_requests_total") == 1
+
+def test_deadline_exceeded_raises():
+    from utils.llm import LLMDeadlineExceeded, call_llm_api_with_deadline
+    with patch('utils.llm.call_llm_api', side_effect=slow_responses((0.3, "late"), (0.3, "late"))):
+        start = time.monotonic()
+        with pytest.raises(LLMDeadlineExceeded):
+            call_llm_api_with_deadline([], deadline=0.1, hedge_after=0.02)
+        assert time.monotonic() - start < 0.25
+
+def test_hedge_delay_needs_enough_samples():
+    import utils.llm as llm
+    with patch.object(llm, '_request_latency', llm.Histogram()) as latency:
+        assert llm.hedge_delay(0.9, min_samples=5) is None
+        for seconds in (0.1, 0.1, 0.1, 0.1, 2.0):
+            latency.observe(seconds)
+        assert llm.hedge_delay(0.5, min_samples=5) == 0.1
+        assert llm.hedge_delay(0.99, min_samples=5) == 2.0
+
+def test_single_flight_shares_one_call_between_overlapping_callers():
+    from utils.llm import SingleFlight
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def call():
+        calls.append(1)
+        release.wait()
+        return "response"
+
+    def caller():
+        results.append(flight.do("key", call))
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("response", False)] + [("response", True)] * 3
+    # Finished calls are not remembered
+    assert flight.do("key", lambda: "again") == ("again", False)
+
+def test_single_flight_shares_errors():
+    from utils.llm import SingleFlight
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("overloaded")
+
+    def follower():
+        started.wait()
+        try:
+            flight.do("key", lambda: "unused")
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(RuntimeError):
+        flight.do("key", failing)
+    thread.join()
+    assert len(errors) == 1
+
+def test_identical_concurrent_requests_are_sent_once():
+    from types import SimpleNamespace
+    from utils.metrics import metrics
+    release = threading.Event()
+    client = MagicMock()
+
+    def create(**kwargs):
+        release.wait()
+        return SimpleNamespace(content=[SimpleNamespace(text='{"moves": []}')])
+    client.messages.create.side_effect = create
+
+    results = []
+    chain = [{'role': 'user', 'content': 'Turn 1, your move.'}]
+    with patch('utils.llm.get_client', return_value=client):
+        threads = [threading.Thread(target=lambda: results.append(call_llm_api(chain))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while not client.messages.create.called:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert call_llm_api(chain, coalesce=False) == '{"moves": []}'
+
+    assert results == ['{"moves": []}'] * 5
+    assert client.messages.create.call_count == 2
+    assert metrics.value("llm_requests_total", source="coalesced") == 4
+    assert metrics.value("llm_requests_total", source="api") == 2
+
+def prompt_chain(static_prefix, *roles):
+    from utils.prompt import PromptChain
+    return PromptChain([{'role': role, 'content': f"{role} {i}"} for i, role in enumerate(roles)], static_prefix)
+
+def test_cache_breakpoint_goes_on_the_last_static_message():
+    from utils.llm import with_cache_control
+    system, messages = with_cache_control(prompt_chain(3, 'system', 'user', 'assistant', 'user'))
+
+    assert system == "system 0"
+    assert messages[0] == {'role': 'user', 'content': 'user 1'}
+    assert messages[1]['content'] == [{'type': 'text', 'text': 'assistant 2', 'cache_control': {'type': 'ephemeral'}}]
+    assert messages[2] == {'role': 'user', 'content': 'user 3'}
+
+def test_cache_breakpoint_on_a_static_system_prompt_alone():
+    from utils.llm import with_cache_control
+    system, messages = with_cache_control(prompt_chain(1, 'system', 'user'))
+
+    assert system == [{'type': 'text', 'text': 'system 0', 'cache_control': {'type': 'ephemeral'}}]
+    assert messages == [{'role': 'user', 'content': 'user 1'}]
+
+def test_no_breakpoint_without_a_static_prefix(monkeypatch):
+    from utils.llm import with_cache_control
+    plain = ("system 0", [{'role': 'user', 'content': 'user 1'}])
+
+    assert with_cache_control([{'role': 'system', 'content': 'system 0'}, {'role': 'user', 'content': 'user 1'}]) == plain
+    assert with_cache_control(prompt_chain(0, 'system', 'user')) == plain
+    # A dynamic system prompt after the static messages changes the whole prefix
+    assert with_cache_control(prompt_chain(1, 'user', 'system', 'user'))[1][0] == {'role': 'user', 'content': 'user 0'}
+    monkeypatch.setenv("LLM_PROMPT_CACHING", "off")
+    assert with_cache_control(prompt_chain(2, 'system', 'user')) == plain
+
+def test_call_llm_api_sends_cache_control_and_counts_cache_tokens():
+    from types import SimpleNamespace
+    from utils.metrics import metrics
+    client = MagicMock()
+    client.messages.create.return_value = SimpleNamespace(
+        content=[SimpleNamespace(text='{"moves": []}')],
+        usage=SimpleNamespace(input_tokens=50, output_tokens=5, cache_creation_input_tokens=0, cache_read_input_tokens=2000)
+    )
+    with patch('utils.llm.get_client', return_value=client):
+        call_llm_api(prompt_chain(2, 'system', 'user', 'user'))
+
+    kwargs = client.messages.create.call_args.kwargs
+    assert kwargs['system'] == "system 0"
+    assert kwargs['messages'][0]['content'][0]['cache_control'] == {'type': 'ephemeral'}
+    assert metrics.value("llm_prompt_cache_read_tokens_total") == 2000
+    assert metrics.value("llm_prompt_cache_write_tokens_total") == 0
+
+def test_abandoned_requests_time_out_at_the_deadline(monkeypatch):
+    pytest.importorskip("httpx")
+    from utils.llm import LLMDeadlineExceeded, call_llm_api_with_deadline
+    from utils.metrics import metrics
+    from utils.rate_limit import RequestScheduler, set_scheduler
+    from .fake_anthropic_server import FakeAnthropicServer
+
+    with FakeAnthropicServer(script=[(200, 2.0)]) as server:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        registry.close()
+        set_scheduler(RequestScheduler(max_retries=0))
+        try:
+            start = time.monotonic()
+            with pytest.raises(LLMDeadlineExceeded):
+                call_llm_api_with_deadline([{'role': 'user', 'content': 'Your move.'}], deadline=0.2)
+            # The request's thread is released soon after the deadline, not when the reply arrives
+            while not metrics.value("llm_request_errors_total", error="APITimeoutError"):
+                assert time.monotonic() - start < 1.5
+                time.sleep(0.01)
+        finally:
+            registry.close()
+
+def test_hedge_executor_is_created_once():
+    import utils.llm as llm
+    llm._reset_hedge_executor()
+    executors = []
+    threads = [threading.Thread(target=lambda: executors.append(llm._get_hedge_executor())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(executor) for executor in executors}) == 1
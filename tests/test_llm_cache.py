@@ -0,0 +1,165 @@
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from utils.llm import call_llm_api
+from utils.llm_cache import ResponseCache, cache_key, set_response_cache
+
+MESSAGES = [{'role': 'user', 'content': 'Your move.'}]
+PARAMS = {'max_tokens': 4096, 'temperature': 0.0}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache" / "responses.sqlite"))
+    yield cache
+    cache.close()
+
+def test_cache_key_covers_every_input():
+    key = cache_key("model-a", "system", MESSAGES, PARAMS)
+
+    assert key == cache_key("model-a", "system", [dict(MESSAGES[0])], dict(PARAMS))
+    assert key != cache_key("model-b", "system", MESSAGES, PARAMS)
+    assert key != cache_key("model-a", "other system", MESSAGES, PARAMS)
+    assert key != cache_key("model-a", "system", MESSAGES + MESSAGES, PARAMS)
+    assert key != cache_key("model-a", "system", MESSAGES, {**PARAMS, 'temperature': 1.0})
+
+def test_get_and_put_count_hits_and_misses(cache):
+    assert cache.get("k") is None
+    cache.put("k", "response")
+
+    assert cache.get("k") == "response"
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+def test_entries_persist_across_instances(cache):
+    cache.put("k", "response")
+    reopened = ResponseCache(cache.path)
+
+    assert reopened.get("k") == "response"
+    reopened.close()
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_bytes = 20
+    cache.put("old", "a" * 8)
+    cache.put("used", "b" * 8)
+    cache.get("old")
+    cache.put("new", "c" * 8)
+
+    assert cache.get("used") is None
+    assert cache.get("old") == "a" * 8
+    assert cache.get("new") == "c" * 8
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= 20
+
+def test_bypass_skips_lookups_but_stores(cache):
+    cache.put("k", "stale")
+    cache.bypass = True
+
+    assert cache.get("k") is None
+    cache.put("k", "fresh")
+    cache.bypass = False
+    assert cache.get("k") == "fresh"
+    assert cache.stats()['misses'] == 0
+
+def fake_client(text):
+    client = MagicMock()
+    client.messages.create.return_value = SimpleNamespace(content=[SimpleNamespace(text=text)])
+    return client
+
+def test_call_llm_api_reuses_cached_response(cache):
+    set_response_cache(cache)
+    client = fake_client('{"moves": []}')
+
+    with patch('utils.llm.get_client', return_value=client):
+        first = call_llm_api(MESSAGES)
+        second = call_llm_api(MESSAGES)
+        uncached = call_llm_api(MESSAGES, use_cache=False)
+
+    assert first == second == uncached == '{"moves": []}'
+    assert client.messages.create.call_count == 2
+    assert cache.stats()['hits'] == 1
+
+def test_call_llm_api_does_not_cache_failures(cache):
+    set_response_cache(cache)
+    client = MagicMock()
+    client.messages.create.side_effect = RuntimeError("overloaded")
+
+    with patch('utils.llm.get_client', return_value=client):
+        assert call_llm_api(MESSAGES) == ""
+
+    assert cache.stats()['entries'] == 0
+
+def test_claims_are_held_by_one_cache_at_a_time(cache):
+    other_worker = ResponseCache(cache.path)
+    try:
+        assert cache.claim("k")
+        assert not other_worker.claim("k")
+        cache.release("k")
+        assert other_worker.claim("k")
+        # Expired claims can be taken over
+        other_worker.release("k")
+        assert cache.claim("k", seconds=-1)
+        assert other_worker.claim("k")
+    finally:
+        other_worker.close()
+
+def test_waiters_claim_again_when_the_sender_stores_nothing(cache):
+    other_worker = ResponseCache(cache.path)
+    try:
+        assert cache.claim("k")
+        cache.release("k")
+        # The sender failed: the waiter gets nothing and may claim the key itself
+        assert other_worker.wait_for("k", timeout=1) is None
+        assert other_worker.claim("k")
+        assert not cache.claim("k")
+    finally:
+        other_worker.close()
+
+def test_identical_requests_from_two_workers_are_sent_once(cache):
+    from utils.metrics import metrics
+    # A second ResponseCache on the same file stands in for another worker
+    # process, whose in-process single-flight table the first cannot see
+    other_worker = ResponseCache(cache.path)
+    sending = threading.Event()
+    release = threading.Event()
+    client = MagicMock()
+
+    def create(**kwargs):
+        sending.set()
+        release.wait(timeout=10)
+        return SimpleNamespace(content=[SimpleNamespace(text='{"moves": []}')])
+    client.messages.create.side_effect = create
+
+    def waiting_call():
+        with patch('utils.llm.get_response_cache', return_value=other_worker):
+            results.append(call_llm_api(MESSAGES))
+
+    wait_for = other_worker.wait_for
+
+    def wait_then_release(key, **kwargs):
+        # The other worker found the claim: let the first request finish
+        release.set()
+        return wait_for(key, **kwargs)
+    other_worker.wait_for = wait_then_release
+
+    results = []
+    set_response_cache(cache)
+    separate_processes = SimpleNamespace(do=lambda key, call: (call(), False))
+    try:
+        with patch('utils.llm.get_client', return_value=client), patch('utils.llm.in_flight', separate_processes):
+            sender = threading.Thread(target=lambda: results.append(call_llm_api(MESSAGES)))
+            sender.start()
+            assert sending.wait(timeout=10)
+            waiter = threading.Thread(target=waiting_call)
+            waiter.start()
+            sender.join(timeout=10)
+            waiter.join(timeout=10)
+    finally:
+        release.set()
+        other_worker.close()
+
+    assert results == ['{"moves": []}'] * 2
+    assert client.messages.create.call_count == 1
+    assert metrics.value("llm_requests_total", source="api") == 1
+    assert metrics.value("llm_requests_total", source="coalesced") == 1
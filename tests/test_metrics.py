@@ -0,0 +1,98 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from engine import run_game
+from game_state import GameState
+from output_sink import NullSink
+from utils.llm import call_llm_api
+from utils.metrics import MetricsExporter, MetricsRegistry, metrics
+from utils.timing import PhaseTimings
+
+MESSAGES = [{'role': 'user', 'content': 'Your move.'}]
+
+def test_counters_and_gauges_keep_one_value_per_label_set():
+    registry = MetricsRegistry()
+    registry.inc("requests_total", source="api")
+    registry.inc("requests_total", 2, source="api")
+    registry.inc("requests_total", source="cache")
+    registry.set("queue_depth", 3)
+
+    assert registry.value("requests_total", source="api") == 3
+    assert registry.value("requests_total", source="cache") == 1
+    assert registry.value("queue_depth") == 3
+    assert registry.value("requests_total", source="replay") is None
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.inc("engine_turns_total", 7, help_text="Turns played")
+    registry.observe("llm_request_seconds", 0.3, model="m")
+    registry.observe("llm_request_seconds", 2.0, model="m")
+
+    lines = registry.to_prometheus().splitlines()
+    assert "# HELP engine_turns_total Turns played" in lines
+    assert "# TYPE engine_turns_total counter" in lines
+    assert "engine_turns_total 7" in lines
+    assert "# TYPE llm_request_seconds histogram" in lines
+    assert 'llm_request_seconds_bucket{model="m",le="0.5"} 1' in lines
+    assert 'llm_request_seconds_bucket{model="m",le="2.5"} 2' in lines
+    assert 'llm_request_seconds_bucket{model="m",le="+Inf"} 2' in lines
+    assert 'llm_request_seconds_sum{model="m"} 2.3' in lines
+    assert 'llm_request_seconds_count{model="m"} 2' in lines
+
+def test_drained_metrics_merge_into_another_registry():
+    worker, parent = MetricsRegistry(), MetricsRegistry()
+    parent.inc("engine_turns_total", 5)
+    worker.inc("engine_turns_total", 3)
+    worker.observe("llm_request_seconds", 0.1)
+    worker.set("engine_turns_per_second", 9.0)
+
+    parent.merge(worker.drain())
+    assert parent.value("engine_turns_total") == 8
+    assert parent.value("llm_request_seconds").count == 1
+    assert parent.value("engine_turns_per_second") == 9.0
+    assert worker.dump() == {}
+
+def test_exporter_writes_prometheus_and_json_files(tmp_path):
+    registry = MetricsRegistry()
+    exporter = MetricsExporter(tmp_path, registry, interval=60).start()
+    registry.inc("engine_turns_total", 4)
+    exporter.stop()
+
+    assert "engine_turns_total 4" in (tmp_path / "metrics.prom").read_text()
+    snapshot = json.loads((tmp_path / "metrics.json").read_text())
+    assert snapshot["engine_turns_total"]["series"] == [{'labels': {}, 'value': 4}]
+    assert snapshot["engine_turns_per_second"]["series"][0]["value"] > 0
+
+def test_call_llm_api_counts_latency_and_tokens():
+    client = MagicMock()
+    client.messages.create.return_value = SimpleNamespace(
+        content=[SimpleNamespace(text='{"moves": []}')],
+        usage=SimpleNamespace(input_tokens=1200, output_tokens=35)
+    )
+    with patch('utils.llm.get_client', return_value=client):
+        call_llm_api(MESSAGES)
+        call_llm_api(MESSAGES)
+    client.messages.create.side_effect = RuntimeError("overloaded")
+    with patch('utils.llm.get_client', return_value=client):
+        call_llm_api(MESSAGES)
+
+    assert metrics.value("llm_requests_total", source="api") == 2
+    assert metrics.value("llm_input_tokens_total") == 2400
+    assert metrics.value("llm_output_tokens_total") == 70
+    assert metrics.value("llm_request_seconds").count == 3
+    assert metrics.value("llm_request_errors_total", error="RuntimeError") == 1
+
+def test_run_game_counts_turns_and_stage_times(basic_config):
+    config = {
+        **basic_config,
+        'max_turns': 3,
+        'player_one_config': {'player_type': 'random', 'seed': 2},
+        'player_two_config': {'player_type': 'random', 'seed': 3},
+    }
+    timings = PhaseTimings()
+    run_game(GameState.from_config(config), sink=NullSink(), timings=timings)
+
+    turns = timings.phases["turn"].count
+    assert metrics.value("engine_turns_total") == turns
+    assert metrics.value("engine_games_total") == 1
+    assert metrics.value("turn_stage_seconds", stage="move").count == turns
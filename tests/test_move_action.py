@@ -1,5 +1,6 @@
 import pytest
-from move_action import move_action
+from dataclasses import replace
+from move_action import move_action, move_phase
 from game_state import GameState, Unit, Tile, Position, TurnState, PlayerState
 
 def test_move_action_basic(initial_game_state):
@@ -121,4 +122,24 @@ def test_move_action_no_moves(initial_game_state):
     new_state = move_action(state, (0, 2))
     
     # State should remain unchanged
-    assert len(new_state.world[(0, 2)].units) == 2
\ No newline at end of file
+    assert len(new_state.world[(0, 2)].units) == 2
+
+def test_move_phase_commits_all_hexes(initial_game_state):
+    turns = {
+        1: replace(
+            initial_game_state.turns[1],
+            input_moves={
+                (0, 2): {1: [{'destination': (1, 2), 'units': 2}], 2: []},
+                (4, 2): {1: [], 2: [{'destination': (3, 2), 'units': 1}]}
+            }
+        )
+    }
+    state = GameState.from_state(initial_game_state, turns=turns)
+    new_state = move_phase(state)
+
+    assert len(new_state.world[(0, 2)].units) == 0
+    assert len(new_state.world[(1, 2)].units) == 2
+    assert len(new_state.world[(3, 2)].units) == 1
+    assert len(new_state.world[(4, 2)].units) == 1
+    assert len(new_state.turns[1].move_actions) == 2
+    assert new_state.turns[1].input_moves == turns[1].input_moves
@@ -0,0 +1,68 @@
+import json
+import pytest
+import engine
+from game_state import GameState
+from output_sink import NullSink, ConsoleSink, BufferedFileSink, GAME_END, TURN_EVENTS
+
+def no_input_action(game_state, cell_pos):
+    return game_state
+
+@pytest.fixture
+def short_game(basic_config, monkeypatch):
+    monkeypatch.setattr(engine, "get_input_action", no_input_action)
+    return GameState.from_config({**basic_config, 'max_turns': 2})
+
+def test_null_sink_prints_nothing(short_game, capsys):
+    final_state = engine.run_game(short_game, sink=NullSink())
+
+    assert final_state.game_status == "game_over"
+    assert capsys.readouterr().out == ""
+
+def test_console_sink_renders_turn(short_game, capsys):
+    engine.turn(short_game, ConsoleSink())
+
+    out = capsys.readouterr().out
+    assert "Turn: 1" in out
+    assert "World:" in out
+    assert "Scores:" in out
+
+def test_buffered_file_sink_writes_events_in_order(short_game, tmp_path):
+    path = tmp_path / "events.jsonl"
+    sink = BufferedFileSink(str(path), buffer_size=1000)
+
+    final_state = engine.turn(short_game, sink)
+    assert not path.exists()
+
+    sink.close()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['event'] for record in records] == list(TURN_EVENTS)
+    assert all(record['turn'] == 1 for record in records)
+    assert records[-1]['scores'] == {str(player_id): score for player_id, score in final_state.scores.items()}
+
+def test_buffered_file_sink_flushes_when_full(short_game, tmp_path):
+    path = tmp_path / "events.jsonl"
+    sink = BufferedFileSink(str(path), buffer_size=2)
+
+    engine.turn(short_game, sink)
+
+    assert len(path.read_text().splitlines()) == len(TURN_EVENTS)
+
+def test_console_sink_runs_a_game_to_the_end(short_game, capsys):
+    final_state = engine.run_game(short_game, sink=ConsoleSink())
+
+    assert final_state.game_status == "game_over"
+    out = capsys.readouterr().out
+    assert "Turn: 2" in out
+    assert "Final scores after turn 2" in out
+
+def test_buffered_file_sink_runs_a_game_to_the_end(short_game, tmp_path):
+    path = tmp_path / "events.jsonl"
+    sink = BufferedFileSink(str(path))
+
+    final_state = engine.run_game(short_game, sink=sink)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['event'] for record in records] == list(TURN_EVENTS) * 2 + [GAME_END]
+    assert records[-1]['turn'] == 2
+    assert records[-1]['game_status'] == "game_over"
+    assert records[-1]['scores'] == {str(player_id): score for player_id, score in final_state.scores.items()}
@@ -0,0 +1,72 @@
+import pytest
+import engine
+from game_state import GameState, Unit, Tile, Position
+from output_sink import NullSink
+from players import create_player, RandomPlayer, GreedyExpansionPlayer, GreedyAttackPlayer, LLMPlayer
+
+def make_units(player_id, count):
+    return [Unit(player_id=player_id, health=1, movement_points=1) for _ in range(count)]
+
+@pytest.fixture
+def board(initial_game_state):
+    world = initial_game_state.world
+    for pos in world:
+        world = world.set(pos, Tile(position=Position(*pos), units=[]))
+    world = world.set((2, 2), Tile(position=Position(2, 2), units=make_units(1, 3)))
+    world = world.set((0, 0), Tile(position=Position(0, 0), units=make_units(1, 1)))
+    world = world.set((4, 2), Tile(position=Position(4, 2), units=make_units(2, 2)))
+    return GameState.from_state(initial_game_state, world=world)
+
+def assert_legal(game_state, player_id, moves):
+    sent = {}
+    for move in moves['moves']:
+        source, destination = tuple(move['source']), tuple(move['destination'])
+        assert game_state.topology.is_adjacent(source, destination)
+        sent[source] = sent.get(source, 0) + move['units']
+    for source, units in sent.items():
+        assert units <= sum(1 for unit in game_state.world[source].units if unit.player_id == player_id)
+
+def test_create_player():
+    assert isinstance(create_player({}), LLMPlayer)
+    assert isinstance(create_player({'player_type': 'random'}), RandomPlayer)
+    with pytest.raises(ValueError):
+        create_player({'player_type': 'chess_engine'})
+
+@pytest.mark.parametrize("player_type", ["random", "greedy_expansion", "greedy_attack"])
+@pytest.mark.parametrize("player_id", [1, 2])
+def test_offline_players_make_legal_moves(board, player_type, player_id):
+    moves = create_player({'player_type': player_type, 'seed': 4}).choose_moves(board, player_id)
+
+    assert_legal(board, player_id, moves)
+
+def test_seeded_random_player_is_repeatable(board):
+    player = RandomPlayer({'seed': 'abc'})
+
+    assert player.choose_moves(board, 1) == player.choose_moves(board, 1)
+
+def test_greedy_expansion_keeps_one_unit_behind(board):
+    moves = GreedyExpansionPlayer().choose_moves(board, 1)['moves']
+
+    assert [move['source'] for move in moves] == [[2, 2], [2, 2]]
+    assert all(move['units'] == 1 for move in moves)
+    assert len({tuple(move['destination']) for move in moves}) == 2
+
+def test_greedy_attack_closes_in_on_enemy(board):
+    moves = GreedyAttackPlayer().choose_moves(board, 2)['moves']
+
+    assert len(moves) == 1
+    destination = tuple(moves[0]['destination'])
+    assert board.topology.distance(destination, (2, 2)) < board.topology.distance((4, 2), (2, 2))
+    assert moves[0]['units'] == 2
+
+def test_full_game_runs_offline(basic_config):
+    game_state = GameState.from_config({
+        **basic_config,
+        'player_one_config': {'player_type': 'greedy_expansion'},
+        'player_two_config': {'player_type': 'random', 'seed': 2},
+    })
+
+    final_state = engine.run_game(game_state, sink=NullSink())
+
+    assert final_state.game_status == "game_over"
+    assert any(turn.move_actions for turn in final_state.turns.values())
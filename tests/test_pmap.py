@@ -0,0 +1,103 @@
+import pytest
+from utils.pmap import PMap
+from game_state import GameState
+
+class CollidingKey:
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return 1
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.value == self.value
+
+def test_set_leaves_original_untouched():
+    original = PMap({'a': 1, 'b': 2})
+    updated = original.set('a', 10)
+
+    assert original['a'] == 1
+    assert updated['a'] == 10
+    assert updated['b'] == 2
+
+def test_iteration_follows_insertion_order():
+    pmap = PMap()
+    for key in [(2, 0), (0, 1), (1, 1), (0, 0)]:
+        pmap = pmap.set(key, True)
+    pmap = pmap.delete((0, 1)).set((0, 1), False)
+
+    assert list(pmap) == [(2, 0), (1, 1), (0, 0), (0, 1)]
+
+def test_matches_dict_after_many_updates():
+    expected = {}
+    pmap = PMap()
+    for i in range(2000):
+        key = (i * 7919) % 613
+        if i % 5 == 0 and key in expected:
+            del expected[key]
+            pmap = pmap.delete(key)
+        else:
+            expected[key] = i
+            pmap = pmap.set(key, i)
+
+    assert pmap == expected
+    assert list(pmap.items()) == list(expected.items())
+
+def test_order_stays_live_sized_under_churn():
+    expected = {}
+    pmap = PMap()
+    for i in range(5000):
+        key = (i * 31) % 97
+        if key in expected and i % 3:
+            del expected[key]
+            pmap = pmap.delete(key)
+        else:
+            expected.pop(key, None)
+            pmap = pmap.set(key, i) if key not in pmap else pmap.delete(key).set(key, i)
+            expected[key] = i
+
+    assert list(pmap.items()) == list(expected.items())
+    # Dead entries are dropped once they outnumber the live ones
+    assert pmap._order.count <= 2 * len(pmap) + 33
+    ranks = [pmap.index_of(key) for key in pmap]
+    assert ranks == sorted(ranks)
+
+def test_hash_collisions():
+    pmap = PMap({CollidingKey(1): 'one', CollidingKey(2): 'two'})
+    pmap = pmap.delete(CollidingKey(1))
+
+    assert CollidingKey(1) not in pmap
+    assert pmap[CollidingKey(2)] == 'two'
+    assert len(pmap) == 1
+
+def test_delete_missing_key_raises():
+    with pytest.raises(KeyError):
+        PMap({'a': 1}).delete('b')
+
+def test_game_state_shares_unchanged_tiles(initial_game_state):
+    world = initial_game_state.world.set((1, 1), initial_game_state.world[(1, 1)])
+    state = GameState.from_state(initial_game_state, world=dict(world))
+
+    assert isinstance(state.world, PMap)
+    assert isinstance(state.turns, PMap)
+    updated = state.world.set((0, 0), state.world[(1, 1)])
+    assert updated[(2, 2)] is state.world[(2, 2)]
+
+@pytest.mark.parametrize("size", [0, 1, 31, 32, 33, 1024, 1057, 40000])
+def test_built_in_one_pass_matches_set_by_set(size):
+    items = {(i * 7919 % 613, i): i for i in range(size)}
+    built = PMap(items)
+    expected = PMap()
+    for key, value in items.items():
+        expected = expected.set(key, value)
+
+    assert list(built.items()) == list(expected.items()) == list(items.items())
+    assert [built.index_of(key) for key in items] == list(range(size))
+    assert built.set((-1, -1), 0).delete((-1, -1)) == items
+
+def test_bulk_build_with_hash_collisions():
+    built = PMap({CollidingKey(1): 'one', CollidingKey(2): 'two', 'other': 3})
+
+    assert built[CollidingKey(1)] == 'one'
+    assert list(built) == [CollidingKey(1), CollidingKey(2), 'other']
+    assert built.delete(CollidingKey(2)) == {CollidingKey(1): 'one', 'other': 3}
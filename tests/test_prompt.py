@@ -38,4 +38,79 @@ def test_compose_prompt_multiple_files(prompt_composer):
     assert len(result) == 2
     assert result[0]['role'] == 'system'
     assert result[1]['role'] == 'user'
-    assert 'test world' in result[1]['content']
\ No newline at end of file
+    assert 'test world' in result[1]['content']
+
+
+WORLD = {
+    'game_info': {'current_turn': 3, 'max_turns': 10},
+    'board': {'cells': {'0,0': {'units': {'your_units': 2, 'enemy_units': 0}, 'controlled_by': 'you'}}},
+}
+
+def text_path(composer, config):
+    # What compose_prompt produced before prompts were compiled
+    params = composer._template_params(config) if 'template_params' in config else None
+    return composer._render_text(composer.load_prompt_file(config['prompt_filepath']), params)
+
+@pytest.mark.parametrize("filepath", sorted(p.name for p in Path("src/prompts").glob("*.txt")))
+@pytest.mark.parametrize("params", [None, {'world_representation': WORLD}, {'world_representation': 'test world'}])
+def test_compiled_prompts_match_text_substitution(prompt_composer, filepath, params):
+    config = {'prompt_filepath': filepath}
+    if params is not None:
+        config['template_params'] = params
+
+    assert prompt_composer.compose_prompt([config]) == text_path(prompt_composer, config)
+
+def test_compiled_prompt_is_cached(prompt_composer):
+    first = prompt_composer.load_compiled_prompt("test_2.txt")
+
+    assert PromptComposer("src/prompts").load_compiled_prompt("test_2.txt") is first
+    assert first.compiled
+    assert not first.is_static
+    assert prompt_composer.load_compiled_prompt("test_1.txt").is_static
+
+def test_compiled_prompt_reloads_when_file_changes(tmp_path):
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("- role: user\n  content: |\n    First ${world_representation}\n")
+    composer = PromptComposer(str(tmp_path))
+    config = {'prompt_filepath': 'prompt.txt', 'template_params': {'world_representation': 'x'}}
+    assert composer.compose_prompt([config])[0]['content'] == "First x\n"
+
+    prompt_file.write_text("- role: user\n  content: |\n    Second version ${world_representation}\n")
+
+    assert composer.compose_prompt([config])[0]['content'] == "Second version x\n"
+
+@pytest.mark.parametrize("text", [
+    "- role: ${role}\n  content: Hello\n",
+    "- role: user\n  content: Plain ${world_representation}\n",
+])
+def test_placeholders_outside_literal_blocks_use_text_path(tmp_path, text):
+    (tmp_path / "prompt.txt").write_text(text)
+    composer = PromptComposer(str(tmp_path))
+    config = {'prompt_filepath': 'prompt.txt', 'template_params': {'world_representation': 'x', 'role': 'user'}}
+
+    assert not composer.load_compiled_prompt("prompt.txt").compiled
+    assert composer.compose_prompt([config]) == text_path(composer, config)
+
+def test_missing_template_variable(prompt_composer):
+    with pytest.raises(KeyError, match="Missing template variable"):
+        prompt_composer.compose_prompt([{'prompt_filepath': 'test_2.txt', 'template_params': {}}])
+
+def test_static_prefix_counts_leading_messages_without_placeholders(prompt_composer):
+    world = {'world_representation': {'board': {'cells': {}}}}
+    configs = [
+        {'prompt_filepath': name, 'template_params': dict(world)}
+        for name in ('purpose_system.txt', 'rules_system.txt', 'nshot_1.txt', 'base_input.txt')
+    ]
+
+    chain = prompt_composer.compose_prompt(configs)
+    assert chain.static_prefix == len(chain) - 1
+
+    # Nothing after a dynamic message counts, even if it is static itself
+    chain = prompt_composer.compose_prompt([configs[-1]] + configs[:-1])
+    assert chain.static_prefix == 0
+
+def test_static_prefix_of_text_path_prompts(tmp_path):
+    (tmp_path / "flow.txt").write_text("- role: user\n  content: \"${a} and ${b}\"\n")
+    composer = PromptComposer(str(tmp_path))
+
+    assert composer.compose_prompt([{'prompt_filepath': 'flow.txt', 'template_params': {'a': 1, 'b': 2}}]).static_prefix == 0
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from utils.metrics import metrics
+from utils.rate_limit import RequestScheduler, TokenBucket, is_retryable, retry_after, set_scheduler
+from .fake_anthropic_server import FakeAnthropicServer
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_refills_at_the_per_minute_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(120, clock=clock)
+
+    assert bucket.capacity == 2
+    bucket.take(2)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.wait_time(1) == 0
+
+def test_oversized_requests_pass_when_the_bucket_is_full_and_leave_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(600, clock=clock)
+
+    assert bucket.wait_time(50) == 0
+    bucket.take(50)
+    assert bucket.wait_time(1) == pytest.approx(4.1)
+
+def test_retryable_errors():
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(529))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError("bad"))
+    assert retry_after(StatusError(429, {'retry-after': '3'})) == 3.0
+    assert retry_after(StatusError(429)) is None
+
+def test_retries_with_backoff_until_success():
+    sleeps = []
+    scheduler = RequestScheduler(max_retries=3, base_delay=1.0, sleep=sleeps.append, rng=random.Random(0))
+    attempts = iter([StatusError(429), StatusError(503), "ok"])
+
+    def call():
+        result = next(attempts)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert scheduler.run(call) == "ok"
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1.0 and 0 <= sleeps[1] <= 2.0
+    assert metrics.value("llm_retries_total", status=429) == 1
+
+def test_backoff_respects_retry_after_and_max_delay():
+    scheduler = RequestScheduler(base_delay=0.001, max_delay=10.0, rng=random.Random(0))
+
+    assert scheduler.backoff(0, StatusError(429, {'retry-after': '4'})) == 4.0
+    assert scheduler.backoff(0, StatusError(429, {'retry-after': '400'})) == 10.0
+    assert scheduler.backoff(30) <= 10.0
+
+def test_gives_up_after_max_retries_or_on_other_errors():
+    sleeps = []
+    scheduler = RequestScheduler(max_retries=2, sleep=sleeps.append)
+
+    def overloaded():
+        raise StatusError(529)
+
+    def invalid():
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        scheduler.run(overloaded)
+    assert len(sleeps) == 2
+    with pytest.raises(StatusError):
+        scheduler.run(invalid)
+    assert len(sleeps) == 2
+
+def test_requests_per_minute_budget_spaces_requests():
+    scheduler = RequestScheduler(requests_per_minute=1200)
+    scheduler.requests.level = 0
+    start = time.monotonic()
+    for _ in range(3):
+        scheduler.acquire()
+
+    # 20 requests a second: the third is granted about 0.15s in
+    assert time.monotonic() - start >= 0.14
+
+def test_queues_take_turns():
+    scheduler = RequestScheduler(requests_per_minute=1200)
+    scheduler.requests.level = 0
+    granted = []
+
+    def request(queue, name):
+        scheduler.acquire(queue=queue)
+        granted.append(name)
+
+    threads = []
+    for queue, name in [("game-a", "a1"), ("game-a", "a2"), ("game-a", "a3"), ("game-b", "b1")]:
+        thread = threading.Thread(target=request, args=(queue, name))
+        thread.start()
+        threads.append(thread)
+        # Let each request join its queue before the next one
+        while sum(len(waiting) for waiting in scheduler._queues.values()) < len(threads):
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+
+    assert granted == ["a1", "b1", "a2", "a3"]
+
+def test_call_llm_api_retries_rate_limits_from_the_server(monkeypatch):
+    pytest.importorskip("httpx")
+    from utils.llm import call_llm_api, registry
+
+    with FakeAnthropicServer(script=[(429, 0.0), (429, 0.0), (200, 0.2)]) as server:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        registry.close()
+        set_scheduler(RequestScheduler(max_retries=3, base_delay=0.01))
+        try:
+            result = call_llm_api([{'role': 'user', 'content': 'Your move.'}])
+        finally:
+            registry.close()
+
+    assert result == '{"moves": []}'
+    assert len(server.requests) == 3
+    assert metrics.value("llm_retries_total", status=429) == 2
+    assert metrics.value("llm_request_seconds").max >= 0.2
+    assert metrics.value("llm_input_tokens_total") == 10
@@ -0,0 +1,101 @@
+import random
+import struct
+from dataclasses import replace
+import pytest
+import engine
+from game_state import GameState, Position, Tile, Unit
+from replay import MAGIC, ReplayReader, ReplaySink, ReplayWriter
+from .test_turn_history import random_input_action
+
+@pytest.fixture
+def recorded_game(basic_config, monkeypatch, tmp_path):
+    monkeypatch.setattr(engine, "get_input_action", random_input_action)
+    random.seed(3)
+    path = tmp_path / "game.hxr"
+    initial_state = GameState.from_config({**basic_config, 'max_turns': 6})
+    final_state = engine.run_game(initial_state, sink=ReplaySink(str(path)))
+    return initial_state, final_state, path
+
+def test_header_and_initial_units(recorded_game):
+    initial_state, _, path = recorded_game
+
+    with ReplayReader(str(path)) as reader:
+        assert reader.config['board_size'] == 5
+        assert reader.config['max_turns'] == 6
+        expected = {}
+        for pos, tile in initial_state.world.items():
+            for unit in tile.units:
+                expected.setdefault(pos, {}).setdefault(unit.player_id, 0)
+                expected[pos][unit.player_id] += 1
+        assert reader.initial_units() == expected
+
+def test_turn_records_match_game(recorded_game):
+    _, final_state, path = recorded_game
+
+    with ReplayReader(str(path)) as reader:
+        assert reader.turn_numbers == sorted(final_state.turns)
+        # Jump straight to the later turns first
+        for turn_number in reversed(reader.turn_numbers):
+            turn = reader.turn(turn_number)
+            turn_state = final_state.turns[turn_number]
+            assert turn['move_actions'] == [
+                {**move, 'source': tuple(move['source']), 'destination': tuple(move['destination'])}
+                for move in turn_state.move_actions
+            ]
+            assert turn['combat_actions'] == turn_state.combat_actions
+            assert turn['spawn_actions'] == [
+                {'player_id': spawn['player_id'], 'position': spawn['position']}
+                for spawn in turn_state.spawn_actions
+            ]
+
+def test_final_scores(recorded_game):
+    _, final_state, path = recorded_game
+
+    with ReplayReader(str(path)) as reader:
+        assert reader.final_scores() == final_state.scores
+
+def test_unfinished_replay_is_rejected(initial_game_state, tmp_path):
+    path = tmp_path / "unfinished.hxr"
+    writer = ReplayWriter(str(path), initial_game_state)
+    writer._file.flush()
+
+    with pytest.raises(ValueError):
+        ReplayReader(str(path))
+    writer.close()
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "game.log"
+    path.write_bytes(b"{}" * 20)
+
+    with pytest.raises(ValueError):
+        ReplayReader(str(path))
+
+def test_boards_larger_than_a_byte(initial_game_state, tmp_path):
+    path = tmp_path / "large.hxr"
+    units = [Unit(player_id=1, health=1, movement_points=1)]
+    world = {(299, 298): Tile(position=Position(299, 298), units=units)}
+    game_state = GameState.from_state(initial_game_state, world=world, board_size=300)
+    turn_state = replace(
+        game_state.turns[1],
+        move_actions=[{'player_id': 1, 'source': (299, 298), 'destination': (298, 298), 'units': 1}],
+        spawn_actions=[{'player_id': 1, 'position': (298, 298)}]
+    )
+
+    writer = ReplayWriter(str(path), game_state)
+    writer.write_turn(turn_state, {1: 2, 2: 0})
+    writer.close()
+
+    with ReplayReader(str(path)) as reader:
+        assert reader.initial_units() == {(299, 298): {1: 1}}
+        turn = reader.turn(1)
+        assert turn['move_actions'] == turn_state.move_actions
+        assert turn['spawn_actions'] == turn_state.spawn_actions
+
+def test_older_versions_are_rejected(recorded_game):
+    _, _, path = recorded_game
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<4sH", data, 0, MAGIC, 1)
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match="version 1"):
+        ReplayReader(str(path))
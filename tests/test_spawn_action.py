@@ -1,5 +1,5 @@
 import pytest
-from spawn_action import spawn_action
+from spawn_action import spawn_action, spawn_phase
 from game_state import GameState, Unit, Tile, Position, TurnState, PlayerState
 
 def test_spawn_action_basic(initial_game_state):
@@ -147,4 +147,21 @@ def test_spawn_action_new_unit_properties(initial_game_state):
     new_unit = new_state.world[test_pos].units[-1]
     assert new_unit.player_id == 1
     assert new_unit.health == 1
-    assert new_unit.movement_points == 1 
\ No newline at end of file
+    assert new_unit.movement_points == 1 
+
+def test_spawn_phase_spawns_in_every_held_hex(initial_game_state):
+    world = dict(initial_game_state.world)
+    world[(2, 2)] = Tile(position=(2, 2), units=[
+        Unit(player_id=1, health=1, movement_points=1),
+        Unit(player_id=2, health=1, movement_points=1)
+    ])
+    state = GameState.from_state(initial_game_state, world=world)
+    new_state = spawn_phase(state)
+
+    assert len(new_state.world[(0, 2)].units) == 3
+    assert len(new_state.world[(4, 2)].units) == 3
+    assert len(new_state.world[(2, 2)].units) == 2
+    assert new_state.turns[1].spawn_actions == [
+        {'position': (0, 2), 'player_id': 1},
+        {'position': (4, 2), 'player_id': 2}
+    ]
@@ -0,0 +1,72 @@
+import threading
+import pytest
+from engine import run_game
+from output_sink import NullSink
+from utils.timing import Histogram, PhaseTimings, collecting, timed
+
+def test_histogram_summarises_observations():
+    histogram = Histogram()
+    for seconds in (0.001, 0.002, 0.004, 0.2):
+        histogram.observe(seconds)
+
+    summary = histogram.to_dict()
+    assert summary['count'] == 4
+    assert summary['total'] == pytest.approx(0.207)
+    assert (summary['min'], summary['max']) == (0.001, 0.2)
+    assert summary['p50'] == 0.0025
+    assert summary['p99'] == 0.2
+    assert sum(summary['buckets'].values()) == 4
+
+def test_histograms_merge_and_round_trip():
+    first, second = PhaseTimings(), PhaseTimings()
+    first.record("move", 0.01)
+    second.record("move", 0.03)
+    second.record("combat", 5.0)
+
+    first.merge(PhaseTimings.from_dict(second.to_dict()))
+    summary = first.to_dict()
+    assert summary['move']['count'] == 2
+    assert summary['move']['max'] == 0.03
+    assert summary['combat']['buckets'] == {'5': 1}
+
+def test_timed_records_only_while_collecting():
+    timings = PhaseTimings()
+    with timed("ignored"):
+        pass
+    with collecting(timings):
+        with timed("stage"):
+            pass
+
+    assert list(timings.phases) == ["stage"]
+    assert timings.phases["stage"].count == 1
+
+def test_threads_record_into_one_collector():
+    timings = PhaseTimings()
+
+    def record_many():
+        for _ in range(1000):
+            timings.record("llm_call", 0.001)
+
+    threads = [threading.Thread(target=record_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert timings.phases["llm_call"].count == 4000
+
+def test_run_game_times_every_stage(basic_config):
+    from game_state import GameState
+    config = {
+        **basic_config,
+        'max_turns': 3,
+        'player_one_config': {'player_type': 'random', 'seed': 1},
+        'player_two_config': {'player_type': 'greedy_attack'},
+    }
+    timings = PhaseTimings()
+    run_game(GameState.from_config(config), sink=NullSink(), timings=timings)
+
+    turns = timings.phases["turn"].count
+    assert turns > 0
+    for stage in ("input", "move", "combat", "spawn", "turn_end", "compact"):
+        assert timings.phases[stage].count == turns
+    assert timings.phases["output"].count == 6 * turns
@@ -0,0 +1,54 @@
+import random
+import pytest
+import engine
+from dataclasses import replace
+from game_state import GameState
+from turn_history import world_at, is_keyframe
+
+def unit_counts(world):
+    counts = {}
+    for pos, tile in world.items():
+        for unit in tile.units:
+            counts[(pos, unit.player_id)] = counts.get((pos, unit.player_id), 0) + 1
+    return counts
+
+def random_input_action(game_state, cell_pos):
+    # Move one unit from every occupied hex to a random neighbouring hex
+    input_moves = {}
+    for (x, y), tile in game_state.world.items():
+        for player_id in {unit.player_id for unit in tile.units}:
+            destination = (x + random.choice([-1, 0, 1]), y + random.choice([-1, 0, 1]))
+            input_moves.setdefault((x, y), {1: [], 2: []})[player_id].append({'destination': destination, 'units': 1})
+    turn_state = replace(game_state.turns[game_state.current_turn], input_moves=input_moves)
+    return GameState.from_state(game_state, turns=game_state.turns.set(game_state.current_turn, turn_state))
+
+@pytest.fixture
+def played_game(basic_config, monkeypatch):
+    monkeypatch.setattr(engine, "get_input_action", random_input_action)
+    random.seed(7)
+    state = GameState.from_config({**basic_config, 'max_turns': 8, 'history_keyframe_interval': 3})
+    worlds = {}
+    while state.game_status != "game_over":
+        turn_number = state.current_turn
+        state = engine.turn(state)
+        worlds[turn_number] = state.world
+    return state, worlds
+
+def test_only_keyframe_turns_keep_their_world(played_game):
+    state, worlds = played_game
+
+    for turn_number in worlds:
+        assert bool(state.turns[turn_number].world) == is_keyframe(turn_number, 3)
+        assert 'spawns' not in state.turns[turn_number].player_one.turn_model_output
+
+def test_world_at_rebuilds_every_turn(played_game):
+    state, worlds = played_game
+
+    for turn_number, world in worlds.items():
+        assert unit_counts(world_at(state, turn_number)) == unit_counts(world)
+
+def test_world_at_unknown_turn(played_game):
+    state, _ = played_game
+
+    with pytest.raises(KeyError):
+        world_at(state, 99)
@@ -0,0 +1,101 @@
+import random
+import pytest
+from game_state import GameState, Unit, Tile, Position, TurnState
+from move_action import move_action
+from combat_action import combat_action
+from spawn_action import spawn_action
+from vector_engine import world_to_counts, game_state_counts, move_phase, combat_phase, spawn_phase, resolve_phases
+
+def make_units(player_id, count):
+    return [Unit(player_id=player_id, health=1, movement_points=1) for _ in range(count)]
+
+@pytest.fixture
+def busy_game_state(initial_game_state):
+    world = dict(initial_game_state.world)
+    world[(0, 2)] = Tile(position=Position(0, 2), units=make_units(1, 3))
+    world[(1, 1)] = Tile(position=Position(1, 1), units=make_units(2, 1) + make_units(1, 2))
+    world[(2, 2)] = Tile(position=Position(2, 2), units=make_units(1, 1) + make_units(2, 2))
+    world[(3, 3)] = Tile(position=Position(3, 3), units=make_units(2, 4))
+    world[(4, 2)] = Tile(position=Position(4, 2), units=make_units(2, 2))
+
+    input_moves = {
+        (0, 2): {1: [{'destination': (1, 2), 'units': 1}, {'destination': (1, 1), 'units': 2}], 2: []},
+        (3, 3): {1: [], 2: [{'destination': (2, 3), 'units': 3}, {'destination': (9, 9), 'units': 1}]},
+        (1, 1): {1: [{'destination': (3, 1), 'units': 1}], 2: [{'destination': (2, 1), 'units': 1}]},
+        (4, 2): {1: [], 2: [{'destination': (3, 2), 'units': 2}]},
+    }
+    turn_state = initial_game_state.turns[1]
+    turns = dict(initial_game_state.turns)
+    turns[1] = TurnState(
+        turn_number=1,
+        world=world,
+        player_one=turn_state.player_one,
+        player_two=turn_state.player_two,
+        input_moves=input_moves
+    )
+    return GameState.from_state(initial_game_state, world=world, turns=turns)
+
+def run_per_hex_phases(game_state):
+    for phase in (move_action, combat_action, spawn_action):
+        for hex_pos in list(game_state.world.keys()):
+            game_state = phase(game_state, hex_pos)
+    return game_state
+
+def test_world_to_counts(busy_game_state):
+    counts = world_to_counts(busy_game_state.world, 2)
+
+    assert counts.shape == (2, 5, 5)
+    assert counts[0, 1, 1] == 2
+    assert counts[1, 1, 1] == 1
+    assert counts.sum() == 15
+
+def test_game_state_counts_reuses_the_resolved_counts(busy_game_state):
+    counts = game_state_counts(busy_game_state)
+    assert (counts == world_to_counts(busy_game_state.world, 2)).all()
+
+    resolved = resolve_phases(busy_game_state)
+    assert game_state_counts(resolved) is resolved.board_tally.counts
+    assert (game_state_counts(resolved) == world_to_counts(resolved.world, 2)).all()
+
+def test_move_phase_skips_invalid_destination(busy_game_state):
+    counts = world_to_counts(busy_game_state.world, 2)
+    new_counts, records = move_phase(counts, busy_game_state.turns[1].input_moves)
+
+    assert len(records) == 5
+    assert all(record['destination'] not in [(9, 9), (3, 1)] for record in records)
+    assert new_counts[1, 3, 3] == 1
+    assert new_counts.sum() == counts.sum()
+
+def test_combat_phase_uses_batched_rolls(monkeypatch):
+    counts = world_to_counts({
+        (0, 0): Tile(position=Position(0, 0), units=make_units(1, 2) + make_units(2, 1)),
+        (0, 1): Tile(position=Position(0, 1), units=make_units(1, 1)),
+    }, 2)
+    monkeypatch.setattr(random, "randint", lambda a, b: 7)
+
+    new_counts, records = combat_phase(counts)
+
+    assert records == [{'position': (0, 0), 'player_1_casualties': 1, 'player_2_casualties': 1}]
+    assert new_counts[:, 0, 0].tolist() == [1, 0]
+    assert new_counts[:, 0, 1].tolist() == [1, 0]
+
+def test_spawn_phase_only_in_held_hexes(busy_game_state):
+    counts = world_to_counts(busy_game_state.world, 2)
+    new_counts, records = spawn_phase(counts)
+
+    assert [record['position'] for record in records] == [(0, 2), (3, 3), (4, 2)]
+    assert new_counts.sum() == counts.sum() + 3
+
+@pytest.mark.parametrize("seed", range(10))
+def test_resolve_phases_matches_per_hex_actions(busy_game_state, seed):
+    random.seed(seed)
+    expected = run_per_hex_phases(busy_game_state)
+    random.seed(seed)
+    actual = resolve_phases(busy_game_state)
+
+    assert (world_to_counts(actual.world, 2) == world_to_counts(expected.world, 2)).all()
+    assert actual.calculate_scores() == expected.calculate_scores()
+    expected_turn = expected.turns[1]
+    actual_turn = actual.turns[1]
+    assert actual_turn.spawn_actions == expected_turn.spawn_actions
+    assert actual_turn.player_one.turn_model_output['combats'] == expected_turn.player_one.turn_model_output['combats']
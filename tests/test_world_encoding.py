@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import patch
+from game_state import GameState, Unit, Tile, Position, PlayerState, TurnState
+from input_action import get_ai_moves
+from utils.prompt import PromptComposer
+from world_encoding import (
+    encode_world,
+    encode_sparse,
+    encode_rle,
+    encode_dense,
+    encoding_token_counts,
+    estimate_tokens
+)
+
+def make_units(player_id, count):
+    return [Unit(player_id=player_id, health=1, movement_points=1) for _ in range(count)]
+
+@pytest.fixture
+def board(initial_game_state):
+    world = initial_game_state.world
+    for pos in world:
+        world = world.set(pos, Tile(position=Position(*pos), units=[]))
+    world = world.set((0, 0), Tile(position=Position(0, 0), units=make_units(1, 2)))
+    world = world.set((4, 4), Tile(position=Position(4, 4), units=[]))
+    world = world.set((3, 1), Tile(position=Position(3, 1), units=make_units(1, 1) + make_units(2, 3)))
+    world = world.set((2, 4), Tile(position=Position(2, 4), units=make_units(2, 1)))
+    return GameState.from_state(initial_game_state, world=world)
+
+def test_sparse_lists_occupied_hexes_only(board):
+    lines = encode_sparse(board, 1).splitlines()
+
+    assert lines[0] == "turn 1 of 10, in_progress"
+    assert lines[3:] == ["0,0 2 0", "2,4 0 1", "3,1 1 3"]
+
+def test_rle_collapses_empty_runs(board):
+    lines = encode_rle(board, 2).splitlines()
+
+    assert lines[3] == "y0: E2 .4"
+    assert lines[4] == "y1: .3 Y3E1 .1"
+    assert lines[5] == "y2: .5"
+    assert lines[7] == "y4: .2 Y1 .2"
+
+def test_dense_has_one_cell_per_hex(board):
+    lines = encode_dense(board, 1).splitlines()
+
+    assert lines[3] == "y\\x 0 1 2 3 4"
+    assert lines[4] == "0 | 2/0 - - - -"
+    assert lines[5] == "1 | - - - 1/3 -"
+    assert len(lines) == 4 + 5
+
+def test_nested_is_the_original_representation(board):
+    nested = encode_world(board, 1, "nested")
+
+    assert nested["board"]["cells"]["3,1"]["units"] == {"your_units": 1, "enemy_units": 3}
+
+def test_unknown_encoding(board):
+    with pytest.raises(ValueError):
+        encode_world(board, 1, "json")
+
+def test_compact_encodings_use_fewer_tokens(board):
+    counts = encoding_token_counts(board, 1)
+
+    assert set(counts) == {"nested", "sparse", "rle", "dense"}
+    assert all(counts[encoding] * 5 < counts["nested"] for encoding in ("sparse", "rle", "dense"))
+
+def test_estimate_tokens():
+    assert estimate_tokens("y0: E2 .4") == 7
+    assert estimate_tokens("a:\n    b: 1") == 6
+
+@pytest.mark.parametrize("encoding", ["sparse", "rle", "dense"])
+def test_compact_encodings_fit_prompt_templates(board, encoding):
+    config = {'prompt_filepath': 'expansion.txt', 'template_params': {'world_representation': encode_world(board, 1, encoding)}}
+
+    messages = PromptComposer("src/prompts").compose_prompt([config])
+
+    assert encode_world(board, 1, encoding) in messages[-1]['content']
+
+@patch('input_action.call_llm_api', return_value='{"moves": []}')
+@patch('input_action.generate_prompt_chain', return_value=[])
+def test_get_ai_moves_uses_player_encoding(mock_generate_chain, mock_call_api, board):
+    player = PlayerState(player_config={'world_encoding': 'sparse'}, turn_prompt_config=[{'prompt_filepath': 'test_2.txt'}])
+    turns = {1: TurnState(turn_number=1, world=board.world, player_one=player, player_two=PlayerState())}
+
+    get_ai_moves(GameState.from_state(board, turns=turns), 1)
+
+    sent_config = mock_generate_chain.call_args[0][0][0]
+    assert sent_config['template_params']['world_representation'] == encode_sparse(board, 1)